@@ -34,6 +34,7 @@ class AudioConfig:
     PROCESSING_CONFIG = {
         'enable_smart_volume': True,        # 启用智能音量调整
         'enable_audio_normalization': True, # 启用音频标准化
+        'normalize_tts_segments': False,    # 合并配音时把各片段响度统一到 target_lufs（默认关闭，保持片段原有音量）
         'target_lufs': -20.0,              # 目标响度 (LUFS)
         'max_peak': -1.0,                  # 最大峰值 (dBFS)
         'volume_analysis_method': 'lufs',   # 音量分析方法: 'lufs' 或 'rms'
@@ -61,6 +61,9 @@ _cfg = load_config()
 app = _cfg.get("app", {})
 whisper = _cfg.get("whisper", {})
 proxy = _cfg.get("proxy", {})
+http = _cfg.get("http", {})
+llm_cache = _cfg.get("llm_cache", {})
+llm_routing = _cfg.get("llm_routing", {})
 azure = _cfg.get("azure", {})
 tencent = _cfg.get("tencent", {})
 soulvoice = _cfg.get("soulvoice", {})
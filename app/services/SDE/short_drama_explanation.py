@@ -10,10 +10,12 @@
 
 import os
 import json
-import requests
+import asyncio
 from typing import Dict, Any, Optional
 from loguru import logger
 from app.config import config
+from app.utils import http_client, async_runtime
+from app.services import subtitle_plot_analysis
 from app.utils.utils import get_uuid, storage_dir
 from app.services.subtitle_text import read_subtitle_text
 # 导入新的提示词管理系统
@@ -99,12 +101,13 @@ class SubtitleAnalyzer:
                     parameters={"subtitle_content": subtitle_content}
                 )
 
-            if self.is_native_gemini:
-                # 使用原生Gemini API格式
-                return self._call_native_gemini_api(prompt)
-            else:
-                # 使用OpenAI兼容格式
-                return self._call_openai_compatible_api(prompt)
+            if not self.custom_prompt:
+                chunks = subtitle_plot_analysis.split_subtitle_chunks(subtitle_content)
+                if len(chunks) > 1:
+                    # 长字幕分段并行分析后汇总
+                    return self._analyze_in_chunks(chunks)
+
+            return self._call_api(prompt)
 
         except Exception as e:
             logger.error(f"字幕分析过程中发生错误: {str(e)}")
@@ -114,6 +117,35 @@ class SubtitleAnalyzer:
                 "temperature": self.temperature
             }
 
+    def _call_api(self, prompt: str) -> Dict[str, Any]:
+        if self.is_native_gemini:
+            # 使用原生Gemini API格式
+            return self._call_native_gemini_api(prompt)
+        else:
+            # 使用OpenAI兼容格式
+            return self._call_openai_compatible_api(prompt)
+
+    def _analyze_in_chunks(self, chunks) -> Dict[str, Any]:
+        """分段并行分析剧情并汇总，HTTP 请求在线程中执行"""
+        tokens_used = 0
+
+        async def generate(prompt: str, system_prompt: str) -> str:
+            nonlocal tokens_used
+            result = await asyncio.to_thread(self._call_api, prompt)
+            if result["status"] != "success":
+                raise Exception(result["message"])
+            tokens_used += result.get("tokens_used", 0)
+            return result["analysis"]
+
+        analysis = async_runtime.run(subtitle_plot_analysis.analyze_plot_in_chunks(chunks, generate))
+        return {
+            "status": "success",
+            "analysis": analysis,
+            "tokens_used": tokens_used,
+            "model": self.model,
+            "temperature": self.temperature
+        }
+
     def _call_native_gemini_api(self, prompt: str) -> Dict[str, Any]:
         """调用原生Gemini API"""
         try:
@@ -156,7 +188,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/models/{self.model}:generateContent"
 
             # 发送请求
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=payload,
                 headers={"Content-Type": "application/json", "x-goog-api-key": self.api_key},
@@ -247,7 +279,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/chat/completions"
 
             # 发送HTTP请求
-            response = requests.post(url, headers=self.headers, json=payload, timeout=120)
+            response = http_client.post(url, headers=self.headers, json=payload, timeout=120)
 
             # 解析响应
             if response.status_code == 200:
@@ -449,7 +481,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/models/{self.model}:generateContent"
 
             # 发送请求
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=payload,
                 headers={"Content-Type": "application/json", "x-goog-api-key": self.api_key},
@@ -544,7 +576,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/chat/completions"
 
             # 发送HTTP请求
-            response = requests.post(url, headers=self.headers, json=payload, timeout=120)
+            response = http_client.post(url, headers=self.headers, json=payload, timeout=120)
 
             # 解析响应
             if response.status_code == 200:
@@ -1,13 +1,37 @@
 # 公共方法
 import json
 import requests  # 新增
-import pysrt
 from loguru import logger
 from typing import List, Dict
 
+from app.services.subtitle_track import SubtitleTrack, format_ms
+
+
+def _track_to_dicts(track: SubtitleTrack) -> List[Dict]:
+    """转换为原有的字典格式（向后兼容）"""
+    subtitles = []
+    for number, (start, end, text) in enumerate(track, start=1):
+        # 合并多行文本为单行（某些 SRT 文件会有换行）
+        text = text.replace('\n', ' ').strip()
+
+        # 跳过空字幕
+        if not text:
+            continue
+
+        start_time = format_ms(start)
+        end_time = format_ms(end)
+        subtitles.append({
+            'number': number,
+            'timestamp': f"{start_time} --> {end_time}",
+            'text': text,
+            'start_time': start_time,
+            'end_time': end_time
+        })
+    return subtitles
+
 
 def load_srt(file_path: str) -> List[Dict]:
-    """加载并解析SRT文件（使用 pysrt 库，支持多种编码和格式）
+    """加载并解析SRT文件（自动识别 UTF-8、UTF-16、GBK 等编码）
 
     Args:
         file_path: SRT文件路径
@@ -27,55 +51,16 @@ def load_srt(file_path: str) -> List[Dict]:
 
     Raises:
         FileNotFoundError: 文件不存在
-        ValueError: 文件编码不支持或格式错误
     """
-    # 编码自动检测：依次尝试常见编码
-    encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312']
-    subs = None
-    detected_encoding = None
-
-    for encoding in encodings:
-        try:
-            subs = pysrt.open(file_path, encoding=encoding)
-            detected_encoding = encoding
-            logger.info(f"成功加载字幕文件 {file_path}，编码：{encoding}，共 {len(subs)} 条")
-            break
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logger.warning(f"使用编码 {encoding} 加载失败: {e}")
-            continue
-
-    if subs is None:
-        # 所有编码都失败
-        raise ValueError(
-            f"无法读取字幕文件 {file_path}，"
-            f"请检查文件编码（支持 UTF-8、GBK、GB2312）"
-        )
+    track = SubtitleTrack.load(file_path)
+    logger.info(f"成功加载字幕文件 {file_path}，共 {len(track)} 条")
 
     # 检查是否为空
-    if not subs:
+    if not len(track):
         logger.warning(f"字幕文件 {file_path} 解析后无有效内容")
         return []
 
-    # 转换为原格式（向后兼容）
-    subtitles = []
-    for sub in subs:
-        # 合并多行文本为单行（某些 SRT 文件会有换行）
-        text = sub.text.replace('\n', ' ').strip()
-
-        # 跳过空字幕
-        if not text:
-            continue
-
-        subtitles.append({
-            'number': sub.index,
-            'timestamp': f"{sub.start} --> {sub.end}",
-            'text': text,
-            'start_time': str(sub.start),
-            'end_time': str(sub.end)
-        })
-
+    subtitles = _track_to_dicts(track)
     logger.info(f"成功解析 {len(subtitles)} 条有效字幕")
     return subtitles
 
@@ -95,29 +80,11 @@ def load_srt_from_content(srt_content: str) -> List[Dict]:
     if srt_content is None or not str(srt_content).strip():
         raise ValueError("字幕内容为空")
 
-    try:
-        subs = pysrt.from_string(str(srt_content))
-    except Exception as e:
-        logger.error(f"无法解析字幕内容: {e}")
-        raise ValueError("无法解析字幕内容，请确保为标准 SRT 格式") from e
-
-    if not subs:
+    track = SubtitleTrack.parse(str(srt_content))
+    if not len(track):
         logger.warning("字幕内容解析后无有效内容")
         return []
 
-    subtitles = []
-    for sub in subs:
-        text = sub.text.replace('\n', ' ').strip()
-        if not text:
-            continue
-
-        subtitles.append({
-            'number': sub.index,
-            'timestamp': f"{sub.start} --> {sub.end}",
-            'text': text,
-            'start_time': str(sub.start),
-            'end_time': str(sub.end)
-        })
-
+    subtitles = _track_to_dicts(track)
     logger.info(f"成功从内容解析 {len(subtitles)} 条有效字幕")
     return subtitles
@@ -2,10 +2,19 @@ import os
 import json
 import subprocess
 import edge_tts
+import numpy as np
 from edge_tts import submaker
 from pydub import AudioSegment
 from typing import List, Dict
 from loguru import logger
+from app.config.audio_config import AudioConfig
+from app.services.audio_normalizer import (
+    LOUDNESS_SAMPLE_RATE,
+    batch_integrated_loudness,
+    decode_audio_to_array,
+    loudness_normalization_gains,
+    open_audio_encoder,
+)
 from app.utils import utils
 
 
@@ -18,46 +27,27 @@ def check_ffmpeg():
         return False
 
 
-def merge_audio_files(task_id: str, total_duration: float, list_script: list):
+def _decode_segments(list_script: list, sample_rate: int):
     """
-    合并音频文件
-    
-    Args:
-        task_id: 任务ID
-        total_duration: 总时长
-        list_script: 完整脚本信息，包含duration时长和audio路径
-    
-    Returns:
-        str: 合并后的音频文件路径
+    按顺序逐个解码片段，产出 (开始采样点, 采样数组)，解码失败或没有音频的片段只保留间隔
     """
-    # 检查FFmpeg是否安装
-    if not check_ffmpeg():
-        logger.error("FFmpeg未安装，无法合并音频文件")
-        return None
-
-    # 创建一个空的音频片段
-    final_audio = AudioSegment.silent(duration=total_duration * 1000)  # 总时长以毫秒为单位
-
-    # 计算每个片段的开始位置（基于duration字段）
     current_position = 0  # 初始位置（秒）
-    
+
     # 遍历脚本中的每个片段
     for segment in list_script:
         try:
             # 获取片段时长（秒）
             duration = segment['duration']
-            
+
             # 检查audio字段是否为空
             if segment['audio'] and os.path.exists(segment['audio']):
-                # 加载TTS音频文件
-                tts_audio = AudioSegment.from_file(segment['audio'])
-                
-                # 将TTS音频添加到最终音频
-                final_audio = final_audio.overlay(tts_audio, position=current_position * 1000)
+                # 解码TTS音频文件
+                samples = decode_audio_to_array(segment['audio'], sample_rate)
+                yield int(round(current_position * sample_rate)), samples
             else:
                 # audio为空，不添加音频，仅保留间隔
                 logger.info(f"片段 {segment.get('timestamp', '')} 没有音频文件，保留 {duration} 秒的间隔")
-            
+
             # 更新下一个片段的开始位置
             current_position += duration
 
@@ -68,9 +58,114 @@ def merge_audio_files(task_id: str, total_duration: float, list_script: list):
                 current_position += segment['duration']
             continue
 
-    # 保存合并后的音频文件
+
+def _normalized_segments(list_script: list, processing_config: dict):
+    """
+    解码所有片段并批量计算 BS.1770 响度，产出应用标准化增益后的 (开始采样点, 采样数组)
+
+    响度需要所有片段一起计算，因此该路径会把片段保存在内存中（不包含片段之间的静音）
+    """
+    positions = list(_decode_segments(list_script, LOUDNESS_SAMPLE_RATE))
+    if not positions:
+        return
+    signals = [samples for _, samples in positions]
+    loudness = batch_integrated_loudness(signals, LOUDNESS_SAMPLE_RATE)
+    gains = loudness_normalization_gains(
+        signals,
+        loudness,
+        target_lufs=processing_config.get('target_lufs', -20.0),
+        max_peak=processing_config.get('max_peak', -1.0),
+    )
+    logger.info(f"已计算 {len(signals)} 个音频片段的响度，"
+                f"范围: {np.min(loudness):.2f} ~ {np.max(loudness):.2f} LUFS")
+    for (offset, samples), gain in zip(positions, gains):
+        yield offset, samples * np.float32(gain)
+
+
+def _write_samples(encoder, samples: np.ndarray):
+    encoder.stdin.write(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+
+
+def _write_silence(encoder, count: int, sample_rate: int):
+    """分块写入静音，避免为长间隔分配大数组"""
+    chunk = np.zeros(sample_rate, dtype=np.float32)
+    while count > 0:
+        size = min(count, len(chunk))
+        _write_samples(encoder, chunk[:size])
+        count -= size
+
+
+def merge_audio_files(task_id: str, total_duration: float, list_script: list):
+    """
+    合并音频文件
+    
+    片段按时间顺序逐个解码为 float32 数组并直接流式写入 FFmpeg 编码进程，
+    内存中只保留当前片段与可能和下一个片段重叠的尾部，最后只编码一次输出文件。
+    
+    默认不改变片段音量；在 AudioConfig.PROCESSING_CONFIG 中开启 normalize_tts_segments 后，
+    会批量计算各片段的响度并统一到 target_lufs。
+    
+    Args:
+        task_id: 任务ID
+        total_duration: 总时长
+        list_script: 完整脚本信息，包含duration时长和audio路径
+    
+    Returns:
+        str: 合并后的音频文件路径
+    """
+    # 检查FFmpeg是否安装
+    if not check_ffmpeg():
+        logger.error("FFmpeg未安装，无法合并音频文件")
+        return None
+
+    processing_config = AudioConfig.get_audio_processing_config()
+    if processing_config.get('normalize_tts_segments', False):
+        # 响度计算的 K 加权滤波器要求 48kHz
+        sample_rate = LOUDNESS_SAMPLE_RATE
+        segments = _normalized_segments(list_script, processing_config)
+    else:
+        sample_rate = AudioConfig.AUDIO_QUALITY['sample_rate']
+        segments = _decode_segments(list_script, sample_rate)
+
+    total_samples = int(round(total_duration * sample_rate))
     output_audio_path = os.path.join(utils.task_dir(task_id), "merger_audio.mp3")
-    final_audio.export(output_audio_path, format="mp3")
+    encoder = open_audio_encoder(output_audio_path, sample_rate)
+
+    try:
+        # written: 已写入编码器的采样数；pending: 从 written 开始、仍可能与后续片段重叠的混音缓冲
+        written = 0
+        pending = np.zeros(0, dtype=np.float32)
+        for offset, samples in segments:
+            if offset >= total_samples:
+                continue
+            samples = samples[:total_samples - offset]
+
+            # 片段开始位置之前的部分不会再被后续片段覆盖，可以直接写出
+            if offset >= written + len(pending):
+                _write_samples(encoder, np.clip(pending, -1.0, 1.0))
+                _write_silence(encoder, offset - written - len(pending), sample_rate)
+                written = offset
+                pending = np.zeros(0, dtype=np.float32)
+            else:
+                _write_samples(encoder, np.clip(pending[:offset - written], -1.0, 1.0))
+                pending = pending[offset - written:]
+                written = offset
+
+            # 与上一个片段未写出的尾部叠加
+            if len(samples) > len(pending):
+                pending = np.concatenate([pending, np.zeros(len(samples) - len(pending), dtype=np.float32)])
+            pending[:len(samples)] += samples
+
+        _write_samples(encoder, np.clip(pending, -1.0, 1.0))
+        _write_silence(encoder, total_samples - written - len(pending), sample_rate)
+        encoder.stdin.close()
+    except BaseException:
+        encoder.kill()
+        encoder.wait()
+        raise
+
+    if encoder.wait() != 0:
+        raise RuntimeError(f"FFmpeg 编码合并音频失败: {encoder.stderr.read().decode(errors='ignore')}")
     logger.info(f"合并后的音频文件已保存: {output_audio_path}")
 
     return output_audio_path
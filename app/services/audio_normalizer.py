@@ -12,12 +12,183 @@
 import os
 import subprocess
 import tempfile
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List
 from loguru import logger
 from moviepy import AudioFileClip
 from pydub import AudioSegment
 import numpy as np
 
+# 批量响度计算统一使用的采样率（BS.1770 K 加权滤波器系数按 48kHz 给出）
+LOUDNESS_SAMPLE_RATE = 48000
+
+# ITU-R BS.1770 K 加权滤波器（高架滤波 + RLB 高通），48kHz 下的双二阶系数 (b, a)
+_K_WEIGHTING_48K = (
+    ([1.53512485958697, -2.69169618940638, 1.19839281085285],
+     [1.0, -1.69065929318241, 0.73248077421585]),
+    ([1.0, -2.0, 1.0],
+     [1.0, -1.99004745483398, 0.99007225036621]),
+)
+
+# 一次批量计算的最大采样点数（片段数 x 最长片段），控制内存占用
+_MAX_BATCH_SAMPLES = 1 << 24
+
+# 频域滤波时补零的长度（秒），覆盖 IIR 滤波器冲激响应的衰减时间
+_FILTER_TAIL_SECONDS = 0.5
+
+
+def decode_audio_to_array(audio_path: str, sample_rate: int = LOUDNESS_SAMPLE_RATE) -> np.ndarray:
+    """
+    使用 FFmpeg 将音频解码为单声道 float32 数组（取值范围 [-1, 1]）
+
+    Args:
+        audio_path: 音频文件路径
+        sample_rate: 输出采样率
+
+    Returns:
+        np.ndarray: 一维 float32 采样数组
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error',
+        '-i', audio_path,
+        '-vn', '-ac', '1', '-ar', str(sample_rate),
+        '-f', 'f32le', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def open_audio_encoder(output_path: str, sample_rate: int) -> subprocess.Popen:
+    """
+    启动 FFmpeg 编码进程，从 stdin 持续读取单声道 float32 采样并编码为音频文件，
+    适合分块写入、不需要在内存中保留完整时间线的场景
+    """
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-nostats', '-loglevel', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1',
+        '-i', '-',
+        output_path
+    ]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _k_weighting_response(n_fft: int) -> np.ndarray:
+    """计算 K 加权滤波器在 rfft 频点上的频率响应"""
+    z = np.exp(-2j * np.pi * np.arange(n_fft // 2 + 1) / n_fft)
+    response = np.ones_like(z)
+    for b, a in _K_WEIGHTING_48K:
+        response *= (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+    return response
+
+
+def _batch_loudness(signals: List[np.ndarray], sample_rate: int) -> np.ndarray:
+    """计算一批片段的积分响度（所有片段补零到相同长度后整体向量化计算）"""
+    lengths = np.array([len(s) for s in signals])
+    max_len = int(lengths.max())
+    if max_len == 0:
+        return np.full(len(signals), -np.inf)
+
+    # K 加权：频域相乘代替逐点 IIR 滤波，所有片段一次完成
+    n_fft = 1 << int(np.ceil(np.log2(max_len + int(_FILTER_TAIL_SECONDS * sample_rate))))
+    padded = np.zeros((len(signals), max_len), dtype=np.float32)
+    for i, s in enumerate(signals):
+        padded[i, :len(s)] = s
+    spectrum = np.fft.rfft(padded, n=n_fft, axis=1)
+    spectrum *= _k_weighting_response(n_fft)
+    weighted = np.fft.irfft(spectrum, n=n_fft, axis=1)[:, :max_len]
+
+    # 400ms 门限块、75% 重叠，用累加和一次求出所有块的均方值
+    power_cumsum = np.zeros((len(signals), max_len + 1))
+    np.cumsum(np.square(weighted), axis=1, out=power_cumsum[:, 1:])
+
+    block = int(0.4 * sample_rate)
+    hop = int(0.1 * sample_rate)
+    n_blocks = (max_len - block) // hop + 1 if max_len >= block else 1
+    starts = np.arange(n_blocks) * hop
+    ends = np.minimum(starts + block, max_len)
+    block_power = (power_cumsum[:, ends] - power_cumsum[:, starts]) / block
+    valid = (starts[None, :] + block) <= lengths[:, None]
+
+    # 不足 400ms 的片段整体作为一个块
+    short = lengths < block
+    if short.any():
+        short_lengths = lengths[short]
+        block_power[short, 0] = power_cumsum[short, short_lengths] / np.maximum(short_lengths, 1)
+        valid[short, 0] = short_lengths > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+
+        # 绝对门限 -70 LUFS
+        gated = valid & (block_loudness > -70.0)
+        gated_power = np.where(gated, block_power, 0.0).sum(axis=1) / np.maximum(gated.sum(axis=1), 1)
+
+        # 相对门限：比绝对门限内的平均响度低 10 LU
+        relative_threshold = -0.691 + 10 * np.log10(gated_power) - 10.0
+        gated &= block_loudness > relative_threshold[:, None]
+        count = gated.sum(axis=1)
+        gated_power = np.where(gated, block_power, 0.0).sum(axis=1) / np.maximum(count, 1)
+
+        loudness = -0.691 + 10 * np.log10(gated_power)
+    loudness[count == 0] = -np.inf
+    return loudness
+
+
+def batch_integrated_loudness(signals: List[np.ndarray], sample_rate: int = LOUDNESS_SAMPLE_RATE) -> np.ndarray:
+    """
+    按 ITU-R BS.1770 计算多个音频片段的积分响度（LUFS）
+
+    片段按长度排序后分批补零，在每批内向量化完成 K 加权、分块和门限计算，
+    内存占用受 _MAX_BATCH_SAMPLES 限制。
+
+    Args:
+        signals: 单声道 float32 采样数组列表（采样率需为 48kHz）
+        sample_rate: 采样率
+
+    Returns:
+        np.ndarray: 每个片段的积分响度，静音片段为 -inf
+    """
+    if sample_rate != LOUDNESS_SAMPLE_RATE:
+        raise ValueError(f"K 加权滤波器系数仅适用于 {LOUDNESS_SAMPLE_RATE}Hz 采样率")
+
+    loudness = np.full(len(signals), -np.inf)
+    order = sorted(range(len(signals)), key=lambda i: len(signals[i]))
+
+    batch: List[int] = []
+    for index in order:
+        # 按长度升序遍历，当前片段即为批次中最长的片段
+        if batch and (len(batch) + 1) * len(signals[index]) > _MAX_BATCH_SAMPLES:
+            loudness[batch] = _batch_loudness([signals[i] for i in batch], sample_rate)
+            batch = []
+        batch.append(index)
+    if batch:
+        loudness[batch] = _batch_loudness([signals[i] for i in batch], sample_rate)
+    return loudness
+
+
+def loudness_normalization_gains(signals: List[np.ndarray], loudness: np.ndarray, target_lufs: float,
+                                 max_peak: float = -1.0, max_gain_db: float = 12.0) -> np.ndarray:
+    """
+    计算让各片段达到目标响度的线性增益，同时保证峰值不超过 max_peak
+
+    Args:
+        signals: 采样数组列表
+        loudness: 各片段积分响度（LUFS）
+        target_lufs: 目标响度
+        max_peak: 最大峰值 (dBFS)
+        max_gain_db: 增益调整的上下限 (dB)
+
+    Returns:
+        np.ndarray: 每个片段的线性增益，静音片段为 1.0
+    """
+    gain_db = np.clip(target_lufs - loudness, -max_gain_db, max_gain_db)
+    gain_db[~np.isfinite(loudness)] = 0.0
+
+    peaks = np.array([float(np.max(np.abs(s))) if len(s) else 0.0 for s in signals])
+    with np.errstate(divide='ignore'):
+        headroom_db = max_peak - 20 * np.log10(peaks)
+    gain_db = np.minimum(gain_db, headroom_db)
+    return np.power(10.0, gain_db / 20.0)
+
 
 class AudioNormalizer:
     """音频响度分析和标准化工具"""
@@ -95,21 +266,15 @@ class AudioNormalizer:
             float: RMS值 (dB)，如果计算失败返回None
         """
         try:
-            audio = AudioSegment.from_file(audio_path)
-            # 转换为numpy数组
-            samples = np.array(audio.get_array_of_samples())
-            
-            # 如果是立体声，取平均值
-            if audio.channels == 2:
-                samples = samples.reshape((-1, 2))
-                samples = samples.mean(axis=1)
+            # 解码为 float32 单声道数组，取值范围已归一化到 [-1, 1]
+            samples = decode_audio_to_array(audio_path)
             
             # 计算RMS
-            rms = np.sqrt(np.mean(samples**2))
+            rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
             
             # 转换为dB
             if rms > 0:
-                rms_db = 20 * np.log10(rms / (2**15))  # 假设16位音频
+                rms_db = 20 * np.log10(rms)
                 logger.info(f"音频 {os.path.basename(audio_path)} 的RMS: {rms_db:.2f} dB")
                 return rms_db
             else:
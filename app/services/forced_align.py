@@ -0,0 +1,183 @@
+"""
+TTS 音频与文本的强制对齐
+
+SoulVoice、Qwen3、IndexTTS2 等引擎只返回音频，没有逐词时间戳。
+已知解说文本的情况下，在本地根据音频能量检测停顿，把文本按标点切分的短句对齐到停顿上：
+
+- 10ms 一帧计算能量，低于阈值且持续 MIN_PAUSE_MS 以上的区间视为停顿
+- 按字数在有声时长上线性插值得到每个句间边界的期望时间
+- 动态规划为句间边界选择停顿（按顺序、每个停顿最多使用一次），找不到合适停顿的边界使用插值时间
+
+不依赖任何模型，纯 NumPy 计算，耗时远小于音频时长；多个片段的解码在线程池中并行完成。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from edge_tts import SubMaker
+from loguru import logger
+
+from app.services.audio_normalizer import decode_audio_to_array
+
+SAMPLE_RATE = 16000
+FRAME_MS = 10               # 能量分析的帧长（毫秒）
+MIN_PAUSE_MS = 150          # 视为句间停顿的最短静音时长（毫秒）
+SILENCE_RANGE_DB = 30.0     # 低于响亮部分多少 dB 视为静音
+SILENCE_FLOOR_DB = -55.0    # 静音阈值下限 (dBFS)
+
+# 边界没有对应停顿时的代价（以平均句长为单位）
+_UNMATCHED_COST = 1.0
+
+MAX_WORKERS = 4
+
+
+def _frame_energy_db(samples: np.ndarray) -> np.ndarray:
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.zeros(0)
+    frames = samples[:n_frames * frame].reshape(n_frames, frame).astype(np.float64)
+    return 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+
+
+def _find_pauses(voiced: np.ndarray, first: int, last: int) -> List[Tuple[int, int]]:
+    """返回有声区间内的停顿 [(起始帧, 结束帧), ...]"""
+    min_frames = MIN_PAUSE_MS // FRAME_MS
+    silent = ~voiced[first:last + 1]
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    starts = np.where(edges == 1)[0]
+    ends = np.where(edges == -1)[0]
+    return [(first + s, first + e) for s, e in zip(starts, ends) if e - s >= min_frames]
+
+
+def _assign_boundaries(expected: Sequence[float], pauses: Sequence[Tuple[int, int]],
+                       scale: float) -> List[Optional[int]]:
+    """
+    为每个句间边界按顺序选择一个停顿
+
+    Returns:
+        List[Optional[int]]: 每个边界对应的停顿下标，没有合适停顿时为 None
+    """
+    k, p = len(expected), len(pauses)
+    mids = [(s + e) / 2 for s, e in pauses]
+    inf = float("inf")
+    # dp[i][j]: 前 i 个边界使用前 j 个停顿的最小代价
+    dp = [[inf] * (p + 1) for _ in range(k + 1)]
+    back = [[0] * (p + 1) for _ in range(k + 1)]
+    for j in range(p + 1):
+        dp[0][j] = 0.0
+    for i in range(1, k + 1):
+        dp[i][0] = dp[i - 1][0] + _UNMATCHED_COST
+        back[i][0] = 2
+        for j in range(1, p + 1):
+            candidates = (
+                dp[i][j - 1],                                                  # 跳过停顿 j
+                dp[i - 1][j - 1] + abs(mids[j - 1] - expected[i - 1]) / scale,  # 边界 i 使用停顿 j
+                dp[i - 1][j] + _UNMATCHED_COST,                                 # 边界 i 不使用停顿
+            )
+            best = min(range(3), key=candidates.__getitem__)
+            dp[i][j] = candidates[best]
+            back[i][j] = best
+
+    assigned: List[Optional[int]] = [None] * k
+    i, j = k, p
+    while i > 0:
+        step = back[i][j]
+        if step == 0:
+            j -= 1
+        elif step == 1:
+            assigned[i - 1] = j - 1
+            i -= 1
+            j -= 1
+        else:
+            i -= 1
+    return assigned
+
+
+def align_phrases(samples: np.ndarray, phrases: Sequence[str]) -> Optional[List[Tuple[float, float]]]:
+    """
+    把短句对齐到音频上
+
+    Args:
+        samples: 16kHz 单声道 float32 音频
+        phrases: 按顺序排列的短句
+
+    Returns:
+        List[Tuple[float, float]]: 每个短句的 (开始秒数, 结束秒数)；音频为静音时返回 None
+    """
+    energy = _frame_energy_db(samples)
+    if not len(energy) or not phrases:
+        return None
+
+    threshold = max(float(np.percentile(energy, 95)) - SILENCE_RANGE_DB, SILENCE_FLOOR_DB)
+    voiced = energy > threshold
+    voiced_frames = np.flatnonzero(voiced)
+    if not len(voiced_frames):
+        return None
+    first, last = int(voiced_frames[0]), int(voiced_frames[-1])
+    frame_seconds = FRAME_MS / 1000
+
+    if len(phrases) == 1:
+        return [(float(first * frame_seconds), float((last + 1) * frame_seconds))]
+
+    # 按字数在有声时长上插值句间边界的期望位置（单位：帧）
+    weights = np.array([max(1, sum(ch.isalnum() for ch in phrase)) for phrase in phrases], dtype=np.float64)
+    cum_voiced = np.cumsum(voiced[first:last + 1])
+    targets = np.cumsum(weights)[:-1] / weights.sum() * cum_voiced[-1]
+    expected = (first + np.searchsorted(cum_voiced, targets)).tolist()
+
+    pauses = _find_pauses(voiced, first, last)
+    scale = (last - first + 1) / len(phrases)
+    assigned = _assign_boundaries(expected, pauses, scale)
+
+    # 边界落在停顿上时，前一句在停顿开始处结束，后一句在停顿结束处开始
+    starts = [first]
+    ends = []
+    for exp, pause_index in zip(expected, assigned):
+        if pause_index is None:
+            ends.append(exp)
+            starts.append(exp)
+        else:
+            pause_start, pause_end = pauses[pause_index]
+            ends.append(pause_start)
+            starts.append(pause_end)
+    ends.append(last + 1)
+
+    return [(float(s * frame_seconds), float(max(s, e) * frame_seconds)) for s, e in zip(starts, ends)]
+
+
+def align_file(audio_file: str, phrases: Sequence[str]) -> Optional[SubMaker]:
+    """
+    对齐单个音频文件，返回每个短句一条记录的 SubMaker（时间单位为 100 纳秒）
+    """
+    try:
+        samples = decode_audio_to_array(audio_file, SAMPLE_RATE)
+        spans = align_phrases(samples, phrases)
+    except Exception as e:
+        logger.error(f"强制对齐失败 {audio_file}: {str(e)}")
+        return None
+    if spans is None:
+        logger.warning(f"音频中未检测到语音，无法对齐: {audio_file}")
+        return None
+
+    sub_maker = SubMaker()
+    for phrase, (start, end) in zip(phrases, spans):
+        sub_maker.subs.append(phrase)
+        sub_maker.offset.append((int(start * 10000000), int(end * 10000000)))
+    return sub_maker
+
+
+def align_batch(jobs: Sequence[Tuple[str, Sequence[str]]], max_workers: int = MAX_WORKERS) -> List[Optional[SubMaker]]:
+    """
+    批量对齐多个片段
+
+    Args:
+        jobs: [(音频文件, 短句列表), ...]
+
+    Returns:
+        List[Optional[SubMaker]]: 与 jobs 顺序一致，失败的片段为 None
+    """
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        return list(executor.map(lambda job: align_file(*job), jobs))
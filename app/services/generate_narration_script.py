@@ -15,13 +15,64 @@ import asyncio
 from openai import OpenAI
 from loguru import logger
 
+from app.config import config
+from app.utils import async_runtime
 # 导入新的LLM服务模块 - 确保提供商被注册
 import app.services.llm  # 这会触发提供商注册
 from app.services.llm.migration_adapter import generate_narration as generate_narration_new
+from app.services.llm.unified_service import UnifiedLLMService
 # 导入新的提示词管理系统
 from app.services.prompts import PromptManager
 
 
+NARRATION_SYSTEM_PROMPT = "你是一名专业的短视频解说文案撰写专家。"
+DEFAULT_MAP_REDUCE_WINDOW = 300         # 帧分析时长超过该值（秒）时分段生成解说文案，0 表示关闭
+DEFAULT_NARRATION_MAX_CONCURRENCY = 4   # 分段生成时同时在途的请求数
+SEGMENT_ATTEMPTS = 2                    # 每个分段最多请求的次数
+TRANSITION_CONTEXT = 2                  # 衔接润色时每个段落衔接处前后各取的片段数
+OVERVIEW_SUMMARY_CHARS = 100            # 全片概要中每个批次总结保留的字数
+
+
+def _group_frames_by_batch(frame_observations):
+    """按批次组织帧观察数据"""
+    batch_frames = {}
+    for frame in frame_observations:
+        batch_index = frame.get('batch_index')
+        if batch_index not in batch_frames:
+            batch_frames[batch_index] = []
+        batch_frames[batch_index].append(frame)
+    return batch_frames
+
+
+def _render_frame_analysis_markdown(summaries, batch_frames, start_index=1):
+    """把批次总结及其帧观察渲染为 Markdown，片段序号从 start_index 开始"""
+    markdown = ""
+    for i, summary in enumerate(summaries, start_index):
+        batch_index = summary.get('batch_index')
+        time_range = summary.get('time_range', '')
+        batch_summary = summary.get('summary', '')
+
+        markdown += f"## 片段 {i}\n"
+        markdown += f"- 时间范围：{time_range}\n"
+
+        # 添加片段描述
+        markdown += f"- 片段描述：{batch_summary}\n" if batch_summary else f"- 片段描述：\n"
+
+        markdown += "- 详细描述：\n"
+
+        # 添加该批次的帧观察详情
+        frames = batch_frames.get(batch_index, [])
+        for frame in frames:
+            timestamp = frame.get('timestamp', '')
+            observation = frame.get('observation', '')
+
+            # 直接使用原始文本，不进行分割
+            markdown += f"  - {timestamp}: {observation}\n" if observation else f"  - {timestamp}: \n"
+
+        markdown += "\n"
+    return markdown
+
+
 def parse_frame_analysis_to_markdown(json_file_path):
     """
     解析视频帧分析JSON文件并转换为Markdown格式
@@ -38,53 +89,234 @@ def parse_frame_analysis_to_markdown(json_file_path):
         with open(json_file_path, 'r', encoding='utf-8') as file:
             data = json.load(file)
         
-        # 初始化Markdown字符串
-        markdown = ""
-        
         # 获取总结和帧观察数据
         summaries = data.get('overall_activity_summaries', [])
-        frame_observations = data.get('frame_observations', [])
-        
-        # 按批次组织数据
-        batch_frames = {}
-        for frame in frame_observations:
-            batch_index = frame.get('batch_index')
-            if batch_index not in batch_frames:
-                batch_frames[batch_index] = []
-            batch_frames[batch_index].append(frame)
-        
+        batch_frames = _group_frames_by_batch(data.get('frame_observations', []))
+
         # 生成Markdown内容
-        for i, summary in enumerate(summaries, 1):
-            batch_index = summary.get('batch_index')
-            time_range = summary.get('time_range', '')
-            batch_summary = summary.get('summary', '')
-            
-            markdown += f"## 片段 {i}\n"
-            markdown += f"- 时间范围：{time_range}\n"
-            
-            # 添加片段描述
-            markdown += f"- 片段描述：{batch_summary}\n" if batch_summary else f"- 片段描述：\n"
-            
-            markdown += "- 详细描述：\n"
-            
-            # 添加该批次的帧观察详情
-            frames = batch_frames.get(batch_index, [])
-            for frame in frames:
-                timestamp = frame.get('timestamp', '')
-                observation = frame.get('observation', '')
-                
-                # 直接使用原始文本，不进行分割
-                markdown += f"  - {timestamp}: {observation}\n" if observation else f"  - {timestamp}: \n"
-            
-            markdown += "\n"
-        
-        return markdown
+        return _render_frame_analysis_markdown(summaries, batch_frames)
     
     except Exception as e:
         return f"处理JSON文件时出错: {traceback.format_exc()}"
 
 
-def generate_narration(markdown_content, api_key, base_url, model):
+def split_frame_analysis(data, window_seconds):
+    """
+    按时间窗口把帧分析结果切分为若干段，同一批次不会被拆开
+
+    :param data: 帧分析结果（包含 overall_activity_summaries 和 frame_observations）
+    :param window_seconds: 每段的时长（秒）
+    :return: 每段的批次总结列表
+    """
+    summaries = data.get('overall_activity_summaries', [])
+    batch_frames = _group_frames_by_batch(data.get('frame_observations', []))
+
+    segments = []
+    segment_start = None
+    for summary in summaries:
+        seconds = [frame.get('timestamp_seconds') for frame in batch_frames.get(summary.get('batch_index'), [])]
+        seconds = [value for value in seconds if isinstance(value, (int, float))]
+        batch_start = min(seconds) if seconds else None
+
+        if segment_start is None:
+            segment_start = batch_start
+        elif batch_start is not None and batch_start - segment_start >= window_seconds:
+            segments.append([])
+            segment_start = batch_start
+        if not segments:
+            segments.append([])
+        segments[-1].append(summary)
+    return segments
+
+
+def _video_overview(summaries):
+    """全片概要：每个批次的时间范围和总结，作为各分段共享的上下文"""
+    lines = []
+    for summary in summaries:
+        text = summary.get('summary', '')
+        if len(text) > OVERVIEW_SUMMARY_CHARS:
+            text = text[:OVERVIEW_SUMMARY_CHARS] + "…"
+        lines.append(f"- {summary.get('time_range', '')}: {text}")
+    return "\n".join(lines)
+
+
+def _segment_position(index, count, summaries):
+    if index == 0:
+        role = "第一段"
+    elif index == count - 1:
+        role = "最后一段"
+    else:
+        role = "中间段"
+    start = summaries[0].get('time_range', '').split('-')[0]
+    end = summaries[-1].get('time_range', '').split('-')[-1]
+    return f"这是全片 {count} 段中的第 {index + 1} 段（{role}），时间范围：{start}-{end}"
+
+
+def _parse_narration_items(result):
+    from webui.tools.generate_short_summary import parse_and_fix_json
+
+    data = parse_and_fix_json(result)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise ValueError("返回内容中没有 items")
+    return [item for item in items if isinstance(item, dict)]
+
+
+async def _generate_segment_narration(index, segments, batch_frames, overview, semaphore):
+    summaries = segments[index]
+    start_index = 1 + sum(len(segment) for segment in segments[:index])
+    prompt = PromptManager.get_prompt(
+        category="documentary",
+        name="narration_segment_generation",
+        parameters={
+            "video_overview": overview,
+            "segment_position": _segment_position(index, len(segments), summaries),
+            "video_frame_description": _render_frame_analysis_markdown(summaries, batch_frames, start_index),
+        }
+    )
+
+    async with semaphore:
+        for attempt in range(SEGMENT_ATTEMPTS):
+            try:
+                result = await UnifiedLLMService.generate_text(
+                    prompt=prompt,
+                    system_prompt=NARRATION_SYSTEM_PROMPT,
+                    temperature=1.5,
+                    response_format="json"
+                )
+                items = _parse_narration_items(result)
+                break
+            except Exception as e:
+                if attempt == SEGMENT_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"第 {index + 1} 段解说文案生成失败，重试: {str(e)}")
+
+    logger.info(f"第 {index + 1}/{len(segments)} 段解说文案生成完成，共 {len(items)} 个片段")
+    return items
+
+
+async def _polish_transitions(items):
+    """轻量的 reduce：只把段落衔接处的片段交给模型润色，失败时保留原文"""
+    boundary_ids = []
+    for i in range(len(items) - 1):
+        if items[i]['_segment'] == items[i + 1]['_segment']:
+            continue
+        for item in items[max(0, i - TRANSITION_CONTEXT + 1):i + 1 + TRANSITION_CONTEXT]:
+            if item['_id'] not in boundary_ids:
+                boundary_ids.append(item['_id'])
+    if not boundary_ids:
+        return items
+
+    by_id = {item['_id']: item for item in items}
+    payload = [
+        {
+            "_id": item_id,
+            "segment": by_id[item_id]['_segment'] + 1,
+            "timestamp": by_id[item_id].get('timestamp', ''),
+            "narration": by_id[item_id].get('narration', ''),
+        }
+        for item_id in boundary_ids
+    ]
+    prompt = PromptManager.get_prompt(
+        category="documentary",
+        name="narration_transition_polish",
+        parameters={"narration_items": json.dumps(payload, ensure_ascii=False, indent=2)}
+    )
+
+    try:
+        result = await UnifiedLLMService.generate_text(
+            prompt=prompt,
+            system_prompt=NARRATION_SYSTEM_PROMPT,
+            temperature=0.7,
+            response_format="json"
+        )
+        polished = _parse_narration_items(result)
+    except Exception as e:
+        logger.warning(f"解说文案衔接润色失败，保留分段生成结果: {str(e)}")
+        return items
+
+    updated = 0
+    for polished_item in polished:
+        try:
+            item_id = int(polished_item.get('_id'))
+        except (TypeError, ValueError):
+            continue
+        narration = polished_item.get('narration')
+        if item_id in boundary_ids and isinstance(narration, str) and narration.strip():
+            by_id[item_id]['narration'] = narration.strip()
+            updated += 1
+    logger.info(f"解说文案衔接润色完成，更新了 {updated}/{len(boundary_ids)} 个片段")
+    return items
+
+
+async def _generate_narration_map_reduce(segments, batch_frames, max_concurrency, emit):
+    overview = _video_overview([summary for segment in segments for summary in segment])
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # map：各段共享全片概要，并行生成；某一段重试后仍失败时取消其余各段，不再为会被丢弃的结果付费
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(_generate_segment_narration(index, segments, batch_frames, overview, semaphore))
+                for index in range(len(segments))
+            ]
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+    results = [task.result() for task in tasks]
+
+    # 按段落顺序拼接，统一重新编号
+    items = []
+    for segment_index, segment_items in enumerate(results):
+        for item in segment_items:
+            items.append({**item, "_id": len(items) + 1, "_segment": segment_index})
+
+    # reduce：润色段落衔接处；结果确定后再逐个交给回调，失败改为整体生成时不会重复输出
+    items = await _polish_transitions(items)
+    items = [{key: value for key, value in item.items() if key != '_segment'} for item in items]
+    for item in items:
+        emit(item)
+    return items
+
+
+def generate_narration_from_analysis(json_file_path, api_key, base_url, model, on_item=None):
+    """
+    根据视频帧分析 JSON 文件生成解说文案
+
+    帧分析的时长超过 [app] narration_map_reduce_window 时，按时间窗口切分后并行生成各段文案（map），
+    再润色段落衔接处（reduce）；否则整体一次生成。
+
+    :param json_file_path: 帧分析 JSON 文件路径
+    :param api_key: API密钥
+    :param base_url: API基础URL
+    :param model: 使用的模型名称
+    :param on_item: 可选，每个解说片段确定后的回调（在调用线程中执行）
+    :return: 解说文案 JSON 字符串（{"items": [...]}）
+    """
+    window_seconds = float(config.app.get('narration_map_reduce_window', DEFAULT_MAP_REDUCE_WINDOW))
+    segments = []
+    if window_seconds > 0 and os.path.exists(json_file_path):
+        with open(json_file_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        segments = split_frame_analysis(data, window_seconds)
+
+    if len(segments) > 1:
+        max_concurrency = max(1, int(config.app.get('narration_max_concurrency', DEFAULT_NARRATION_MAX_CONCURRENCY)))
+        logger.info(f"按 {window_seconds:.0f} 秒切分为 {len(segments)} 段并行生成解说文案，并发数: {max_concurrency}")
+        batch_frames = _group_frames_by_batch(data.get('frame_observations', []))
+        try:
+            items = async_runtime.run_with_events(
+                lambda emit: _generate_narration_map_reduce(segments, batch_frames, max_concurrency, emit),
+                on_item or (lambda item: None)
+            )
+            return json.dumps({"items": items}, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"分段生成解说文案失败，改为整体生成: {str(e)}")
+
+    markdown_content = parse_frame_analysis_to_markdown(json_file_path)
+    return generate_narration(markdown_content, api_key, base_url, model, on_item=on_item)
+
+
+def generate_narration(markdown_content, api_key, base_url, model, on_item=None):
     """
     调用大模型API根据视频帧分析的Markdown内容生成解说文案 - 已重构为使用新的LLM服务架构
 
@@ -92,12 +324,13 @@ def generate_narration(markdown_content, api_key, base_url, model):
     :param api_key: API密钥
     :param base_url: API基础URL
     :param model: 使用的模型名称
+    :param on_item: 可选，流式生成时每个解说片段完成后的回调
     :return: 生成的解说文案
     """
     try:
         # 优先使用新的LLM服务架构
         logger.info("使用新的LLM服务架构生成解说文案")
-        result = generate_narration_new(markdown_content, api_key, base_url, model)
+        result = generate_narration_new(markdown_content, api_key, base_url, model, on_item=on_item)
         return result
 
     except Exception as e:
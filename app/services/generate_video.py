@@ -21,12 +21,12 @@ from moviepy import (
     TextClip,
     afx
 )
-from moviepy.video.tools.subtitles import SubtitlesClip
 from PIL import ImageFont
 
 from app.utils import utils
 from app.models.schema import AudioVolumeDefaults
 from app.services.audio_normalizer import AudioNormalizer, normalize_audio_for_mixing
+from app.services.subtitle_track import SubtitleTrack
 
 
 def is_valid_subtitle_file(subtitle_path: str) -> bool:
@@ -43,21 +43,8 @@ def is_valid_subtitle_file(subtitle_path: str) -> bool:
         return False
 
     try:
-        with open(subtitle_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-
-        # 检查文件是否为空
-        if not content:
-            return False
-
-        # 检查是否包含时间戳格式（SRT格式的基本特征）
-        # SRT格式应该包含类似 "00:00:00,000 --> 00:00:00,000" 的时间戳
-        import re
-        time_pattern = r'\d{2}:\d{2}:\d{2},\d{3}\s*-->\s*\d{2}:\d{2}:\d{2},\d{3}'
-        if not re.search(time_pattern, content):
-            return False
-
-        return True
+        # 至少包含一条带时间轴的字幕
+        return len(SubtitleTrack.load(subtitle_path)) > 0
     except Exception as e:
         logger.warning(f"检查字幕文件时出错: {str(e)}")
         return False
@@ -69,7 +56,8 @@ def merge_materials(
     output_path: str,
     subtitle_path: Optional[str] = None,
     bgm_path: Optional[str] = None,
-    options: Optional[Dict[str, Any]] = None
+    options: Optional[Dict[str, Any]] = None,
+    subtitle_track: Optional[SubtitleTrack] = None
 ) -> str:
     """
     合并视频、音频、BGM和字幕素材生成最终视频
@@ -96,6 +84,7 @@ def merge_materials(
             - threads: 处理线程数，默认2
             - fps: 输出帧率，默认30
             - subtitle_enabled: 是否启用字幕，默认True
+        subtitle_track: 内存中的字幕轨道，可选；提供时优先于 subtitle_path，不再读取字幕文件
             
     返回:
         输出视频的路径
@@ -271,7 +260,7 @@ def merge_materials(
     
     # 处理字体路径
     font_path = None
-    if subtitle_path and subtitle_font:
+    if (subtitle_path or subtitle_track is not None) and subtitle_font:
         font_path = os.path.join(utils.font_dir(), subtitle_font)
         if os.name == "nt":
             font_path = font_path.replace("\\", "/")
@@ -343,30 +332,19 @@ def merge_materials(
             
         return _clip
         
-    # 创建TextClip工厂函数
-    def make_textclip(text):
-        return TextClip(
-            text=text,
-            font=font_path,
-            font_size=subtitle_font_size,
-            color=subtitle_color,
-        )
-    
     # 处理字幕 - 修复字幕开关bug和空字幕文件问题
-    if subtitle_enabled and subtitle_path:
-        if is_valid_subtitle_file(subtitle_path):
-            logger.info("字幕已启用，开始处理字幕文件")
+    if subtitle_enabled and (subtitle_path or subtitle_track is not None):
+        if subtitle_track is not None or is_valid_subtitle_file(subtitle_path):
+            logger.info("字幕已启用，开始处理字幕")
             try:
-                # 加载字幕文件
-                sub = SubtitlesClip(
-                    subtitles=subtitle_path,
-                    encoding="utf-8",
-                    make_textclip=make_textclip
-                )
+                # 优先使用内存中的字幕轨道，否则加载字幕文件
+                if subtitle_track is None:
+                    subtitle_track = SubtitleTrack.load(subtitle_path)
+                sub = subtitle_track.non_empty()
 
                 # 创建每个字幕片段
                 text_clips = []
-                for item in sub.subtitles:
+                for item in sub.cues():
                     clip = create_text_clip(subtitle_item=item)
                     text_clips.append(clip)
 
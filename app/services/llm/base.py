@@ -5,7 +5,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Union
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
@@ -177,6 +177,27 @@ class TextModelProvider(BaseLLMProvider):
         """
         pass
     
+    async def stream_text(self,
+                          prompt: str,
+                          system_prompt: Optional[str] = None,
+                          temperature: float = 1.0,
+                          max_tokens: Optional[int] = None,
+                          response_format: Optional[str] = None,
+                          **kwargs) -> AsyncIterator[str]:
+        """
+        流式生成文本，逐个返回文本片段
+
+        默认实现不支持流式输出，完整生成后一次性返回；支持流式的提供商应重写此方法
+        """
+        yield await self.generate_text(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            **kwargs
+        )
+
     def _build_messages(self, prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
         """构建消息列表"""
         messages = []
@@ -90,7 +90,7 @@ class ModelNotSupportedError(LLMServiceError):
 class RateLimitError(LLMServiceError):
     """API速率限制异常"""
     
-    def __init__(self, message: str = "API调用频率超限", retry_after: Optional[int] = None):
+    def __init__(self, message: str = "API调用频率超限", retry_after: Optional[float] = None):
         super().__init__(
             message=message,
             error_code="RATE_LIMIT_ERROR",
@@ -0,0 +1,129 @@
+"""
+视觉模型请求的图片预处理
+
+把图片统一转换成 base64 编码的 JPEG：
+
+- 解码、缩放、JPEG 编码和 base64 编码都在线程池中完成，不阻塞事件循环上的网络请求
+- 源文件本身就是尺寸合适的 JPEG 时直接使用文件字节，不重新编码
+- 文件的编码结果按 (路径, 修改时间, 大小) 缓存，重试或重复分析同一批关键帧时直接复用
+"""
+
+import asyncio
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+import PIL.Image
+from loguru import logger
+
+MAX_IMAGE_SIDE = 1024   # 长边超过该值时缩小
+JPEG_QUALITY = 85
+MAX_WORKERS = min(8, (os.cpu_count() or 2))
+
+_PAYLOAD_CACHE_SIZE = 512
+
+
+class ImagePayload(NamedTuple):
+    data: str       # base64 编码的 JPEG
+    width: int
+    height: int
+
+
+_payload_cache: "OrderedDict[tuple, ImagePayload]" = OrderedDict()
+_payload_cache_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="image-payload")
+    return _executor
+
+
+def _file_signature(file_path: str) -> tuple:
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+
+def _cached_payload(key: tuple) -> Optional[ImagePayload]:
+    with _payload_cache_lock:
+        payload = _payload_cache.get(key)
+        if payload is not None:
+            _payload_cache.move_to_end(key)
+        return payload
+
+
+def _cache_payload(key: tuple, payload: ImagePayload):
+    with _payload_cache_lock:
+        _payload_cache[key] = payload
+        _payload_cache.move_to_end(key)
+        while len(_payload_cache) > _PAYLOAD_CACHE_SIZE:
+            _payload_cache.popitem(last=False)
+
+
+def _encode_pil(img: PIL.Image.Image) -> ImagePayload:
+    if img.size[0] > MAX_IMAGE_SIDE or img.size[1] > MAX_IMAGE_SIDE:
+        img = img.copy()
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), PIL.Image.Resampling.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return ImagePayload(base64.b64encode(buffer.getvalue()).decode("utf-8"), *img.size)
+
+
+def _encode_file(file_path: str) -> ImagePayload:
+    with PIL.Image.open(file_path) as img:
+        # 只读取了文件头，尺寸合适的 JPEG 直接使用原始字节
+        if (img.format == "JPEG" and img.mode in ("RGB", "L")
+                and img.size[0] <= MAX_IMAGE_SIDE and img.size[1] <= MAX_IMAGE_SIDE):
+            with open(file_path, "rb") as f:
+                return ImagePayload(base64.b64encode(f.read()).decode("utf-8"), *img.size)
+        img.load()
+        return _encode_pil(img)
+
+
+def encode_image(img: Union[str, Path, PIL.Image.Image]) -> ImagePayload:
+    """把图片转换成 base64 编码的 JPEG（长边不超过 MAX_IMAGE_SIDE）"""
+    if isinstance(img, PIL.Image.Image):
+        return _encode_pil(img)
+    if not isinstance(img, (str, Path)):
+        raise TypeError(f"不支持的图片类型: {type(img)}")
+
+    file_path = str(img)
+    key = _file_signature(file_path)
+    payload = _cached_payload(key)
+    if payload is None:
+        payload = _encode_file(file_path)
+        _cache_payload(key, payload)
+    return payload
+
+
+async def encode_images(images: List[Union[str, Path, PIL.Image.Image]]) -> List[Optional[ImagePayload]]:
+    """
+    在线程池中并行编码多张图片
+
+    Returns:
+        List[Optional[ImagePayload]]: 与 images 顺序一致，处理失败的图片为 None
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    futures = [loop.run_in_executor(executor, encode_image, img) for img in images]
+    payloads = []
+    for img, result in zip(images, await asyncio.gather(*futures, return_exceptions=True)):
+        if isinstance(result, Exception):
+            logger.error(f"加载图片失败 {img}: {str(result)}")
+            payloads.append(None)
+        else:
+            payloads.append(result)
+    return payloads
@@ -0,0 +1,116 @@
+"""
+流式输出的增量 JSON 解析
+
+解说文案等接口返回 {"items": [{...}, {...}]} 结构的 JSON。流式生成时把收到的文本片段依次交给
+IncrementalItemsParser.feed()，items 数组中的每个元素一旦完整就会被解析返回，
+不必等整个响应结束，下游（界面展示、校验等）可以提前开始处理。
+
+- 只扫描新收到的文本，整体耗时与响应长度成线性关系
+- 第一个 { 或 [ 之前的内容（如 ```json 标记）被忽略；顶层直接是数组时把它当作 items
+- 元素解析失败时尝试修复 LLM 常见的双大括号问题，仍失败则跳过（以最终的完整解析为准）
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+class IncrementalItemsParser:
+    """从流式文本中逐个提取 items 数组的元素"""
+
+    def __init__(self, key: str = "items"):
+        self.key = key
+        self._buffer: List[str] = []
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._items_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self.finished = False
+        self.count = 0
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整文本"""
+        if self._buffer:
+            self._text += "".join(self._buffer)
+            self._buffer.clear()
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加文本片段，返回本次新完成的元素"""
+        if not chunk:
+            return []
+        self._buffer.append(chunk)
+        if self.finished:
+            return []
+
+        text = self.text
+        items = []
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":":
+                if stack and stack[-1] == "{":
+                    self._current_key = self._last_string
+            elif c == ",":
+                self._current_key = None
+            elif c in "{[":
+                if c == "[" and self._items_depth is None and (
+                        not stack or (stack[-1] == "{" and self._current_key == self.key)):
+                    stack.append(c)
+                    self._items_depth = len(stack)
+                    continue
+                if c == "{" and self._items_depth is not None and len(stack) == self._items_depth:
+                    self._element_start = i
+                stack.append(c)
+                self._current_key = None
+            elif c in "}]":
+                if not stack:
+                    continue
+                stack.pop()
+                if self._items_depth is None:
+                    continue
+                if c == "}" and len(stack) == self._items_depth and self._element_start is not None:
+                    item = self._parse_element(text[self._element_start:i + 1])
+                    self._element_start = None
+                    if item is not None:
+                        items.append(item)
+                elif len(stack) < self._items_depth:
+                    self.finished = True
+                    break
+
+        self._pos = len(text)
+        self.count += len(items)
+        return items
+
+    @staticmethod
+    def _parse_element(element: str) -> Optional[Dict[str, Any]]:
+        for candidate in (element, element.replace("{{", "{").replace("}}", "}")):
+            try:
+                item = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict):
+                return item
+        logger.debug(f"流式解析跳过无法解析的元素: {element[:80]}")
+        return None
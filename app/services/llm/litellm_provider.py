@@ -6,9 +6,10 @@ LiteLLM 统一提供商实现
 """
 
 import asyncio
-import base64
-import io
-from typing import List, Dict, Any, Optional, Union
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
@@ -27,6 +28,7 @@ except ImportError:
     raise
 
 from .base import VisionModelProvider, TextModelProvider
+from . import image_payload, telemetry, vision_batching
 from .exceptions import (
     APICallError,
     AuthenticationError,
@@ -56,6 +58,151 @@ def configure_litellm():
 configure_litellm()
 
 
+DEFAULT_VISION_MAX_CONCURRENCY = 4  # 视觉分析同时在途的批次请求数
+VISION_BATCH_ATTEMPTS = 3           # 每个批次最多请求的轮数（首轮 + 失败批次重试）
+RATE_LIMIT_BASE_DELAY = 2.0         # 速率限制退避的基础等待时间（秒）
+RATE_LIMIT_MAX_DELAY = 60.0
+
+# 重试也不会成功的错误
+_NON_RETRYABLE_ERRORS = (AuthenticationError, ContentFilterError)
+
+
+def _vision_max_concurrency() -> int:
+    from app.config import config
+
+    return int(config.app.get('vision_max_concurrency', DEFAULT_VISION_MAX_CONCURRENCY))
+
+
+def _vision_adaptive_batching() -> bool:
+    from app.config import config
+
+    return bool(config.frames.get('vision_adaptive_batching', False))
+
+
+async def _tracked_completion(kind: str, provider, retry: int = 0, **completion_kwargs):
+    """调用 acompletion 并记录 token、费用、延迟等遥测指标"""
+    started = time.monotonic()
+    try:
+        response = await acompletion(**completion_kwargs)
+    except Exception as e:
+        telemetry.record_call(kind, provider.provider_name, provider.model_name,
+                              latency=time.monotonic() - started, retry=retry, error=e)
+        raise
+    telemetry.record_response(kind, provider.provider_name, provider.model_name, response, started, retry)
+    return response
+
+
+async def _tracked_stream(provider, completion_kwargs: Dict[str, Any]) -> AsyncIterator[str]:
+    """流式调用 acompletion，逐个返回文本片段，结束后记录遥测指标"""
+    started = time.monotonic()
+    retry = 0
+    usage = None
+    chunks = []
+    try:
+        try:
+            response = await acompletion(stream=True, **completion_kwargs)
+        except LiteLLMBadRequestError as e:
+            if "response_format" not in str(e) or "response_format" not in completion_kwargs:
+                raise
+            logger.warning(f"模型不支持 response_format，重试不带格式约束的请求")
+            completion_kwargs.pop("response_format", None)
+            completion_kwargs["messages"][-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+            retry = 1
+            response = await acompletion(stream=True, **completion_kwargs)
+
+        async for chunk in response:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                chunks.append(content)
+                yield content
+    except Exception as e:
+        telemetry.record_call("stream", provider.provider_name, provider.model_name,
+                              latency=time.monotonic() - started, retry=retry, error=e)
+        raise
+
+    # 流式响应的 usage 只在部分提供商的最后一个片段中返回，没有时按文本估算
+    model = completion_kwargs["model"]
+    if usage and getattr(usage, "prompt_tokens", None):
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens or 0
+    else:
+        try:
+            prompt_tokens = litellm.token_counter(model=model, messages=completion_kwargs["messages"])
+            completion_tokens = litellm.token_counter(model=model, text="".join(chunks))
+        except Exception:
+            prompt_tokens, completion_tokens = 0, 0
+    telemetry.record_call(
+        "stream", provider.provider_name, provider.model_name,
+        latency=time.monotonic() - started,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=telemetry.token_cost(model, prompt_tokens, completion_tokens),
+        retry=retry,
+    )
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从 LiteLLM 速率限制异常或其响应头（Retry-After / retry-after-ms）中提取建议等待的秒数"""
+    value = getattr(error, "retry_after", None)
+    if value:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+
+    headers = getattr(error, "litellm_response_headers", None)
+    if not headers:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    headers = {str(k).lower(): v for k, v in dict(headers).items()}
+
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, TypeError, ValueError):
+        pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    # Retry-After 也可以是 HTTP 日期
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_limit_error(error: Exception) -> RateLimitError:
+    logger.error(f"LiteLLM 速率限制: {str(error)}")
+    return RateLimitError(retry_after=_retry_after(error))
+
+
+class _RateLimitBackoff:
+    """并发批次共享的速率限制退避：触发后所有批次等待到同一时间点再发请求"""
+
+    def __init__(self):
+        self._resume_at = 0.0
+
+    def trigger(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after:
+            delay = float(retry_after)
+        else:
+            delay = min(RATE_LIMIT_BASE_DELAY * (2 ** attempt), RATE_LIMIT_MAX_DELAY) * random.uniform(1.0, 1.5)
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    async def wait(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
 class LiteLLMVisionProvider(VisionModelProvider):
     """使用 LiteLLM 的统一视觉模型提供商"""
 
@@ -138,40 +285,128 @@ class LiteLLMVisionProvider(VisionModelProvider):
         Args:
             images: 图片路径列表或PIL图片对象列表
             prompt: 分析提示词
-            batch_size: 批处理大小
-            **kwargs: 其他参数
+            batch_size: 批处理大小（自适应分批时为初始大小）
+            **kwargs: 其他参数，max_concurrency 覆盖最大并发数，adaptive_batching 覆盖是否自适应分批
 
         Returns:
-            分析结果列表
+            分析结果列表（BatchResponse，附带批次对应的图片范围）
         """
         logger.info(f"开始使用 LiteLLM ({self.model_name}) 分析 {len(images)} 张图片")
 
-        # 预处理图片
-        processed_images = self._prepare_images(images)
-
-        # 分批处理
-        results = []
-        for i in range(0, len(processed_images), batch_size):
-            batch = processed_images[i:i + batch_size]
-            logger.info(f"处理第 {i//batch_size + 1} 批，共 {len(batch)} 张图片")
-
+        # 预处理图片（线程池中并行解码、缩放和编码），处理失败的图片跳过
+        encoded = await image_payload.encode_images(images)
+        image_indices = [i for i, payload in enumerate(encoded) if payload is not None]
+        payloads = [encoded[i] for i in image_indices]
+
+        # 多个批次并发请求，同时在途的请求数受信号量限制
+        max_concurrency = max(1, int(kwargs.pop("max_concurrency", None) or _vision_max_concurrency()))
+        adaptive = kwargs.pop("adaptive_batching", None)
+        if adaptive is None:
+            adaptive = _vision_adaptive_batching()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        backoff = _RateLimitBackoff()
+        sizer = self._create_batch_sizer(payloads, batch_size) if adaptive else None
+
+        # 批次为 payloads 中的 [start, end) 范围；自适应模式下在发出请求时才确定下一批的大小
+        if sizer is None:
+            batches = [(i, min(i + batch_size, len(payloads))) for i in range(0, len(payloads), batch_size)]
+        else:
+            batches = []
+        results: Dict[int, str] = {}
+        errors: Dict[int, Exception] = {}
+        cursor = 0
+
+        async def run_batch(batch_index: int, attempt: int):
+            start, end = batches[batch_index]
+            # 任一批次触发速率限制后，所有批次一起等待
+            await backoff.wait()
+            logger.info(f"处理第 {batch_index + 1} 批，共 {end - start} 张图片")
+            began = time.monotonic()
             try:
-                result = await self._analyze_batch(batch, prompt, **kwargs)
-                results.append(result)
+                batch = [payload.data for payload in payloads[start:end]]
+                results[batch_index] = await self._analyze_batch(batch, prompt, retry=attempt, **kwargs)
+                errors.pop(batch_index, None)
+                if sizer is not None:
+                    sizer.record_success(time.monotonic() - began)
+            except RateLimitError as e:
+                errors[batch_index] = e
+                delay = backoff.trigger(attempt, e.details.get("retry_after"))
+                logger.warning(f"批次 {batch_index + 1} 触发速率限制，{delay:.1f}s 后继续")
             except Exception as e:
-                logger.error(f"批次 {i//batch_size + 1} 处理失败: {str(e)}")
-                results.append(f"批次处理失败: {str(e)}")
-
-        return results
-
-    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str, **kwargs) -> str:
-        """分析一批图片"""
+                errors[batch_index] = e
+                if sizer is not None:
+                    sizer.record_failure(e)
+
+        async def run_fixed(batch_index: int, attempt: int):
+            async with semaphore:
+                await run_batch(batch_index, attempt)
+
+        async def run_adaptive():
+            nonlocal cursor
+            while True:
+                async with semaphore:
+                    if cursor >= len(payloads):
+                        return
+                    # 取得信号量后再按当前批次大小切出下一批，批次下标与图片顺序一致
+                    start, cursor = cursor, sizer.next_end(cursor)
+                    batches.append((start, cursor))
+                    await run_batch(len(batches) - 1, 0)
+
+        logger.info(f"最大并发数: {max_concurrency}，{'自适应分批' if sizer else f'共 {len(batches)} 批'}")
+        if sizer is None:
+            await asyncio.gather(*(run_fixed(i, 0) for i in range(len(batches))))
+        else:
+            await asyncio.gather(*(run_adaptive() for _ in range(max_concurrency)))
+
+        # 只重试失败且可以重试的批次
+        for attempt in range(1, VISION_BATCH_ATTEMPTS):
+            pending = [i for i in sorted(errors) if not isinstance(errors[i], _NON_RETRYABLE_ERRORS)]
+            if not pending:
+                break
+            logger.warning(f"第 {attempt} 次重试失败的批次: {[i + 1 for i in pending]}")
+            await asyncio.gather(*(run_fixed(i, attempt) for i in pending))
+
+        # 结果按批次顺序返回，下标即 batch_index，并附带批次对应的原始图片范围
+        responses = []
+        for batch_index, (start, end) in enumerate(batches):
+            if batch_index in errors:
+                e = errors[batch_index]
+                logger.error(f"批次 {batch_index + 1} 处理失败: {str(e)}")
+                text = f"批次处理失败: {str(e)}"
+            else:
+                text = results[batch_index]
+            responses.append(vision_batching.BatchResponse(text, image_indices[start], image_indices[end - 1] + 1))
+        return responses
+
+    def _create_batch_sizer(self, payloads: List[image_payload.ImagePayload],
+                            batch_size: int) -> vision_batching.AdaptiveBatchSizer:
+        from app.config import config
+
+        image_tokens = [
+            vision_batching.estimate_image_tokens(payload.width, payload.height, self.model_name)
+            for payload in payloads
+        ]
+        token_budget = vision_batching.model_token_budget(
+            self.model_name, config.frames.get("vision_batch_token_budget", 0)
+        )
+        max_size = int(config.frames.get("vision_max_batch_size", 0) or max(batch_size, vision_batching.DEFAULT_MAX_BATCH_SIZE))
+        logger.info(f"自适应分批: token 预算 {token_budget}，单张图片约 {max(image_tokens, default=0)} tokens，"
+                    f"初始批次大小 {batch_size}，上限 {max_size}")
+        return vision_batching.AdaptiveBatchSizer(
+            image_tokens,
+            token_budget=token_budget,
+            initial_size=batch_size,
+            max_size=max_size,
+            target_latency=float(config.frames.get("vision_batch_target_latency", vision_batching.DEFAULT_TARGET_LATENCY)),
+        )
+
+    async def _analyze_batch(self, batch: List[str], prompt: str, retry: int = 0, **kwargs) -> str:
+        """分析一批图片（batch 为 base64 编码的 JPEG），retry 为该批次的重试序号"""
         # 构建 LiteLLM 格式的消息
         content = [{"type": "text", "text": prompt}]
 
         # 添加图片（使用 base64 编码）
-        for img in batch:
-            base64_image = self._image_to_base64(img)
+        for base64_image in batch:
             content.append({
                 "type": "image_url",
                 "image_url": {
@@ -223,7 +458,7 @@ class LiteLLMVisionProvider(VisionModelProvider):
             if "api_base" in kwargs:
                 completion_kwargs["api_base"] = kwargs["api_base"]
 
-            response = await acompletion(**completion_kwargs)
+            response = await _tracked_completion("vision", self, retry=retry, **completion_kwargs)
 
             if response.choices and len(response.choices) > 0:
                 content = response.choices[0].message.content
@@ -236,8 +471,7 @@ class LiteLLMVisionProvider(VisionModelProvider):
             logger.error(f"LiteLLM 认证失败: {str(e)}")
             raise AuthenticationError()
         except LiteLLMRateLimitError as e:
-            logger.error(f"LiteLLM 速率限制: {str(e)}")
-            raise RateLimitError()
+            raise _rate_limit_error(e)
         except LiteLLMBadRequestError as e:
             error_msg = str(e)
             if "SAFETY" in error_msg.upper() or "content_filter" in error_msg.lower():
@@ -253,10 +487,7 @@ class LiteLLMVisionProvider(VisionModelProvider):
 
     def _image_to_base64(self, img: PIL.Image.Image) -> str:
         """将PIL图片转换为base64编码"""
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='JPEG', quality=85)
-        img_bytes = img_buffer.getvalue()
-        return base64.b64encode(img_bytes).decode('utf-8')
+        return image_payload.encode_image(img).data
 
     async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """兼容基类接口（实际使用 LiteLLM SDK）"""
@@ -367,6 +598,108 @@ class LiteLLMTextProvider(TextModelProvider):
         Returns:
             生成的文本内容
         """
+        completion_kwargs = self._build_completion_kwargs(
+            prompt, system_prompt, temperature, max_tokens, response_format, **kwargs
+        )
+        messages = completion_kwargs["messages"]
+
+        try:
+            # 调用 LiteLLM（自动重试）
+            response = await _tracked_completion("text", self, **completion_kwargs)
+
+            if response.choices and len(response.choices) > 0:
+                content = response.choices[0].message.content
+
+                # 清理可能的 markdown 代码块（针对不支持 JSON mode 的模型）
+                if response_format == "json" and "response_format" not in completion_kwargs:
+                    content = self._clean_json_output(content)
+
+                logger.debug(f"LiteLLM 调用成功，消耗 tokens: {response.usage.total_tokens if response.usage else 'N/A'}")
+                return content
+            else:
+                raise APICallError("LiteLLM 返回空响应")
+
+        except LiteLLMAuthError as e:
+            logger.error(f"LiteLLM 认证失败: {str(e)}")
+            raise AuthenticationError()
+        except LiteLLMRateLimitError as e:
+            raise _rate_limit_error(e)
+        except LiteLLMBadRequestError as e:
+            error_msg = str(e)
+            # 处理不支持 response_format 的情况
+            if "response_format" in error_msg and response_format == "json":
+                logger.warning(f"模型不支持 response_format，重试不带格式约束的请求")
+                completion_kwargs.pop("response_format", None)
+                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+
+                # 重试
+                response = await _tracked_completion("text", self, retry=1, **completion_kwargs)
+                if response.choices and len(response.choices) > 0:
+                    content = response.choices[0].message.content
+                    content = self._clean_json_output(content)
+                    return content
+                else:
+                    raise APICallError("LiteLLM 返回空响应")
+
+            # 检查是否是安全过滤
+            if "SAFETY" in error_msg.upper() or "content_filter" in error_msg.lower():
+                raise ContentFilterError(f"内容被安全过滤器阻止: {error_msg}")
+
+            logger.error(f"LiteLLM 请求错误: {error_msg}")
+            raise APICallError(f"请求错误: {error_msg}")
+        except LiteLLMAPIError as e:
+            logger.error(f"LiteLLM API 错误: {str(e)}")
+            raise APICallError(f"API 错误: {str(e)}")
+        except Exception as e:
+            logger.error(f"LiteLLM 调用失败: {str(e)}")
+            raise APICallError(f"调用失败: {str(e)}")
+
+    async def stream_text(self,
+                          prompt: str,
+                          system_prompt: Optional[str] = None,
+                          temperature: float = 1.0,
+                          max_tokens: Optional[int] = None,
+                          response_format: Optional[str] = None,
+                          **kwargs) -> AsyncIterator[str]:
+        """
+        使用 LiteLLM 流式生成文本，逐个返回收到的文本片段
+
+        参数与 generate_text 相同
+        """
+        completion_kwargs = self._build_completion_kwargs(
+            prompt, system_prompt, temperature, max_tokens, response_format, **kwargs
+        )
+
+        try:
+            async for content in _tracked_stream(self, completion_kwargs):
+                yield content
+
+        except LiteLLMAuthError as e:
+            logger.error(f"LiteLLM 认证失败: {str(e)}")
+            raise AuthenticationError()
+        except LiteLLMRateLimitError as e:
+            raise _rate_limit_error(e)
+        except LiteLLMBadRequestError as e:
+            error_msg = str(e)
+            if "SAFETY" in error_msg.upper() or "content_filter" in error_msg.lower():
+                raise ContentFilterError(f"内容被安全过滤器阻止: {error_msg}")
+            logger.error(f"LiteLLM 请求错误: {error_msg}")
+            raise APICallError(f"请求错误: {error_msg}")
+        except LiteLLMAPIError as e:
+            logger.error(f"LiteLLM API 错误: {str(e)}")
+            raise APICallError(f"API 错误: {str(e)}")
+        except Exception as e:
+            logger.error(f"LiteLLM 流式调用失败: {str(e)}")
+            raise APICallError(f"调用失败: {str(e)}")
+
+    def _build_completion_kwargs(self,
+                                 prompt: str,
+                                 system_prompt: Optional[str],
+                                 temperature: float,
+                                 max_tokens: Optional[int],
+                                 response_format: Optional[str],
+                                 **kwargs) -> Dict[str, Any]:
+        """构建 acompletion 的参数"""
         # 构建消息列表
         messages = self._build_messages(prompt, system_prompt)
 
@@ -419,57 +752,7 @@ class LiteLLMTextProvider(TextModelProvider):
         if "api_base" in kwargs:
             completion_kwargs["api_base"] = kwargs["api_base"]
 
-        try:
-            # 调用 LiteLLM（自动重试）
-            response = await acompletion(**completion_kwargs)
-
-            if response.choices and len(response.choices) > 0:
-                content = response.choices[0].message.content
-
-                # 清理可能的 markdown 代码块（针对不支持 JSON mode 的模型）
-                if response_format == "json" and "response_format" not in completion_kwargs:
-                    content = self._clean_json_output(content)
-
-                logger.debug(f"LiteLLM 调用成功，消耗 tokens: {response.usage.total_tokens if response.usage else 'N/A'}")
-                return content
-            else:
-                raise APICallError("LiteLLM 返回空响应")
-
-        except LiteLLMAuthError as e:
-            logger.error(f"LiteLLM 认证失败: {str(e)}")
-            raise AuthenticationError()
-        except LiteLLMRateLimitError as e:
-            logger.error(f"LiteLLM 速率限制: {str(e)}")
-            raise RateLimitError()
-        except LiteLLMBadRequestError as e:
-            error_msg = str(e)
-            # 处理不支持 response_format 的情况
-            if "response_format" in error_msg and response_format == "json":
-                logger.warning(f"模型不支持 response_format，重试不带格式约束的请求")
-                completion_kwargs.pop("response_format", None)
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
-
-                # 重试
-                response = await acompletion(**completion_kwargs)
-                if response.choices and len(response.choices) > 0:
-                    content = response.choices[0].message.content
-                    content = self._clean_json_output(content)
-                    return content
-                else:
-                    raise APICallError("LiteLLM 返回空响应")
-
-            # 检查是否是安全过滤
-            if "SAFETY" in error_msg.upper() or "content_filter" in error_msg.lower():
-                raise ContentFilterError(f"内容被安全过滤器阻止: {error_msg}")
-
-            logger.error(f"LiteLLM 请求错误: {error_msg}")
-            raise APICallError(f"请求错误: {error_msg}")
-        except LiteLLMAPIError as e:
-            logger.error(f"LiteLLM API 错误: {str(e)}")
-            raise APICallError(f"API 错误: {str(e)}")
-        except Exception as e:
-            logger.error(f"LiteLLM 调用失败: {str(e)}")
-            raise APICallError(f"调用失败: {str(e)}")
+        return completion_kwargs
 
     def _clean_json_output(self, output: str) -> str:
         """清理JSON输出，移除markdown标记等"""
@@ -4,6 +4,7 @@
 统一管理所有大模型服务提供商，提供简单的工厂方法来创建和获取服务实例
 """
 
+import hashlib
 from typing import Dict, Type, Optional
 from loguru import logger
 
@@ -207,6 +208,64 @@ class LLMServiceManager:
             logger.error(f"创建文本模型提供商实例失败: {provider_name} - {str(e)}")
             raise ConfigurationError(f"创建提供商实例失败: {str(e)}")
     
+    @classmethod
+    def get_route_provider(cls,
+                           kind: str,
+                           provider_name: Optional[str],
+                           model_name: str,
+                           api_key: Optional[str] = None,
+                           base_url: Optional[str] = None):
+        """
+        获取指定模型的提供商实例（用于 [llm_routing] 中的备用路由）
+
+        Args:
+            kind: "text" 或 "vision"
+            provider_name: 提供商名称，如果不指定则使用配置中的默认值
+            model_name: 模型名称
+            api_key: API密钥，如果不指定则沿用该提供商的主配置
+            base_url: API基础URL，如果不指定则沿用该提供商的主配置
+
+        Raises:
+            ProviderNotFoundError: 提供商未找到
+            ConfigurationError: 配置错误
+        """
+        providers = cls._text_providers if kind == "text" else cls._vision_providers
+        instance_cache = cls._text_instance_cache if kind == "text" else cls._vision_instance_cache
+
+        if not provider_name:
+            provider_name = config.app.get(f'{kind}_llm_provider', 'openai' if kind == "text" else 'gemini')
+        provider_name = provider_name.lower()
+        if provider_name not in providers:
+            raise ProviderNotFoundError(provider_name)
+        if not model_name:
+            raise ConfigurationError("备用路由缺少 model_name")
+
+        config_prefix = f"{kind}_{provider_name}"
+        api_key = api_key or config.app.get(f'{config_prefix}_api_key')
+        base_url = base_url or config.app.get(f'{config_prefix}_base_url')
+        if not api_key:
+            raise ConfigurationError(f"缺少API密钥配置: {config_prefix}_api_key")
+
+        # 同一提供商/模型可以用不同的 API key 配置多条路由，缓存键包含 key 的摘要（不保存明文）
+        key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        cache_key = f"{kind}_route_{provider_name}_{model_name}_{base_url or ''}_{key_digest}"
+        if cache_key in instance_cache:
+            return instance_cache[cache_key]
+
+        try:
+            instance = providers[provider_name](
+                api_key=api_key,
+                model_name=model_name,
+                base_url=base_url
+            )
+        except Exception as e:
+            logger.error(f"创建备用路由提供商实例失败: {provider_name} - {model_name} - {str(e)}")
+            raise ConfigurationError(f"创建提供商实例失败: {str(e)}")
+
+        instance_cache[cache_key] = instance
+        logger.info(f"创建备用路由提供商实例: {provider_name} - {model_name}")
+        return instance
+
     @classmethod
     def clear_cache(cls):
         """清空提供商实例缓存"""
@@ -4,17 +4,20 @@
 为现有代码提供向后兼容的接口，方便逐步迁移到新的LLM服务架构
 """
 
-import asyncio
 import json
-from typing import List, Dict, Any, Optional, Union
+from typing import Callable, List, Dict, Any, Optional, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
 
 from .unified_service import UnifiedLLMService
+from .validators import OutputValidator
 from .exceptions import LLMServiceError
+from .json_stream import IncrementalItemsParser
 # 导入新的提示词管理系统
 from app.services.prompts import PromptManager
+from app.services import subtitle_plot_analysis
+from app.utils import async_runtime
 
 # 提供商注册由 webui.py:main() 显式调用（见 LLM 提供商注册机制重构）
 # 这样更可靠，错误也更容易调试
@@ -22,7 +25,7 @@ from app.services.prompts import PromptManager
 
 def _run_async_safely(coro_func, *args, **kwargs):
     """
-    安全地运行异步协程，处理各种事件循环情况
+    在常驻的异步运行时中执行协程并等待结果
 
     Args:
         coro_func: 协程函数（不是协程对象）
@@ -32,33 +35,48 @@ def _run_async_safely(coro_func, *args, **kwargs):
     Returns:
         协程的执行结果
     """
-    def run_in_new_loop():
-        """在新的事件循环中运行协程"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(coro_func(*args, **kwargs))
-        finally:
-            loop.close()
-            asyncio.set_event_loop(None)
-
     try:
-        # 尝试获取当前事件循环
-        try:
-            loop = asyncio.get_running_loop()
-            # 如果有运行中的事件循环，使用线程池执行
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_new_loop)
-                return future.result()
-        except RuntimeError:
-            # 没有运行中的事件循环，直接运行
-            return run_in_new_loop()
+        return async_runtime.run(coro_func(*args, **kwargs))
     except Exception as e:
         logger.error(f"异步执行失败: {str(e)}")
         raise LLMServiceError(f"异步执行失败: {str(e)}")
 
 
+def _text_streaming_enabled() -> bool:
+    from app.config import config
+
+    return bool(config.app.get("text_llm_streaming", True))
+
+
+def _generate_json_items_streaming(on_item: Callable[[Dict[str, Any]], None], **generate_kwargs) -> str:
+    """
+    流式生成 {"items": [...]} 结构的 JSON，每个元素完整后立即在调用线程中回调 on_item
+
+    流式请求在收到任何内容之前失败时，改用普通请求生成（元素在完成后统一回调）
+
+    Returns:
+        完整的响应文本
+    """
+    async def consume(emit):
+        parser = IncrementalItemsParser()
+        try:
+            async for chunk in UnifiedLLMService.stream_text(**generate_kwargs):
+                for item in parser.feed(chunk):
+                    emit(item)
+        except Exception as e:
+            if parser.text:
+                raise
+            logger.warning(f"流式生成失败，改用普通请求: {str(e)}")
+            result = await UnifiedLLMService.generate_text(**generate_kwargs)
+            for item in parser.feed(result):
+                emit(item)
+        logger.info(f"流式生成完成，共解析出 {parser.count} 个片段")
+        return parser.text
+
+    # 回调在调用线程中执行（Streamlit 组件只能在脚本线程中更新）
+    return async_runtime.run_with_events(consume, on_item)
+
+
 class LegacyLLMAdapter:
     """传统LLM接口适配器"""
     
@@ -79,7 +97,8 @@ class LegacyLLMAdapter:
         return VisionAnalyzerAdapter(provider, api_key, model, base_url)
     
     @staticmethod
-    def generate_narration(markdown_content: str, api_key: str, base_url: str, model: str) -> str:
+    def generate_narration(markdown_content: str, api_key: str, base_url: str, model: str,
+                           on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
         """
         生成解说文案 - 兼容原有接口
 
@@ -88,6 +107,7 @@ class LegacyLLMAdapter:
             api_key: API密钥
             base_url: API基础URL
             model: 模型名称
+            on_item: 可选，流式生成时每个解说片段完成后的回调（在调用线程中执行）
 
         Returns:
             生成的解说文案JSON字符串
@@ -102,14 +122,18 @@ class LegacyLLMAdapter:
                 }
             )
 
-            # 使用统一服务生成文案
-            result = _run_async_safely(
-                UnifiedLLMService.generate_text,
+            generate_kwargs = dict(
                 prompt=prompt,
                 system_prompt="你是一名专业的短视频解说文案撰写专家。",
                 temperature=1.5,
                 response_format="json"
             )
+            if on_item is not None and _text_streaming_enabled():
+                # 流式生成，片段完成后即可展示
+                result = _generate_json_items_streaming(on_item, **generate_kwargs)
+            else:
+                # 使用统一服务生成文案
+                result = _run_async_safely(UnifiedLLMService.generate_text, **generate_kwargs)
 
             # 使用增强的JSON解析器
             from webui.tools.generate_short_summary import parse_and_fix_json
@@ -184,13 +208,18 @@ class VisionAnalyzerAdapter:
             # 新实现返回 List[str]，需要转换为 List[Dict]
             compatible_results = []
             for i, result in enumerate(results):
-                # 计算这个批次处理的图片数量
-                start_idx = i * batch_size
-                end_idx = min(start_idx + batch_size, len(images))
+                # 计算这个批次处理的图片范围（自适应分批时由结果直接给出）
+                start_idx = getattr(result, 'start', None)
+                end_idx = getattr(result, 'end', None)
+                if start_idx is None:
+                    start_idx = i * batch_size
+                    end_idx = min(start_idx + batch_size, len(images))
                 images_processed = end_idx - start_idx
 
                 compatible_results.append({
                     'batch_index': i,
+                    'start_index': start_idx,
+                    'end_index': end_idx,
                     'images_processed': images_processed,
                     'response': result,
                     'model_used': self.model
@@ -246,15 +275,31 @@ class SubtitleAnalyzerAdapter:
             分析结果字典
         """
         try:
-            # 使用统一服务分析字幕
-            result = self._run_async_safely(
-                UnifiedLLMService.analyze_subtitle,
-                subtitle_content=subtitle_content,
-                provider=self.provider,
-                temperature=1.0,
-                api_key=self.api_key,
-                api_base=self.base_url
-            )
+            chunks = subtitle_plot_analysis.split_subtitle_chunks(subtitle_content)
+            if len(chunks) > 1:
+                # 长字幕分段并行分析后汇总
+                async def generate(prompt: str, system_prompt: str) -> str:
+                    return await UnifiedLLMService.generate_text(
+                        prompt=prompt,
+                        system_prompt=system_prompt,
+                        provider=self.provider,
+                        temperature=1.0,
+                        api_key=self.api_key,
+                        api_base=self.base_url
+                    )
+
+                result = self._run_async_safely(subtitle_plot_analysis.analyze_plot_in_chunks, chunks, generate)
+                result = OutputValidator.validate_subtitle_analysis(result)
+            else:
+                # 使用统一服务分析字幕
+                result = self._run_async_safely(
+                    UnifiedLLMService.analyze_subtitle,
+                    subtitle_content=subtitle_content,
+                    provider=self.provider,
+                    temperature=1.0,
+                    api_key=self.api_key,
+                    api_base=self.base_url
+                )
             
             return {
                 "status": "success",
@@ -336,6 +381,7 @@ def create_vision_analyzer(provider: str, api_key: str, model: str, base_url: st
     return LegacyLLMAdapter.create_vision_analyzer(provider, api_key, model, base_url)
 
 
-def generate_narration(markdown_content: str, api_key: str, base_url: str, model: str) -> str:
+def generate_narration(markdown_content: str, api_key: str, base_url: str, model: str,
+                       on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
     """生成解说文案 - 全局函数"""
-    return LegacyLLMAdapter.generate_narration(markdown_content, api_key, base_url, model)
+    return LegacyLLMAdapter.generate_narration(markdown_content, api_key, base_url, model, on_item=on_item)
@@ -0,0 +1,203 @@
+"""
+大模型响应缓存
+
+对同一视频反复生成解说时，关键帧分析、字幕分析等调用的输入完全相同，结果可以直接复用：
+
+- 缓存键为 (调用类型, 提供商, 模型, 温度, 系统提示词, 提示词, 图片内容哈希, 其他参数) 的哈希
+- 索引和响应内容保存在 storage/llm_cache/cache.sqlite3 中
+- 超过有效期的记录在读取时失效；总大小超过上限时按最近使用时间淘汰
+- 需要在 config.toml 的 [llm_cache] 中设置 enabled = true 开启，单次调用可以传 use_cache=False 跳过
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+import PIL.Image
+from loguru import logger
+
+from app.config import config
+from app.utils import utils
+
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_SIZE_MB = 512
+
+_HASH_CHUNK = 1 << 20
+
+# 不参与缓存键计算的参数
+_IGNORED_KWARGS = {"api_key", "api_base", "max_concurrency"}
+
+# 图片文件哈希按 (路径, 修改时间, 大小) 缓存，重复分析同一批关键帧时不必重新读取
+_file_hash_cache: Dict[tuple, str] = {}
+_file_hash_lock = threading.Lock()
+
+
+def _file_digest(file_path: str) -> str:
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    with _file_hash_lock:
+        digest = _file_hash_cache.get(key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _file_hash_lock:
+            _file_hash_cache[key] = digest
+    return digest
+
+
+def image_fingerprint(img: Union[str, Path, PIL.Image.Image]) -> str:
+    """图片内容哈希：文件按字节计算，PIL 图片按尺寸、模式和像素计算"""
+    if isinstance(img, (str, Path)):
+        return _file_digest(str(img))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}|{img.size}".encode("utf-8"))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def make_cache_key(kind: str,
+                   provider: str,
+                   model: str,
+                   prompt: str,
+                   system_prompt: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   images: Sequence[Union[str, Path, PIL.Image.Image]] = (),
+                   **params) -> str:
+    """计算缓存键"""
+    payload = {
+        "kind": kind,
+        "provider": provider,
+        "model": model,
+        "temperature": temperature,
+        "system_prompt": system_prompt or "",
+        "prompt": prompt,
+        "images": [image_fingerprint(img) for img in images],
+        "params": {k: v for k, v in params.items() if k not in _IGNORED_KWARGS},
+    }
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """基于 SQLite 的响应缓存（线程安全）"""
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_size_bytes: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+            self._conn.commit()
+
+    def _record(self, kind: str, name: str):
+        stats = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "writes": 0})
+        stats[name] += 1
+
+    def get(self, key: str, kind: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self._record(kind, "misses")
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._record(kind, "hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, kind: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, data, len(data.encode("utf-8")), now, now),
+            )
+            self._record(kind, "writes")
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """删除过期记录，总大小超过上限时按最近使用时间从旧到新删除"""
+        if self.ttl_seconds > 0:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_size_bytes <= 0:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        # 淘汰到上限的 90%，避免每次写入都触发淘汰
+        excess = total - int(self.max_size_bytes * 0.9)
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if removed >= excess:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            removed += size
+        logger.info(f"大模型响应缓存超过上限，已淘汰 {removed / 1024 / 1024:.1f} MB")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {
+                "entries": entries,
+                "size_mb": round(size / 1024 / 1024, 2),
+                "calls": {kind: dict(stats) for kind, stats in self._stats.items()},
+            }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMResponseCache]:
+    """返回全局缓存实例；[llm_cache] 未开启时返回 None"""
+    global _cache
+    if not config.llm_cache.get("enabled", False):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_dir = utils.storage_dir("llm_cache", create=True)
+                _cache = LLMResponseCache(
+                    db_path=os.path.join(cache_dir, "cache.sqlite3"),
+                    ttl_seconds=float(config.llm_cache.get("ttl_days", DEFAULT_TTL_DAYS)) * 86400,
+                    max_size_bytes=int(float(config.llm_cache.get("max_size_mb", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,313 @@
+"""
+大模型请求路由：备用路由、对冲请求和熔断
+
+第三方接口偶发的超时和错误会让整个生成流程失败，长尾延迟也很明显。[llm_routing] 中可以为文本和视觉模型
+分别配置按顺序尝试的备用路由（提供商 / 模型 / API key / base_url）：
+
+- 备用路由（failover）：当前路由失败时依次尝试下一个路由，全部失败才抛出异常
+- 对冲请求（hedging，仅文本模型）：当前路由的耗时超过其近期（同一调用方式、相近提示词长度）延迟的指定分位数仍未返回时，
+  向下一个路由再发一次同样的请求，采用先返回的结果并取消另一个
+- 熔断（circuit breaker）：每个路由统计最近若干次调用的错误率，超过阈值后在冷却时间内跳过该路由，
+  冷却结束后放行一次试探请求，成功则恢复
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from loguru import logger
+
+from app.config import config
+from .exceptions import LLMServiceError
+
+DEFAULT_HEDGE_PERCENTILE = 0.9      # 超过近期延迟的该分位数仍未返回时发出对冲请求
+DEFAULT_HEDGE_MIN_SAMPLES = 10      # 统计延迟分位数所需的最少成功次数
+DEFAULT_HEDGE_MIN_DELAY = 5.0       # 对冲请求的最短等待时间（秒）
+DEFAULT_CIRCUIT_WINDOW = 20         # 熔断统计的最近调用次数
+DEFAULT_CIRCUIT_MIN_CALLS = 5       # 至少统计到这么多次调用才会熔断
+DEFAULT_CIRCUIT_ERROR_RATE = 0.5    # 错误率达到该值时熔断
+DEFAULT_CIRCUIT_COOLDOWN = 60.0     # 熔断后的冷却时间（秒）
+
+_LATENCY_SAMPLES = 50
+
+# 延迟样本按提示词长度（字符数）分桶，长提示词的耗时不会拉高短请求的对冲阈值
+_PROMPT_SIZE_BUCKETS = (1000, 4000, 16000)
+
+
+def _routing_config() -> dict:
+    return getattr(config, "llm_routing", None) or {}
+
+
+class CircuitBreaker:
+    """单个路由的熔断器，同时记录最近的成功延迟"""
+
+    def __init__(self, name: str, window: int, min_calls: int, error_rate: float, cooldown: float):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        # 延迟样本按 sample_key（调用方式 + 提示词长度分桶）分开统计
+        self._latencies: Dict[str, deque] = {}
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """是否允许向该路由发请求；冷却结束后只放行一次试探请求"""
+        if self._opened_at is None:
+            return True
+        return not self._probing and time.monotonic() - self._opened_at >= self.cooldown
+
+    def begin_call(self):
+        """发出请求前调用：熔断状态下的请求即为试探请求，结果返回前不再放行其他请求"""
+        if self._opened_at is not None:
+            self._probing = True
+
+    def cancel_call(self):
+        """请求被取消（如对冲请求落败），不计入统计"""
+        self._probing = False
+
+    def record_success(self, latency: float, sample_key: str = "default"):
+        self._outcomes.append(True)
+        self._latencies.setdefault(sample_key, deque(maxlen=_LATENCY_SAMPLES)).append(latency)
+        if self._opened_at is not None:
+            logger.info(f"路由 {self.name} 试探请求成功，恢复使用")
+            self._opened_at = None
+            self._probing = False
+            self._outcomes.clear()
+
+    def record_failure(self):
+        self._outcomes.append(False)
+        if self._opened_at is not None:
+            # 试探请求失败，重新进入冷却
+            self._opened_at = time.monotonic()
+            self._probing = False
+            return
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"路由 {self.name} 最近 {len(self._outcomes)} 次调用失败 {failures} 次，"
+                f"熔断 {self.cooldown:.0f} 秒"
+            )
+
+    def latency_percentile(self, q: float, min_samples: int, sample_key: str = "default") -> Optional[float]:
+        samples = self._latencies.get(sample_key, ())
+        if len(samples) < max(1, min_samples):
+            return None
+        latencies = sorted(samples)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def get_stats(self) -> dict:
+        return {
+            "open": self.is_open,
+            "calls": len(self._outcomes),
+            "failures": self._outcomes.count(False),
+            "latency": {
+                key: {
+                    "p50": self.latency_percentile(0.5, 1, key),
+                    "p90": self.latency_percentile(0.9, 1, key),
+                }
+                for key in list(self._latencies)
+            },
+        }
+
+
+class Route(NamedTuple):
+    name: str
+    provider: Any           # VisionModelProvider / TextModelProvider
+    primary: bool
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+
+    def call_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """主路由沿用调用方的参数；备用路由使用自己的 api_key / base_url"""
+        if self.primary:
+            return kwargs
+        kwargs = {k: v for k, v in kwargs.items() if k not in ("api_key", "api_base")}
+        if self.api_key:
+            kwargs["api_key"] = self.api_key
+        if self.base_url:
+            kwargs["api_base"] = self.base_url
+        return kwargs
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(route_name: str) -> CircuitBreaker:
+    breaker = _breakers.get(route_name)
+    if breaker is None:
+        cfg = _routing_config()
+        breaker = CircuitBreaker(
+            route_name,
+            window=int(cfg.get("circuit_window", DEFAULT_CIRCUIT_WINDOW)),
+            min_calls=int(cfg.get("circuit_min_calls", DEFAULT_CIRCUIT_MIN_CALLS)),
+            error_rate=float(cfg.get("circuit_error_rate", DEFAULT_CIRCUIT_ERROR_RATE)),
+            cooldown=float(cfg.get("circuit_cooldown", DEFAULT_CIRCUIT_COOLDOWN)),
+        )
+        _breakers[route_name] = breaker
+    return breaker
+
+
+def get_routing_stats() -> Dict[str, dict]:
+    """各路由的熔断状态和延迟统计"""
+    return {name: breaker.get_stats() for name, breaker in _breakers.items()}
+
+
+def _route_name(kind: str, provider) -> str:
+    return f"{kind}:{provider.provider_name}/{provider.model_name}"
+
+
+def get_routes(kind: str, provider_name: Optional[str] = None) -> List[Route]:
+    """
+    按顺序返回可用的路由（主路由 + [llm_routing] 中的备用路由），跳过处于熔断状态的路由
+
+    所有路由都熔断时仍按原顺序返回，避免完全无法调用
+    """
+    from .manager import LLMServiceManager
+
+    if kind == "text":
+        primary = LLMServiceManager.get_text_provider(provider_name)
+    else:
+        primary = LLMServiceManager.get_vision_provider(provider_name)
+    routes = [Route(_route_name(kind, primary), primary, True)]
+
+    for fallback in _routing_config().get(f"{kind}_fallbacks", []):
+        try:
+            provider = LLMServiceManager.get_route_provider(
+                kind,
+                provider_name=fallback.get("provider") or provider_name,
+                model_name=fallback.get("model_name"),
+                api_key=fallback.get("api_key"),
+                base_url=fallback.get("base_url"),
+            )
+        except Exception as e:
+            logger.warning(f"备用路由配置无效，已跳过 {fallback.get('model_name')}: {str(e)}")
+            continue
+        routes.append(Route(_route_name(kind, provider), provider, False,
+                            fallback.get("api_key"), fallback.get("base_url")))
+
+    available = [route for route in routes if get_breaker(route.name).allow()]
+    if not available:
+        logger.warning(f"所有{kind}路由都处于熔断状态，仍按顺序尝试")
+        return routes
+    return available
+
+
+def latency_key(call_kind: str, prompt: str = "") -> str:
+    """
+    延迟样本的分组键：调用方式（如 generate / stream）+ 提示词长度分桶
+
+    Args:
+        call_kind: 调用方式
+        prompt: 提示词（含系统提示词），用于按长度分桶
+    """
+    size = len(prompt or "")
+    for limit in _PROMPT_SIZE_BUCKETS:
+        if size < limit:
+            return f"{call_kind}:<{limit}"
+    return f"{call_kind}:>={_PROMPT_SIZE_BUCKETS[-1]}"
+
+
+def _hedge_delay(route: Route, sample_key: str) -> Optional[float]:
+    cfg = _routing_config()
+    if not cfg.get("hedge_enabled", False):
+        return None
+    percentile = get_breaker(route.name).latency_percentile(
+        float(cfg.get("hedge_percentile", DEFAULT_HEDGE_PERCENTILE)),
+        int(cfg.get("hedge_min_samples", DEFAULT_HEDGE_MIN_SAMPLES)),
+        sample_key,
+    )
+    if percentile is None:
+        return None
+    return max(percentile, float(cfg.get("hedge_min_delay", DEFAULT_HEDGE_MIN_DELAY)))
+
+
+async def _attempt(route: Route, call: Callable[[Route], Awaitable[Any]], sample_key: str) -> Any:
+    """调用一次路由并记录熔断统计（被取消的对冲请求不计入）"""
+    breaker = get_breaker(route.name)
+    breaker.begin_call()
+    started = time.monotonic()
+    try:
+        result = await call(route)
+    except asyncio.CancelledError:
+        breaker.cancel_call()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success(time.monotonic() - started, sample_key)
+    return result
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def call_with_routing(kind: str,
+                            provider_name: Optional[str],
+                            call: Callable[[Route], Awaitable[Any]],
+                            hedge: bool = False,
+                            sample_key: Optional[str] = None) -> Any:
+    """
+    按路由顺序调用，失败时切换到下一个路由
+
+    Args:
+        kind: "text" 或 "vision"
+        provider_name: 主路由的提供商名称，不指定时使用配置中的默认值
+        call: 接收 Route 的协程函数，使用 route.provider 和 route.call_kwargs(...) 发起请求
+        hedge: 是否允许对冲请求
+        sample_key: 延迟样本的分组键（见 latency_key），对冲阈值只参考同一分组的样本，默认为 kind
+
+    Raises:
+        最后一个路由的异常（所有路由都失败时）
+    """
+    routes = get_routes(kind, provider_name)
+    sample_key = sample_key or kind
+    last_error: Optional[Exception] = None
+    index = 0
+    while index < len(routes):
+        route = routes[index]
+        index += 1
+        delay = _hedge_delay(route, sample_key) if hedge and index < len(routes) else None
+
+        pending = {asyncio.ensure_future(_attempt(route, call, sample_key))}
+        names = {next(iter(pending)): route.name}
+        try:
+            while pending:
+                timeout = delay if len(names) == 1 and index < len(routes) else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 超过延迟分位数仍未返回，向下一个路由发出对冲请求
+                    hedge_route = routes[index]
+                    index += 1
+                    logger.info(f"{route.name} 超过 {delay:.1f}s 未返回，向 {hedge_route.name} 发出对冲请求")
+                    task = asyncio.ensure_future(_attempt(hedge_route, call, sample_key))
+                    names[task] = hedge_route.name
+                    pending.add(task)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if pending:
+                            logger.info(f"采用 {names[task]} 的结果，取消其他请求")
+                            await _cancel(pending)
+                            pending = set()
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"路由 {names[task]} 调用失败: {str(last_error)}")
+        except asyncio.CancelledError:
+            await _cancel(pending)
+            raise
+
+        if index < len(routes):
+            logger.info(f"切换到备用路由 {routes[index].name}")
+
+    raise last_error or LLMServiceError(f"没有可用的{kind}路由")
@@ -0,0 +1,368 @@
+"""
+大模型调用遥测：token、费用、延迟
+
+所有 LiteLLM 请求（以及响应缓存命中）都会记录到进程内的指标注册表：
+
+- 每次调用记录提供商、模型、调用类型、输入 / 输出 token、估算费用、是否命中缓存、延迟、重试序号和错误类型
+- 按 (调用类型, 提供商, 模型) 汇总全局指标；在 task_scope(task_id) 内发起的调用同时按任务汇总，
+  任务 id 随 contextvars 传递到 asyncio 子任务、asyncio.to_thread 和 async_runtime 中的协程
+- export_json() / export_prometheus() 导出指标；[app] llm_metrics_port 大于 0 时启动 HTTP 服务，
+  /metrics 为 Prometheus 文本格式，/metrics.json 为 JSON（可带 ?task_id=...）
+"""
+
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+from app.config import config
+
+METRIC_PREFIX = "narrato_llm"
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)  # 延迟直方图的分桶上限（秒）
+MAX_TRACKED_TASKS = 200     # 最多保留最近多少个任务的汇总
+_LATENCY_SAMPLES = 200      # 计算延迟分位数保留的最近样本数
+
+_current_task: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_task_id", default=None)
+
+
+class _Stats:
+    """一组调用的累计指标"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.error_types: Dict[str, int] = {}
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+
+    def add(self, record: dict):
+        self.calls += 1
+        if record["cached"]:
+            self.cache_hits += 1
+        if record["retry"]:
+            self.retries += 1
+        if record["error"]:
+            self.errors += 1
+            self.error_types[record["error"]] = self.error_types.get(record["error"], 0) + 1
+        self.prompt_tokens += record["prompt_tokens"]
+        self.completion_tokens += record["completion_tokens"]
+        self.cost += record["cost"]
+        if not record["cached"]:
+            latency = record["latency"]
+            self.latency_sum += latency
+            self._latencies.append(latency)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.latency_buckets[i] += 1
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+    def summary(self) -> dict:
+        requests = self.calls - self.cache_hits
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost": round(self.cost, 6),
+            "latency_total": round(self.latency_sum, 3),
+            "latency_avg": round(self.latency_sum / requests, 3) if requests else None,
+            "latency_p50": self._percentile(0.5),
+            "latency_p95": self._percentile(0.95),
+            "error_types": dict(self.error_types),
+        }
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[tuple, _Stats] = {}
+        self._tasks: "OrderedDict[str, Dict[tuple, _Stats]]" = OrderedDict()
+
+    def record(self, record: dict):
+        key = (record["kind"], record["provider"], record["model"])
+        task_id = record["task_id"]
+        with self._lock:
+            self._models.setdefault(key, _Stats()).add(record)
+            if task_id:
+                task = self._tasks.get(task_id)
+                if task is None:
+                    task = self._tasks[task_id] = {}
+                    while len(self._tasks) > MAX_TRACKED_TASKS:
+                        self._tasks.popitem(last=False)
+                task.setdefault(key, _Stats()).add(record)
+
+    @staticmethod
+    def _summarize(groups: Dict[tuple, _Stats]) -> dict:
+        total = {
+            "calls": 0, "errors": 0, "cache_hits": 0, "retries": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+            "cost": 0.0, "latency_total": 0.0,
+        }
+        models = {}
+        for (kind, provider, model), stats in groups.items():
+            summary = stats.summary()
+            models[f"{kind}:{provider}/{model}"] = summary
+            for field in total:
+                total[field] += summary[field]
+        total["cost"] = round(total["cost"], 6)
+        total["latency_total"] = round(total["latency_total"], 3)
+        total["models"] = models
+        return total
+
+    def task_usage(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            groups = self._tasks.get(task_id)
+            return self._summarize(groups) if groups is not None else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self._summarize(self._models),
+                "tasks": {task_id: self._summarize(groups) for task_id, groups in self._tasks.items()},
+            }
+
+    def prometheus(self) -> str:
+        with self._lock:
+            items = [(key, stats) for key, stats in self._models.items()]
+            lines = []
+
+            def metric(name: str, metric_type: str, help_text: str):
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+            def labels(key: tuple, **extra) -> str:
+                kind, provider, model = key
+                pairs = {"kind": kind, "provider": provider, "model": model, **extra}
+                return ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs.items())
+
+            metric("requests_total", "counter", "LLM calls by outcome")
+            for key, stats in items:
+                ok = stats.calls - stats.errors - stats.cache_hits
+                lines.append(f"{METRIC_PREFIX}_requests_total{{{labels(key, status='ok')}}} {ok}")
+                lines.append(f"{METRIC_PREFIX}_requests_total{{{labels(key, status='error')}}} {stats.errors}")
+                lines.append(f"{METRIC_PREFIX}_requests_total{{{labels(key, status='cache_hit')}}} {stats.cache_hits}")
+
+            metric("retries_total", "counter", "LLM calls that were retries")
+            for key, stats in items:
+                lines.append(f"{METRIC_PREFIX}_retries_total{{{labels(key)}}} {stats.retries}")
+
+            metric("tokens_total", "counter", "LLM tokens by type")
+            for key, stats in items:
+                lines.append(f"{METRIC_PREFIX}_tokens_total{{{labels(key, type='prompt')}}} {stats.prompt_tokens}")
+                lines.append(f"{METRIC_PREFIX}_tokens_total{{{labels(key, type='completion')}}} {stats.completion_tokens}")
+
+            metric("cost_usd_total", "counter", "Estimated LLM cost in USD")
+            for key, stats in items:
+                lines.append(f"{METRIC_PREFIX}_cost_usd_total{{{labels(key)}}} {stats.cost:.6f}")
+
+            metric("latency_seconds", "histogram", "LLM request latency (cache hits excluded)")
+            for key, stats in items:
+                count = stats.calls - stats.cache_hits
+                for bound, bucket in zip(LATENCY_BUCKETS, stats.latency_buckets):
+                    lines.append(f"{METRIC_PREFIX}_latency_seconds_bucket{{{labels(key, le=str(bound))}}} {bucket}")
+                lines.append(f"{METRIC_PREFIX}_latency_seconds_bucket{{{labels(key, le='+Inf')}}} {count}")
+                lines.append(f"{METRIC_PREFIX}_latency_seconds_sum{{{labels(key)}}} {stats.latency_sum:.3f}")
+                lines.append(f"{METRIC_PREFIX}_latency_seconds_count{{{labels(key)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_registry = _Registry()
+
+
+@contextmanager
+def task_scope(task_id: str):
+    """在该上下文内发起的大模型调用都计入 task_id 的汇总"""
+    token = _current_task.set(task_id)
+    try:
+        yield task_id
+    finally:
+        _current_task.reset(token)
+
+
+def current_task_id() -> Optional[str]:
+    return _current_task.get()
+
+
+def record_call(kind: str,
+                provider: str,
+                model: str,
+                latency: float = 0.0,
+                prompt_tokens: int = 0,
+                completion_tokens: int = 0,
+                cost: float = 0.0,
+                cached: bool = False,
+                retry: int = 0,
+                error: Optional[BaseException] = None):
+    """
+    记录一次大模型调用
+
+    Args:
+        kind: 调用类型，vision / text / stream
+        provider: 提供商名称
+        model: 模型名称
+        latency: 耗时（秒）
+        prompt_tokens: 输入 token 数
+        completion_tokens: 输出 token 数
+        cost: 估算费用（美元）
+        cached: 是否命中响应缓存（未实际请求模型）
+        retry: 重试序号，0 表示首次请求
+        error: 调用失败时的异常
+    """
+    record = {
+        "kind": kind,
+        "provider": provider or "unknown",
+        "model": model or "unknown",
+        "latency": max(0.0, float(latency)),
+        "prompt_tokens": int(prompt_tokens or 0),
+        "completion_tokens": int(completion_tokens or 0),
+        "cost": float(cost or 0.0),
+        "cached": cached,
+        "retry": retry,
+        "error": type(error).__name__ if error is not None else None,
+        "task_id": _current_task.get(),
+    }
+    try:
+        _registry.record(record)
+    except Exception as e:
+        logger.warning(f"记录大模型调用指标失败: {str(e)}")
+
+
+def record_response(kind: str, provider: str, model: str, response: Any, started: float, retry: int = 0):
+    """根据 LiteLLM 的响应记录一次成功调用（usage 缺失时 token 记为 0）"""
+    usage = getattr(response, "usage", None)
+    record_call(
+        kind, provider, model,
+        latency=time.monotonic() - started,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) if usage else 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) if usage else 0,
+        cost=estimate_cost(response),
+        retry=retry,
+    )
+
+
+def estimate_cost(response: Any) -> float:
+    """使用 LiteLLM 的价格表估算费用，未知模型返回 0"""
+    try:
+        import litellm
+
+        return float(litellm.completion_cost(completion_response=response) or 0.0)
+    except Exception:
+        return 0.0
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """按 token 数估算费用（流式响应没有完整的 response 对象），未知模型返回 0"""
+    try:
+        import litellm
+
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+        return float(prompt_cost + completion_cost)
+    except Exception:
+        return 0.0
+
+
+def get_task_usage(task_id: str) -> Optional[dict]:
+    """返回任务的大模型用量汇总（总计 + 按模型拆分），任务没有调用记录时返回 None"""
+    return _registry.task_usage(task_id)
+
+
+def get_snapshot() -> dict:
+    """返回全局汇总（按模型拆分）和最近各任务的汇总"""
+    return _registry.snapshot()
+
+
+def export_json(task_id: Optional[str] = None) -> str:
+    data = get_task_usage(task_id) if task_id else get_snapshot()
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def export_prometheus() -> str:
+    return _registry.prometheus()
+
+
+def reset():
+    """清空所有指标"""
+    global _registry
+    _registry = _Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            body, content_type = export_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+        elif url.path == "/metrics.json":
+            task_id = parse_qs(url.query).get("task_id", [None])[0]
+            body, content_type = export_json(task_id), "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1") -> bool:
+    """
+    启动指标 HTTP 服务（每个进程只启动一次）
+
+    Args:
+        port: 监听端口，默认读取 [app] llm_metrics_port，不大于 0 时不启动
+        host: 监听地址
+
+    Returns:
+        bool: 服务是否在运行
+    """
+    global _server
+    if port is None:
+        port = int(config.app.get("llm_metrics_port", 0) or 0)
+    if port <= 0:
+        return False
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"大模型指标服务启动失败（端口 {port}）: {str(e)}")
+            return False
+        threading.Thread(target=_server.serve_forever, name="llm-metrics", daemon=True).start()
+    logger.info(f"大模型指标服务已启动: http://{host}:{port}/metrics")
+    return True
@@ -4,7 +4,8 @@
 提供简化的API接口，方便现有代码迁移到新的架构
 """
 
-from typing import List, Dict, Any, Optional, Union
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
@@ -12,6 +13,7 @@ from loguru import logger
 from .manager import LLMServiceManager
 from .validators import OutputValidator
 from .exceptions import LLMServiceError
+from . import response_cache, router, telemetry, vision_batching
 
 # 提供商注册由 webui.py:main() 显式调用（见 LLM 提供商注册机制重构）
 # 这样更可靠，错误也更容易调试
@@ -25,6 +27,8 @@ class UnifiedLLMService:
                            prompt: str,
                            provider: Optional[str] = None,
                            batch_size: int = 10,
+                           use_cache: bool = True,
+                           refresh_cache: bool = False,
                            **kwargs) -> List[str]:
         """
         分析图片内容
@@ -34,6 +38,8 @@ class UnifiedLLMService:
             prompt: 分析提示词
             provider: 视觉模型提供商名称，如果不指定则使用配置中的默认值
             batch_size: 批处理大小
+            use_cache: 是否使用响应缓存（需开启 [llm_cache]）
+            refresh_cache: 忽略已有缓存重新请求，并用新结果覆盖缓存
             **kwargs: 其他参数
             
         Returns:
@@ -45,16 +51,46 @@ class UnifiedLLMService:
         try:
             # 获取视觉模型提供商
             vision_provider = LLMServiceManager.get_vision_provider(provider)
+
+            cache = response_cache.get_cache() if use_cache else None
+            cache_key = None
+            if cache is not None:
+                cache_key = response_cache.make_cache_key(
+                    "vision",
+                    provider=vision_provider.provider_name,
+                    model=vision_provider.model_name,
+                    prompt=prompt,
+                    images=images,
+                    batch_size=batch_size,
+                    cache_format=vision_batching.CACHE_FORMAT,
+                    **kwargs
+                )
+                if not refresh_cache:
+                    cached = cache.get(cache_key, "vision")
+                    responses = vision_batching.load_responses(cached) if cached is not None else None
+                    if responses is not None:
+                        logger.info(f"命中图片分析缓存，跳过 {len(images)} 张图片的分析")
+                        telemetry.record_call("vision", vision_provider.provider_name, vision_provider.model_name,
+                                              cached=True)
+                        return responses
             
-            # 执行图片分析
-            results = await vision_provider.analyze_images(
-                images=images,
-                prompt=prompt,
-                batch_size=batch_size,
-                **kwargs
-            )
+            # 执行图片分析（失败时切换到备用路由），同时返回实际响应的路由
+            async def analyze(route: router.Route):
+                return route, await route.provider.analyze_images(
+                    images=images,
+                    prompt=prompt,
+                    batch_size=batch_size,
+                    **route.call_kwargs(kwargs)
+                )
+
+            route, results = await router.call_with_routing("vision", provider, analyze)
             
             logger.info(f"图片分析完成，共处理 {len(images)} 张图片，生成 {len(results)} 个结果")
+
+            # 缓存键对应主路由的模型，备用路由的结果不写缓存；有批次失败时也不写缓存，下次重新分析
+            if (cache_key is not None and route.primary
+                    and not any(str(r).startswith("批次处理失败") for r in results)):
+                cache.set(cache_key, "vision", vision_batching.dump_responses(results))
             return results
             
         except Exception as e:
@@ -68,6 +104,8 @@ class UnifiedLLMService:
                           temperature: float = 1.0,
                           max_tokens: Optional[int] = None,
                           response_format: Optional[str] = None,
+                          use_cache: bool = True,
+                          refresh_cache: bool = False,
                           **kwargs) -> str:
         """
         生成文本内容
@@ -79,6 +117,8 @@ class UnifiedLLMService:
             temperature: 生成温度
             max_tokens: 最大token数
             response_format: 响应格式 ('json' 或 None)
+            use_cache: 是否使用响应缓存（需开启 [llm_cache]）
+            refresh_cache: 忽略已有缓存重新请求，并用新结果覆盖缓存
             **kwargs: 其他参数
             
         Returns:
@@ -90,24 +130,159 @@ class UnifiedLLMService:
         try:
             # 获取文本模型提供商
             text_provider = LLMServiceManager.get_text_provider(provider)
+
+            cache = response_cache.get_cache() if use_cache else None
+            cache_key = None
+            if cache is not None:
+                cache_key = response_cache.make_cache_key(
+                    "text",
+                    provider=text_provider.provider_name,
+                    model=text_provider.model_name,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=response_format,
+                    **kwargs
+                )
+                if not refresh_cache:
+                    cached = cache.get(cache_key, "text")
+                    if cached is not None:
+                        logger.info(f"命中文本生成缓存，内容长度: {len(cached)} 字符")
+                        telemetry.record_call("text", text_provider.provider_name, text_provider.model_name,
+                                              cached=True)
+                        return cached
             
-            # 执行文本生成
-            result = await text_provider.generate_text(
-                prompt=prompt,
-                system_prompt=system_prompt,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                response_format=response_format,
-                **kwargs
+            # 执行文本生成（失败时切换到备用路由，开启对冲时慢请求会同时发往下一个路由），同时返回实际响应的路由
+            async def generate(route: router.Route):
+                return route, await route.provider.generate_text(
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=response_format,
+                    **route.call_kwargs(kwargs)
+                )
+
+            route, result = await router.call_with_routing(
+                "text", provider, generate, hedge=True,
+                sample_key=router.latency_key("generate", (system_prompt or "") + prompt),
             )
             
             logger.info(f"文本生成完成，生成内容长度: {len(result)} 字符")
+
+            # 缓存键对应主路由的模型，备用路由的结果不写缓存
+            if cache_key is not None and route.primary and result:
+                cache.set(cache_key, "text", result)
             return result
             
         except Exception as e:
             logger.error(f"文本生成失败: {str(e)}")
             raise LLMServiceError(f"文本生成失败: {str(e)}")
     
+    @staticmethod
+    async def stream_text(prompt: str,
+                          system_prompt: Optional[str] = None,
+                          provider: Optional[str] = None,
+                          temperature: float = 1.0,
+                          max_tokens: Optional[int] = None,
+                          response_format: Optional[str] = None,
+                          use_cache: bool = True,
+                          refresh_cache: bool = False,
+                          **kwargs) -> AsyncIterator[str]:
+        """
+        流式生成文本，逐个返回文本片段
+
+        参数与 generate_text 相同；与 generate_text 共用响应缓存，命中缓存时一次性返回完整内容
+
+        Raises:
+            LLMServiceError: 服务调用失败时抛出
+        """
+        try:
+            text_provider = LLMServiceManager.get_text_provider(provider)
+
+            cache = response_cache.get_cache() if use_cache else None
+            cache_key = None
+            if cache is not None:
+                cache_key = response_cache.make_cache_key(
+                    "text",
+                    provider=text_provider.provider_name,
+                    model=text_provider.model_name,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=response_format,
+                    **kwargs
+                )
+                if not refresh_cache:
+                    cached = cache.get(cache_key, "text")
+                    if cached is not None:
+                        logger.info(f"命中文本生成缓存，内容长度: {len(cached)} 字符")
+                        telemetry.record_call("stream", text_provider.provider_name, text_provider.model_name,
+                                              cached=True)
+                        yield cached
+                        return
+
+            # 收到第一个片段之前失败时切换到备用路由
+            stream = None
+            route = None
+            chunks = []
+            routes = router.get_routes("text", provider)
+            for index, candidate in enumerate(routes):
+                breaker = router.get_breaker(candidate.name)
+                breaker.begin_call()
+                started = time.monotonic()
+                stream = candidate.provider.stream_text(
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format=response_format,
+                    **candidate.call_kwargs(kwargs)
+                )
+                try:
+                    chunks.append(await stream.__anext__())
+                except StopAsyncIteration:
+                    route = candidate
+                    break
+                except Exception as e:
+                    breaker.record_failure()
+                    if index == len(routes) - 1:
+                        raise
+                    logger.warning(f"路由 {candidate.name} 流式调用失败，切换到 {routes[index + 1].name}: {str(e)}")
+                    continue
+                route = candidate
+                break
+
+            # 整个流结束后才记录成功和耗时：首个片段的耗时远小于完整响应，不能混入对冲请求使用的延迟样本
+            try:
+                if chunks:
+                    yield chunks[0]
+                    async for chunk in stream:
+                        chunks.append(chunk)
+                        yield chunk
+            except Exception:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                # 调用方提前停止读取或任务被取消，不计入熔断统计
+                breaker.cancel_call()
+                raise
+            breaker.record_success(time.monotonic() - started,
+                                   router.latency_key("stream", (system_prompt or "") + prompt))
+
+            result = "".join(chunks)
+            logger.info(f"流式文本生成完成，生成内容长度: {len(result)} 字符")
+
+            # 缓存键对应主路由的模型，备用路由的结果不写缓存
+            if cache_key is not None and route.primary and result:
+                cache.set(cache_key, "text", result)
+
+        except Exception as e:
+            logger.error(f"流式文本生成失败: {str(e)}")
+            raise LLMServiceError(f"流式文本生成失败: {str(e)}")
+
     @staticmethod
     async def generate_narration_script(prompt: str,
                                       provider: Optional[str] = None,
@@ -235,6 +410,42 @@ class UnifiedLLMService:
         """
         return LLMServiceManager.list_text_providers()
     
+    @staticmethod
+    def get_routing_stats() -> Dict[str, Dict[str, Any]]:
+        """
+        获取各路由的熔断状态和延迟统计
+
+        Returns:
+            以路由名称（类型:提供商/模型）为键的统计信息
+        """
+        return router.get_routing_stats()
+
+    @staticmethod
+    def get_usage_stats(task_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取大模型调用的 token、费用和延迟统计
+
+        Args:
+            task_id: 任务ID，不指定时返回全局统计和各任务的汇总
+
+        Returns:
+            统计信息；指定的任务没有调用记录时返回 None
+        """
+        if task_id:
+            return telemetry.get_task_usage(task_id)
+        return telemetry.get_snapshot()
+
+    @staticmethod
+    def get_response_cache_stats() -> Optional[Dict[str, Any]]:
+        """
+        获取响应缓存统计（命中/未命中次数、条目数和大小）
+        
+        Returns:
+            统计字典，未开启缓存时返回 None
+        """
+        cache = response_cache.get_cache()
+        return cache.get_stats() if cache is not None else None
+    
     @staticmethod
     def clear_cache():
         """清空提供商实例缓存"""
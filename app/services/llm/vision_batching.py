@@ -0,0 +1,124 @@
+"""
+视觉分析的自适应分批
+
+固定的 vision_batch_size 对不同模型、不同分辨率的关键帧都不合适：批次太小浪费每次请求的固定开销，
+批次太大容易超出上下文或出现很长的尾部延迟。开启 [frames] vision_adaptive_batching 后：
+
+- 根据分辨率和模型系列估算每张图片的 token 数，按 token 预算装箱
+- token 预算默认取 LiteLLM 模型信息中 max_input_tokens 的一半
+- 每个批次完成后根据耗时和错误调整后续批次的大小：超时或出错时减半，明显快于目标耗时时逐步增大
+
+每个批次的结果是带有 start/end（图片下标范围）的 BatchResponse，调用方据此找到对应的关键帧。
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+from loguru import logger
+
+DEFAULT_TOKEN_BUDGET = 16000        # 无法获取模型信息时的 token 预算
+DEFAULT_TARGET_LATENCY = 60.0       # 单个批次的目标耗时（秒）
+DEFAULT_MAX_BATCH_SIZE = 30
+BUDGET_RATIO = 0.5                  # 预算占模型最大输入的比例，其余留给提示词和输出
+
+
+class BatchResponse(str):
+    """批次的响应文本，附带该批次在图片列表中的范围 [start, end)"""
+
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+    def __new__(cls, text: str, start: Optional[int] = None, end: Optional[int] = None):
+        obj = super().__new__(cls, text)
+        obj.start = start
+        obj.end = end
+        return obj
+
+
+# 缓存格式版本：写入缓存键，格式变化后旧缓存不会再被命中
+CACHE_FORMAT = 2
+
+
+def dump_responses(responses: Sequence[str]) -> list:
+    """转换为可以 JSON 序列化的格式（保留批次范围）"""
+    return [[str(r), getattr(r, "start", None), getattr(r, "end", None)] for r in responses]
+
+
+def load_responses(data: list) -> Optional[List[str]]:
+    """从 dump_responses 的格式恢复；格式不符（如旧版本缓存的纯文本列表）时返回 None"""
+    if not isinstance(data, list) or not all(isinstance(item, list) and len(item) == 3 for item in data):
+        return None
+    return [BatchResponse(text, start, end) for text, start, end in data]
+
+
+def estimate_image_tokens(width: int, height: int, model_name: str) -> int:
+    """按模型系列的计费规则估算一张图片的输入 token 数"""
+    model = model_name.lower()
+    if "gemini" in model:
+        if width <= 384 and height <= 384:
+            return 258
+        return math.ceil(width / 768) * math.ceil(height / 768) * 258
+    if "claude" in model or "anthropic" in model:
+        return min(1600, math.ceil(width * height / 750))
+    if "qwen" in model or "dashscope" in model:
+        return math.ceil(width / 28) * math.ceil(height / 28) + 2
+    # OpenAI 规则（其他兼容接口也按此估算）：缩放到 2048 以内、短边 768，按 512 像素切块
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def model_token_budget(model_name: str, configured: int = 0) -> int:
+    """单个批次的图片 token 预算"""
+    if configured:
+        return int(configured)
+    try:
+        import litellm
+
+        info = litellm.get_model_info(model_name)
+        max_input = info.get("max_input_tokens") or info.get("max_tokens")
+        if max_input:
+            return int(max_input * BUDGET_RATIO)
+    except Exception as e:
+        logger.debug(f"无法获取模型 {model_name} 的上下文信息: {str(e)}")
+    return DEFAULT_TOKEN_BUDGET
+
+
+class AdaptiveBatchSizer:
+    """根据 token 预算和已完成批次的表现决定下一批的图片数量"""
+
+    def __init__(self, image_tokens: Sequence[int], token_budget: int, initial_size: int,
+                 max_size: int = DEFAULT_MAX_BATCH_SIZE, target_latency: float = DEFAULT_TARGET_LATENCY):
+        self.image_tokens = list(image_tokens)
+        self.token_budget = token_budget
+        self.max_size = max(1, max_size)
+        self.size = max(1, min(initial_size, self.max_size))
+        self.target_latency = target_latency
+
+    def next_end(self, start: int) -> int:
+        """从 start 开始装箱，返回批次的结束下标（至少包含一张图片）"""
+        end = start
+        tokens = 0
+        while end < len(self.image_tokens) and end - start < self.size:
+            if end > start and tokens + self.image_tokens[end] > self.token_budget:
+                break
+            tokens += self.image_tokens[end]
+            end += 1
+        return end
+
+    def record_success(self, latency: float):
+        if latency > self.target_latency:
+            self._resize(int(self.size * 0.75), f"耗时 {latency:.1f}s 超过目标")
+        elif latency < self.target_latency / 2:
+            self._resize(self.size + max(1, self.size // 4), f"耗时 {latency:.1f}s")
+
+    def record_failure(self, error: Exception):
+        self._resize(self.size // 2, f"请求失败: {str(error)[:80]}")
+
+    def _resize(self, size: int, reason: str):
+        size = max(1, min(size, self.max_size))
+        if size != self.size:
+            logger.info(f"调整视觉分析批次大小: {self.size} -> {size}（{reason}）")
+            self.size = size
@@ -6,7 +6,6 @@ from urllib.parse import urlencode
 from datetime import datetime
 import json
 
-import requests
 from typing import List, Optional
 from loguru import logger
 from moviepy.video.io.VideoFileClip import VideoFileClip
@@ -15,6 +14,7 @@ from app.config import config
 from app.models.schema import VideoAspect, VideoConcatMode, MaterialInfo
 from app.utils import utils
 from app.utils import ffmpeg_utils
+from app.utils import http_client
 
 requested_count = 0
 
@@ -52,10 +52,9 @@ def search_videos_pexels(
     logger.info(f"searching videos: {query_url}, with proxies: {config.proxy}")
 
     try:
-        r = requests.get(
+        r = http_client.get(
             query_url,
             headers=headers,
-            proxies=config.proxy,
             verify=False,
             timeout=(30, 60),
         )
@@ -111,9 +110,7 @@ def search_videos_pixabay(
     logger.info(f"searching videos: {query_url}, with proxies: {config.proxy}")
 
     try:
-        r = requests.get(
-            query_url, proxies=config.proxy, verify=False, timeout=(30, 60)
-        )
+        r = http_client.get(query_url, verify=False, timeout=(30, 60))
         response = r.json()
         video_items = []
         if "hits" not in response:
@@ -164,12 +161,10 @@ def save_video(video_url: str, save_dir: str = "") -> str:
         return video_path
 
     # if video does not exist, download it
-    with open(video_path, "wb") as f:
-        f.write(
-            requests.get(
-                video_url, proxies=config.proxy, verify=False, timeout=(60, 240)
-            ).content
-        )
+    with http_client.get(video_url, verify=False, timeout=(60, 240), stream=True) as r:
+        with open(video_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
 
     if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
         try:
@@ -11,6 +11,7 @@
 
 from .frame_analysis import FrameAnalysisPrompt
 from .narration_generation import NarrationGenerationPrompt
+from .narration_segment import NarrationSegmentPrompt, NarrationTransitionPrompt
 from ..manager import PromptManager
 
 
@@ -25,9 +26,19 @@ def register_prompts():
     narration_prompt = NarrationGenerationPrompt()
     PromptManager.register_prompt(narration_prompt, is_default=True)
 
+    # 注册长视频分段生成提示词
+    segment_prompt = NarrationSegmentPrompt()
+    PromptManager.register_prompt(segment_prompt, is_default=True)
+
+    # 注册分段文案衔接润色提示词
+    transition_prompt = NarrationTransitionPrompt()
+    PromptManager.register_prompt(transition_prompt, is_default=True)
+
 
 __all__ = [
     "FrameAnalysisPrompt",
     "NarrationGenerationPrompt",
+    "NarrationSegmentPrompt",
+    "NarrationTransitionPrompt",
     "register_prompts"
 ]
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""
+@Project: 逐帧解说-分段文案生成
+@File   : narration_segment.py
+@Description: 长视频分段生成解说文案（map）与衔接润色（reduce）提示词
+"""
+
+from ..base import TextPrompt, PromptMetadata, ModelType, OutputFormat
+
+
+class NarrationSegmentPrompt(TextPrompt):
+    """长视频单个时间段的解说文案生成提示词"""
+
+    def __init__(self):
+        metadata = PromptMetadata(
+            name="narration_segment_generation",
+            category="documentary",
+            version="v1.0",
+            description="长视频按时间段分段生成解说文案，各段共享全片概要和统一风格",
+            model_type=ModelType.TEXT,
+            output_format=OutputFormat.JSON,
+            tags=["短视频", "解说文案", "长视频", "分段生成"],
+            parameters=["video_overview", "segment_position", "video_frame_description"]
+        )
+        super().__init__(metadata)
+
+        self._system_prompt = "你是一名资深的短视频解说导演和编剧，深谙病毒式传播规律和用户心理，擅长创作让人停不下来的高粘性解说内容。"
+
+    def get_template(self) -> str:
+        return """你正在为一个较长的视频创作解说文案。视频被切分成多个时间段，由多位编剧同时撰写，最后拼接成一篇完整的解说。
+为了保证拼接后风格统一，所有时间段都遵循同样的全片概要和写作风格。
+
+<video_overview>
+${video_overview}
+</video_overview>
+
+<style_guide>
+- **节奏感**：短句为主，控制在 15-20 字/句，朗朗上口
+- **画面感**：用具体动作和细节描述，避免抽象概念
+- **情绪起伏**：制造期待、惊喜、满足的情绪曲线
+- **信息密度**：每 5-10 秒一个信息点，保持新鲜感
+- **口语化**：像朋友聊天，避免书面语和专业术语
+- **留白艺术**：关键时刻停顿，让画面说话
+</style_guide>
+
+<segment_position>
+${segment_position}
+</segment_position>
+
+<video_frame_description>
+${video_frame_description}
+</video_frame_description>
+
+现在，请只为 <video_frame_description> 中的这一段视频创作解说文案。
+
+<creation_guide>
+- 如果是第一段：开头 3 秒必须使用钩子技巧，立即抓住注意力
+- 如果是中间段：直接承接上文推进情节，不要重新开场、不要打招呼、不要总结全片
+- 如果是最后一段：结尾呼应开头，强化记忆点或引导互动
+- 结合 <video_overview> 理解这一段在全片中的作用，可以为后续内容埋下悬念
+</creation_guide>
+
+请使用以下 JSON 格式输出：
+
+<output>
+{
+  "items": [
+    {
+        "_id": 1,
+        "timestamp": "00:00:05,390-00:00:10,430",
+        "picture": "画面描述",
+        "narration": "解说文案"
+    }
+  ]
+}
+</output>
+
+<restriction>
+1. 只输出 JSON 内容，不要输出其他任何说明性文字
+2. 解说文案的语言使用简体中文
+3. 严禁虚构画面，所有画面描述只能从 <video_frame_description> 中提取
+4. 严禁虚构时间戳，所有时间戳只能从 <video_frame_description> 中提取，且必须按时间顺序排列
+5. 每个片段的解说文案要与画面内容精准匹配
+6. 控制单句长度在 15-20 字，确保口语化表达
+</restriction>"""
+
+
+class NarrationTransitionPrompt(TextPrompt):
+    """分段生成的解说文案在段落衔接处的润色提示词"""
+
+    def __init__(self):
+        metadata = PromptMetadata(
+            name="narration_transition_polish",
+            category="documentary",
+            version="v1.0",
+            description="润色分段生成的解说文案在段落衔接处的过渡，保持片段数量和时间戳不变",
+            model_type=ModelType.TEXT,
+            output_format=OutputFormat.JSON,
+            tags=["解说文案", "长视频", "衔接润色"],
+            parameters=["narration_items"]
+        )
+        super().__init__(metadata)
+
+        self._system_prompt = "你是一名专业的短视频解说文案编辑，擅长让多人撰写的文案读起来像一个人一气呵成。"
+
+    def get_template(self) -> str:
+        return """下面是一篇长视频解说文案中各段落衔接处的片段。它们由不同编剧分段撰写，segment 表示所属段落，
+相邻段落的衔接处可能出现重复开场、重复总结、语气突变或逻辑跳跃。
+
+<narration_items>
+${narration_items}
+</narration_items>
+
+请润色这些片段的 narration，使段落之间过渡自然、前后连贯。
+
+<restriction>
+1. 只修改确有问题的 narration，没有问题的片段原样返回
+2. 不得增加或删除片段，不得修改 _id
+3. 每条 narration 的长度与原文相近，保持口语化、单句 15-20 字
+4. 只输出 JSON 内容，不要输出其他任何说明性文字
+</restriction>
+
+请使用以下 JSON 格式输出：
+
+<output>
+{
+  "items": [
+    {
+        "_id": 1,
+        "narration": "润色后的解说文案"
+    }
+  ]
+}
+</output>"""
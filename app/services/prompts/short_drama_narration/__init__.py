@@ -10,6 +10,7 @@
 """
 
 from .plot_analysis import PlotAnalysisPrompt
+from .plot_chunk_analysis import PlotChunkAnalysisPrompt, PlotAnalysisMergePrompt
 from .script_generation import ScriptGenerationPrompt
 from ..manager import PromptManager
 
@@ -20,6 +21,14 @@ def register_prompts():
     # 注册剧情分析提示词
     plot_analysis_prompt = PlotAnalysisPrompt()
     PromptManager.register_prompt(plot_analysis_prompt, is_default=True)
+
+    # 注册长字幕分段剧情分析提示词
+    plot_chunk_analysis_prompt = PlotChunkAnalysisPrompt()
+    PromptManager.register_prompt(plot_chunk_analysis_prompt, is_default=True)
+
+    # 注册分段剧情分析汇总提示词
+    plot_analysis_merge_prompt = PlotAnalysisMergePrompt()
+    PromptManager.register_prompt(plot_analysis_merge_prompt, is_default=True)
     
     # 注册解说脚本生成提示词
     script_generation_prompt = ScriptGenerationPrompt()
@@ -28,6 +37,8 @@ def register_prompts():
 
 __all__ = [
     "PlotAnalysisPrompt",
+    "PlotChunkAnalysisPrompt",
+    "PlotAnalysisMergePrompt",
     "ScriptGenerationPrompt",
     "register_prompts"
 ]
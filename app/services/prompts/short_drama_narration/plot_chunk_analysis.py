@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""
+@Project: 短剧解说-分段剧情分析
+@File   : plot_chunk_analysis.py
+@Description: 长字幕分段剧情分析（map）与汇总（reduce）提示词
+"""
+
+from ..base import TextPrompt, PromptMetadata, ModelType, OutputFormat
+
+
+class PlotChunkAnalysisPrompt(TextPrompt):
+    """长字幕单个时间段的剧情分析提示词"""
+
+    def __init__(self):
+        metadata = PromptMetadata(
+            name="plot_chunk_analysis",
+            category="short_drama_narration",
+            version="v1.0",
+            description="分析长字幕中一个时间段的剧情，输出带时间戳的剧情段落，供汇总使用",
+            model_type=ModelType.TEXT,
+            output_format=OutputFormat.TEXT,
+            tags=["短剧", "剧情分析", "字幕解析", "分段分析", "长字幕"],
+            parameters=["chunk_position", "subtitle_content"]
+        )
+        super().__init__(metadata)
+
+        self._system_prompt = "你是一位专业的剧本分析师和剧情概括助手。"
+
+    def get_template(self) -> str:
+        return """# 角色
+你是一位专业的剧本分析师和剧情概括助手。
+
+# 任务
+一部较长的短剧（可能包含多集）的字幕被切分成了多个时间段，分别交给不同的分析师处理，最后再汇总。
+${chunk_position}
+相邻时间段之间有少量重叠的字幕，用于保证衔接处的剧情完整。
+
+请基于下方这一段字幕，完成以下任务：
+1.  **本段剧情概括**：概括这一段中出现的人物、主要事件和冲突。
+2.  **分段剧情解析与时间戳定位**：把这一段划分为若干个剧情段落，对每个段落概括主要内容，并标注开始和结束字幕的时间戳。
+
+# 输出格式要求
+**本段剧情概括：**
+[此处填写本段剧情的概括，包括出场人物及其关系]
+
+**剧情段落 1：[段落主题]**
+*   **时间戳：** [开始时间戳] --> [结束时间戳]
+*   **内容概要：** [对这段剧情的详细描述]
+
+... (根据实际剧情段落数量继续) ...
+
+# 限制
+1. 严禁输出与分析结果无关的内容
+2. 时间戳必须严格按照字幕中的实际时间
+3. 只分析本段字幕中出现的内容，不要猜测其他时间段的剧情
+
+# 请处理以下字幕：
+${subtitle_content}"""
+
+
+class PlotAnalysisMergePrompt(TextPrompt):
+    """把各时间段的剧情分析汇总为完整剧情分析的提示词"""
+
+    def __init__(self):
+        metadata = PromptMetadata(
+            name="plot_analysis_merge",
+            category="short_drama_narration",
+            version="v1.0",
+            description="汇总长字幕各时间段的剧情分析，输出与完整剧情分析相同格式的结果",
+            model_type=ModelType.TEXT,
+            output_format=OutputFormat.TEXT,
+            tags=["短剧", "剧情分析", "分段分析", "汇总"],
+            parameters=["chunk_analyses"]
+        )
+        super().__init__(metadata)
+
+        self._system_prompt = "你是一位专业的剧本分析师和剧情概括助手。"
+
+    def get_template(self) -> str:
+        return """# 角色
+你是一位专业的剧本分析师和剧情概括助手。
+
+# 任务
+一部较长的短剧的字幕被切分成多个时间段分别做了剧情分析，结果按时间顺序列在下方。相邻时间段有少量重叠，
+因此衔接处的剧情段落可能重复。请把它们汇总成一份完整的剧情分析：
+1.  **整体剧情分析**：概括整个短剧的核心剧情脉络、主要冲突和结局（如果有的话）。
+2.  **分段剧情解析与时间戳定位**：
+    *   合并重叠或重复的剧情段落，必要时把过细的段落合并为更完整的段落。
+    *   段落数应该与字幕长度成正比。
+    *   每个段落保留准确的开始和结束时间戳，时间戳只能来自下方的分段分析结果。
+
+# 各时间段的剧情分析
+${chunk_analyses}
+
+# 输出格式要求
+请按照以下格式清晰地呈现分析结果：
+
+**一、整体剧情概括：**
+[此处填写对整个短剧剧情的概括]
+
+**二、分段剧情解析：**
+
+**剧情段落 1：[段落主题/概括，例如：主角登场与背景介绍]**
+*   **时间戳：** [开始时间戳] --> [结束时间戳]
+*   **内容概要：** [对这段剧情的详细描述]
+
+... (根据实际剧情段落数量继续) ...
+
+**剧情段落 N：[段落主题/概括，例如：结局与反思]**
+*   **时间戳：** [开始时间戳] --> [结束时间戳]
+*   **内容概要：** [对这段剧情的详细描述]
+
+# 限制
+1. 严禁输出与分析结果无关的内容
+2. 时间戳必须按时间顺序排列，且严格来自分段分析结果
+3. 语言表达应简洁、准确、客观"""
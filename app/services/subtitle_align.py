@@ -0,0 +1,167 @@
+"""
+字幕与脚本的全局对齐
+
+把脚本全文与识别出的字幕全文（去掉标点和空白后）按字符做一次全局编辑距离对齐，
+再根据对齐结果把每行脚本映射回字幕的时间轴：
+
+- 对齐使用带状动态规划，每行只计算上一行最优位置附近 ±ALIGN_BAND 个字符，
+  并用 NumPy 的累计最小值一次求出整行，复杂度 O(n·band)
+- 识别文本中每个字符的时间在所属字幕条目内按字符数线性插值
+- 每行脚本返回一个置信度：脚本字符与识别字符完全一致的比例
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# 对齐时允许的最大局部偏移（字符数），覆盖识别漏字、多字造成的错位
+ALIGN_BAND = 128
+
+# 回溯方向
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+
+def normalize_chars(text: str) -> str:
+    """只保留文字和数字并转为小写，用于对齐"""
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def _best_column(row: np.ndarray, lo: int, target: float) -> int:
+    """返回一行中代价最小的列号，并列时取最接近 target（对角线位置）的一列"""
+    candidates = np.flatnonzero(row == row.min()) + lo
+    return int(candidates[np.abs(candidates - target).argmin()])
+
+
+def align_sequences(a: str, b: str, band: int = ALIGN_BAND) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    带状全局编辑距离对齐
+
+    Args:
+        a: 参考序列（脚本）
+        b: 待对齐序列（识别结果）
+        band: 每行计算的列范围半宽
+
+    Returns:
+        (matched, equal): matched[i] 为 a[i] 对齐到的 b 下标（未对齐为 -1），
+        equal[i] 表示两个字符是否相同
+    """
+    n, m = len(a), len(b)
+    matched = np.full(n, -1, dtype=np.int64)
+    equal = np.zeros(n, dtype=bool)
+    if n == 0 or m == 0:
+        return matched, equal
+
+    # b 前补一个哨兵，使第 j 列直接对应 b_codes[j]
+    b_codes = np.concatenate([[0xFFFFFFFF], np.frombuffer(b.encode("utf-32-le"), dtype=np.uint32)])
+    a_codes = np.frombuffer(a.encode("utf-32-le"), dtype=np.uint32)
+    inf = n + m + 1
+
+    # 每行固定计算 width 列，避免逐行分配不同大小的数组
+    width = min(m + 1, 2 * band + 1)
+    offsets = np.arange(width, dtype=np.int64)
+    lows = np.zeros(n + 1, dtype=np.int64)
+    directions = np.empty((n + 1, width), dtype=np.int8)
+
+    # 第 0 行：只能从 b 插入字符
+    prev = offsets.copy()
+    directions[0] = _LEFT
+    padded = np.empty(width + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        # 以上一行的最优位置为中心计算本行（并列时偏向对角线，避免带状区域向一侧漂移）
+        p_lo = lows[i - 1]
+        center = _best_column(prev, p_lo, (i - 1) * m / n) + 1
+        lo = min(max(0, center - band), m + 1 - width)
+        lows[i] = lo
+        cols = offsets + lo
+
+        # padded[k] 为上一行第 lo - 1 + k 列的值（范围外视为无穷大）
+        shift = lo - p_lo
+        padded.fill(inf)
+        s, e = max(0, shift - 1), min(width, shift + width)
+        if s < e:
+            padded[s - shift + 1:e - shift + 1] = prev[s:e]
+
+        up = padded[1:] + 1
+        diag = padded[:-1] + (b_codes[cols] != a_codes[i - 1])
+        best = np.minimum(diag, up)
+        direction = directions[i]
+        np.greater(diag, up, out=direction, casting="unsafe")  # _DIAG=0, _UP=1
+        # 行内插入：D[j] = min(best[j], D[j-1] + 1)，用累计最小值一次求出
+        row = np.minimum.accumulate(best - cols) + cols
+        direction[row < best] = _LEFT
+
+        prev = row
+
+    # 全局对齐从 (n, m) 回溯；m 不在最后一行的带状范围内时从离 m 最近的列开始
+    # （b 末尾多出的内容视为未对齐）
+    i = n
+    j = min(m, lows[n] + width - 1)
+    while i > 0:
+        k = j - lows[i]
+        if k < 0 or k >= width:
+            break
+        step = directions[i, k]
+        if step == _DIAG:
+            matched[i - 1] = j - 1
+            equal[i - 1] = a[i - 1] == b[j - 1]
+            i -= 1
+            j -= 1
+        elif step == _UP:
+            i -= 1
+        else:
+            j -= 1
+    return matched, equal
+
+
+def align_script_to_subtitles(script_lines: Sequence[str], subtitle_items: Sequence[tuple]) -> List[dict]:
+    """
+    把脚本的每一行对齐到识别字幕的时间轴上
+
+    Args:
+        script_lines: 按标点切分后的脚本行
+        subtitle_items: 识别出的字幕 [(开始秒数, 结束秒数, 文本), ...]
+
+    Returns:
+        List[dict]: [{"msg": 脚本行, "start_time": 秒, "end_time": 秒, "confidence": 0~1}, ...]
+    """
+    # 识别文本逐字符的时间（在字幕条目内线性插值）
+    recognized = []
+    char_starts = []
+    char_ends = []
+    for start, end, text in subtitle_items:
+        chars = normalize_chars(text)
+        if not chars:
+            continue
+        step = (end - start) / len(chars)
+        recognized.append(chars)
+        char_starts.extend(start + step * k for k in range(len(chars)))
+        char_ends.extend(start + step * (k + 1) for k in range(len(chars)))
+
+    normalized_lines = [normalize_chars(line) for line in script_lines]
+    matched, equal = align_sequences("".join(normalized_lines), "".join(recognized))
+
+    results = []
+    last_end = 0.0
+    pos = 0
+    for line, chars in zip(script_lines, normalized_lines):
+        line_matched = matched[pos:pos + len(chars)]
+        line_equal = equal[pos:pos + len(chars)]
+        pos += len(chars)
+
+        aligned = line_matched[line_matched >= 0]
+        if len(aligned):
+            start_time = max(char_starts[aligned[0]], last_end)
+            end_time = max(char_ends[aligned[-1]], start_time)
+        else:
+            # 整行都没有识别出来，占用上一行结束的位置
+            start_time = end_time = last_end
+        confidence = float(line_equal.mean()) if len(chars) else 0.0
+
+        results.append({
+            "msg": line,
+            "start_time": start_time,
+            "end_time": end_time,
+            "confidence": round(confidence, 4),
+        })
+        last_end = end_time
+    return results
@@ -8,34 +8,10 @@
 @Date   : 2025/5/6 下午4:00 
 '''
 
-import re
 import os
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-
-def parse_time(time_str):
-    """解析时间字符串为timedelta对象"""
-    hours, minutes, seconds_ms = time_str.split(':')
-    seconds, milliseconds = seconds_ms.split(',')
-    
-    td = timedelta(
-        hours=int(hours),
-        minutes=int(minutes),
-        seconds=int(seconds),
-        milliseconds=int(milliseconds)
-    )
-    return td
-
-
-def format_time(td):
-    """将timedelta对象格式化为SRT时间字符串"""
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    milliseconds = td.microseconds // 1000
-    
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+from app.services.subtitle_track import SubtitleTrack
 
 
 def parse_edited_time_range(time_range_str):
@@ -59,28 +35,58 @@ def parse_edited_time_range(time_range_str):
     return start_time, end_time
 
 
-def merge_subtitle_files(subtitle_items, output_file=None):
-    """
-    合并多个SRT字幕文件
+def _default_output_file(sorted_items):
+    """根据第一个有效字幕文件的目录和整体时间范围生成输出路径"""
+    valid_item = None
+    for item in sorted_items:
+        if item.get('subtitle') and os.path.exists(item.get('subtitle')):
+            valid_item = item
+            break
 
-    参数:
-        subtitle_items: 字典列表，每个字典包含subtitle文件路径和editedTimeRange
-        output_file: 输出文件的路径，如果为None则自动生成
+    if not valid_item:
+        return None
 
-    返回:
-        合并后的字幕文件路径，如果没有有效字幕则返回None
-    """
-    # 按照editedTimeRange的开始时间排序
-    sorted_items = sorted(subtitle_items,
-                         key=lambda x: parse_edited_time_range(x.get('editedTimeRange', ''))[0] or timedelta())
+    dir_path = os.path.dirname(valid_item['subtitle'])
+    first_start = parse_edited_time_range(sorted_items[0]['editedTimeRange'])[0]
+    last_end = parse_edited_time_range(sorted_items[-1]['editedTimeRange'])[1]
 
-    merged_subtitles = []
-    subtitle_index = 1
-    valid_items_count = 0
+    if first_start and last_end:
+        first_start_h, first_start_m, first_start_s = int(first_start.seconds // 3600), int((first_start.seconds % 3600) // 60), int(first_start.seconds % 60)
+        last_end_h, last_end_m, last_end_s = int(last_end.seconds // 3600), int((last_end.seconds % 3600) // 60), int(last_end.seconds % 60)
+
+        first_start_str = f"{first_start_h:02d}_{first_start_m:02d}_{first_start_s:02d}"
+        last_end_str = f"{last_end_h:02d}_{last_end_m:02d}_{last_end_s:02d}"
+
+        return os.path.join(dir_path, f"merged_subtitle_{first_start_str}-{last_end_str}.srt")
+    return os.path.join(dir_path, f"merged_subtitle.srt")
+
+
+def _sort_items(subtitle_items):
+    """按照editedTimeRange的开始时间排序"""
+    return sorted(subtitle_items,
+                  key=lambda x: parse_edited_time_range(x.get('editedTimeRange', ''))[0] or timedelta())
+
+
+def _item_track(item):
+    """片段的字幕轨道：优先使用 TTS 阶段传下来的内存轨道，其次读取字幕文件"""
+    track = item.get('subtitle_track')
+    if track is not None:
+        return track
+    if not item.get('subtitle') or not os.path.exists(item.get('subtitle')):
+        print(f"跳过项目 {item.get('_id')}：字幕文件不存在或路径为空")
+        return None
+    try:
+        return SubtitleTrack.load(item['subtitle'])
+    except Exception as e:
+        print(f"处理项目 {item.get('_id')} 的字幕文件时出错: {str(e)}")
+        return None
 
+
+def _iter_shifted_tracks(sorted_items):
+    """逐个生成加上 editedTimeRange 偏移后的片段字幕轨道（跳过无效片段）"""
     for item in sorted_items:
-        if not item.get('subtitle') or not os.path.exists(item.get('subtitle')):
-            print(f"跳过项目 {item.get('_id')}：字幕文件不存在或路径为空")
+        track = _item_track(item)
+        if track is None:
             continue
 
         # 从editedTimeRange获取起始时间偏移
@@ -90,100 +96,82 @@ def merge_subtitle_files(subtitle_items, output_file=None):
             print(f"警告: 无法从项目 {item.get('_id')} 的editedTimeRange中提取时间范围，跳过该项")
             continue
 
-        try:
-            with open(item['subtitle'], 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-
-            # 检查文件内容是否为空
-            if not content:
-                print(f"跳过项目 {item.get('_id')}：字幕文件内容为空")
-                continue
+        # 检查内容是否为空
+        if not len(track):
+            print(f"跳过项目 {item.get('_id')}：字幕内容为空")
+            continue
 
-            valid_items_count += 1
+        yield track.shift(int(offset_time.total_seconds() * 1000))
 
-            # 解析字幕文件
-            subtitle_blocks = re.split(r'\n\s*\n', content)
 
-            for block in subtitle_blocks:
-                lines = block.strip().split('\n')
-                if len(lines) < 3:  # 确保块有足够的行数
-                    continue
+def merge_subtitle_tracks(subtitle_items):
+    """
+    在内存中合并各片段的字幕轨道
 
-                # 解析时间轴行
-                time_line = lines[1]
-                time_parts = time_line.split(' --> ')
-                if len(time_parts) != 2:
-                    continue
+    参数:
+        subtitle_items: 字典列表，每个字典包含subtitle_track（或subtitle文件路径）和editedTimeRange
 
-                start_time = parse_time(time_parts[0])
-                end_time = parse_time(time_parts[1])
+    返回:
+        合并后的 SubtitleTrack，如果没有有效字幕则返回None
+    """
+    track = SubtitleTrack.concat(list(_iter_shifted_tracks(_sort_items(subtitle_items))))
+    if not len(track):
+        print(f"警告: 没有找到有效的字幕内容，共检查了 {len(subtitle_items)} 个项目")
+        return None
+    print(f"字幕轨道合并成功，包含 {len(track)} 个字幕条目")
+    return track
 
-                # 应用时间偏移
-                adjusted_start_time = start_time + offset_time
-                adjusted_end_time = end_time + offset_time
 
-                # 重建字幕块
-                adjusted_time_line = f"{format_time(adjusted_start_time)} --> {format_time(adjusted_end_time)}"
-                text_lines = lines[2:]
+def merge_subtitle_files(subtitle_items, output_file=None):
+    """
+    合并多个SRT字幕文件
 
-                new_block = [
-                    str(subtitle_index),
-                    adjusted_time_line,
-                    *text_lines
-                ]
+    按 editedTimeRange 顺序逐个处理片段字幕，加上时间偏移、重新编号后直接写入输出文件，
+    内存中同时只保留一个片段的字幕。TTS 阶段刚生成的字幕会直接复用已解析的结果。
 
-                merged_subtitles.append('\n'.join(new_block))
-                subtitle_index += 1
-        except Exception as e:
-            print(f"处理项目 {item.get('_id')} 的字幕文件时出错: {str(e)}")
-            continue
+    参数:
+        subtitle_items: 字典列表，每个字典包含subtitle文件路径和editedTimeRange
+        output_file: 输出文件的路径，如果为None则自动生成
 
-    # 检查是否有有效的字幕内容
-    if not merged_subtitles:
-        print(f"警告: 没有找到有效的字幕内容，共检查了 {len(subtitle_items)} 个项目，其中 {valid_items_count} 个有有效文件")
-        return None
+    返回:
+        合并后的字幕文件路径，如果没有有效字幕则返回None
+    """
+    sorted_items = _sort_items(subtitle_items)
 
     # 确定输出文件路径
     if output_file is None:
-        # 找到第一个有效的字幕文件来确定目录
-        valid_item = None
-        for item in sorted_items:
-            if item.get('subtitle') and os.path.exists(item.get('subtitle')):
-                valid_item = item
-                break
-
-        if not valid_item:
-            print("错误: 无法确定输出目录，没有找到有效的字幕文件")
+        output_file = _default_output_file(sorted_items)
+        if not output_file:
+            print(f"警告: 没有找到有效的字幕内容，共检查了 {len(subtitle_items)} 个项目")
             return None
 
-        dir_path = os.path.dirname(valid_item['subtitle'])
-        first_start = parse_edited_time_range(sorted_items[0]['editedTimeRange'])[0]
-        last_end = parse_edited_time_range(sorted_items[-1]['editedTimeRange'])[1]
-
-        if first_start and last_end:
-            first_start_h, first_start_m, first_start_s = int(first_start.seconds // 3600), int((first_start.seconds % 3600) // 60), int(first_start.seconds % 60)
-            last_end_h, last_end_m, last_end_s = int(last_end.seconds // 3600), int((last_end.seconds % 3600) // 60), int(last_end.seconds % 60)
-
-            first_start_str = f"{first_start_h:02d}_{first_start_m:02d}_{first_start_s:02d}"
-            last_end_str = f"{last_end_h:02d}_{last_end_m:02d}_{last_end_s:02d}"
-
-            output_file = os.path.join(dir_path, f"merged_subtitle_{first_start_str}-{last_end_str}.srt")
-        else:
-            output_file = os.path.join(dir_path, f"merged_subtitle.srt")
-
-    # 合并所有字幕块
-    merged_content = '\n\n'.join(merged_subtitles)
+    subtitle_index = 1
+    valid_items_count = 0
+    part_file = f"{output_file}.part"
 
-    # 写入合并后的内容
     try:
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(merged_content)
-        print(f"字幕文件合并成功: {output_file}，包含 {len(merged_subtitles)} 个字幕条目")
-        return output_file
+        with open(part_file, 'w', encoding='utf-8') as out:
+            for track in _iter_shifted_tracks(sorted_items):
+                valid_items_count += 1
+                # 重新编号后直接写出
+                out.writelines(track.iter_srt(subtitle_index))
+                subtitle_index += len(track)
     except Exception as e:
         print(f"写入字幕文件失败: {str(e)}")
+        if os.path.exists(part_file):
+            os.remove(part_file)
         return None
 
+    # 检查是否有有效的字幕内容
+    if subtitle_index == 1:
+        print(f"警告: 没有找到有效的字幕内容，共检查了 {len(subtitle_items)} 个项目，其中 {valid_items_count} 个有有效文件")
+        os.remove(part_file)
+        return None
+
+    os.replace(part_file, output_file)
+    print(f"字幕文件合并成功: {output_file}，包含 {subtitle_index - 1} 个字幕条目")
+    return output_file
+
 
 if __name__ == '__main__':
     # 测试数据
@@ -0,0 +1,142 @@
+"""
+长字幕的分段剧情分析
+
+多集短剧的完整字幕一次性放进剧情分析提示词，容易超出模型上下文，耗时也很长。分段模式下：
+
+- 按时间窗口把字幕切成若干段，相邻两段之间有少量重叠的字幕（单条字幕不会被拆开）
+- 各段并行做剧情分析（map），并发数受 [app] subtitle_analysis_max_concurrency 限制
+- 把各段的分析结果汇总成与整体分析相同格式的剧情分析（reduce），供生成解说文案使用
+
+字幕时长不超过一个窗口、或者没有时间码时，仍由调用方整体分析。
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.config import config
+from app.services.prompts import PromptManager
+from app.services.subtitle_track import SubtitleTrack, format_ms
+
+DEFAULT_CHUNK_SECONDS = 600         # 每段字幕的时长（秒），0 表示不分段
+DEFAULT_OVERLAP_SECONDS = 30        # 相邻两段重叠的时长（秒）
+DEFAULT_MAX_CONCURRENCY = 4         # 同时在途的分段分析请求数
+CHUNK_ATTEMPTS = 2                  # 每段最多请求的次数
+
+SYSTEM_PROMPT = "你是一位专业的剧本分析师和剧情概括助手。"
+
+
+class SubtitleChunk(NamedTuple):
+    text: str       # 该段的 SRT 文本（保留原字幕序号和时间戳）
+    start_ms: int
+    end_ms: int
+
+
+def split_subtitle_chunks(subtitle_content: str,
+                          chunk_seconds: Optional[float] = None,
+                          overlap_seconds: Optional[float] = None) -> List[SubtitleChunk]:
+    """
+    按时间窗口切分 SRT 字幕
+
+    Args:
+        subtitle_content: SRT 字幕文本
+        chunk_seconds: 每段时长（秒），默认读取 [app] subtitle_analysis_chunk_seconds
+        overlap_seconds: 相邻两段重叠的时长（秒），默认读取 [app] subtitle_analysis_overlap_seconds
+
+    Returns:
+        List[SubtitleChunk]: 按时间顺序排列的字幕段；不分段或没有时间码时返回空列表
+    """
+    if chunk_seconds is None:
+        chunk_seconds = float(config.app.get("subtitle_analysis_chunk_seconds", DEFAULT_CHUNK_SECONDS))
+    if overlap_seconds is None:
+        overlap_seconds = float(config.app.get("subtitle_analysis_overlap_seconds", DEFAULT_OVERLAP_SECONDS))
+    if chunk_seconds <= 0:
+        return []
+
+    track = SubtitleTrack.parse(subtitle_content).sorted()
+    if not len(track):
+        return []
+
+    chunk_ms = int(chunk_seconds * 1000)
+    overlap_ms = int(min(max(overlap_seconds, 0) * 1000, chunk_ms / 2))
+    first_ms = int(track.starts.min())
+    last_ms = int(track.starts.max())
+
+    chunks = []
+    window_start = first_ms
+    while window_start <= last_ms:
+        window_end = window_start + chunk_ms
+        mask = (track.starts >= window_start - overlap_ms) & (track.starts < window_end)
+        if mask.any():
+            part = track.filter(mask)
+            chunks.append(SubtitleChunk(
+                text="".join(part.iter_srt(int(np.argmax(mask)) + 1)),
+                start_ms=int(part.starts.min()),
+                end_ms=int(part.ends.max()),
+            ))
+        window_start = window_end
+    return chunks
+
+
+def _chunk_time_range(chunk: SubtitleChunk) -> str:
+    return f"{format_ms(chunk.start_ms)} --> {format_ms(chunk.end_ms)}"
+
+
+async def analyze_plot_in_chunks(chunks: List[SubtitleChunk],
+                                 generate: Callable[[str, str], Awaitable[str]],
+                                 max_concurrency: Optional[int] = None) -> str:
+    """
+    分段分析剧情并汇总
+
+    Args:
+        chunks: split_subtitle_chunks 切分出的字幕段
+        generate: 调用大模型的协程函数，参数为 (提示词, 系统提示词)，返回生成的文本
+        max_concurrency: 同时在途的请求数，默认读取 [app] subtitle_analysis_max_concurrency
+
+    Returns:
+        str: 汇总后的剧情分析（格式与整体分析相同）
+    """
+    if max_concurrency is None:
+        max_concurrency = int(config.app.get("subtitle_analysis_max_concurrency", DEFAULT_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    logger.info(f"字幕较长，分 {len(chunks)} 段并行分析剧情，并发数: {max(1, max_concurrency)}")
+
+    async def analyze_chunk(index: int, chunk: SubtitleChunk) -> str:
+        prompt = PromptManager.get_prompt(
+            category="short_drama_narration",
+            name="plot_chunk_analysis",
+            parameters={
+                "chunk_position": f"这是全部 {len(chunks)} 段字幕中的第 {index + 1} 段，时间范围：{_chunk_time_range(chunk)}。",
+                "subtitle_content": chunk.text,
+            }
+        )
+        async with semaphore:
+            for attempt in range(CHUNK_ATTEMPTS):
+                try:
+                    result = await generate(prompt, SYSTEM_PROMPT)
+                    if not result or not result.strip():
+                        raise ValueError("分析结果为空")
+                    break
+                except Exception as e:
+                    if attempt == CHUNK_ATTEMPTS - 1:
+                        raise
+                    logger.warning(f"第 {index + 1} 段字幕剧情分析失败，重试: {str(e)}")
+        logger.info(f"第 {index + 1}/{len(chunks)} 段字幕剧情分析完成")
+        return result.strip()
+
+    analyses = await asyncio.gather(*(analyze_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+
+    chunk_analyses = "\n\n".join(
+        f"## 第 {i + 1} 段（{_chunk_time_range(chunk)}）\n{analysis}"
+        for i, (chunk, analysis) in enumerate(zip(chunks, analyses))
+    )
+    prompt = PromptManager.get_prompt(
+        category="short_drama_narration",
+        name="plot_analysis_merge",
+        parameters={"chunk_analyses": chunk_analyses}
+    )
+    result = await generate(prompt, SYSTEM_PROMPT)
+    logger.info(f"分段剧情分析汇总完成，内容长度: {len(result)} 字符")
+    return result
@@ -12,8 +12,12 @@ issues (e.g. Windows UTF-16 SRT, timestamp separators, etc.).
 
 from __future__ import annotations
 
+import codecs
+import hashlib
 import os
 import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Iterable, Optional
 
@@ -66,6 +70,101 @@ def normalize_subtitle_text(text: str) -> str:
     return normalized.strip()
 
 
+_DEFAULT_ENCODINGS = (
+    "utf-8",
+    "utf-8-sig",
+    "utf-16",
+    "utf-16-le",
+    "utf-16-be",
+    "gbk",
+    "gb2312",
+)
+
+# Only this many leading bytes are trial-decoded when picking an encoding.
+_SNIFF_BYTES = 64 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Encoding decisions keyed by (content hash, candidate encodings).
+_ENCODING_CACHE_SIZE = 256
+_encoding_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_encoding_cache_lock = threading.Lock()
+
+
+def _content_key(data: bytes, candidates: tuple) -> tuple:
+    return hashlib.blake2b(data, digest_size=16).digest(), candidates
+
+
+def _cached_encoding(key: tuple) -> Optional[str]:
+    with _encoding_cache_lock:
+        encoding = _encoding_cache.get(key)
+        if encoding is not None:
+            _encoding_cache.move_to_end(key)
+        return encoding
+
+
+def _cache_encoding(key: tuple, encoding: str) -> None:
+    with _encoding_cache_lock:
+        _encoding_cache[key] = encoding
+        _encoding_cache.move_to_end(key)
+        while len(_encoding_cache) > _ENCODING_CACHE_SIZE:
+            _encoding_cache.popitem(last=False)
+
+
+def _sniff_bom_or_nulls(prefix: bytes) -> Optional[str]:
+    """Detect UTF-8/UTF-16 from a BOM, or UTF-16 without BOM from its NUL-byte pattern."""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding
+
+    sample = prefix[:4096]
+    if len(sample) < 16:
+        return None
+    # ASCII-heavy UTF-16 text has a NUL in every other byte.
+    even_nulls = sample[0::2].count(0)
+    odd_nulls = sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd_nulls > half * 0.3 and even_nulls < half * 0.05:
+        return "utf-16-le"
+    if even_nulls > half * 0.3 and odd_nulls < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def _decode_prefix(prefix: bytes, encoding: str) -> Optional[str]:
+    """Trial-decode a prefix, tolerating a multi-byte sequence cut at the end."""
+    try:
+        return codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+    except UnicodeError:
+        return None
+
+
+def _sniff_encodings(data: bytes, candidates: tuple) -> list:
+    """Order candidate encodings by how well they decode a bounded prefix."""
+    prefix = data[:_SNIFF_BYTES]
+    with_timecodes, decodable = [], []
+    for encoding in candidates:
+        text = _decode_prefix(prefix, encoding)
+        if text is None:
+            continue
+        if has_timecodes(normalize_subtitle_text(text)):
+            with_timecodes.append(encoding)
+        else:
+            decodable.append(encoding)
+    return with_timecodes + decodable
+
+
+def _decode_with(data: bytes, encoding: str) -> Optional[DecodedSubtitle]:
+    try:
+        return DecodedSubtitle(text=normalize_subtitle_text(data.decode(encoding)), encoding=encoding)
+    except UnicodeError:
+        return None
+
+
 def decode_subtitle_bytes(
     data: bytes,
     *,
@@ -74,38 +173,38 @@ def decode_subtitle_bytes(
     """
     Decode subtitle bytes using a small set of common encodings.
 
-    Preference is given to decodings that yield detectable SRT timecodes.
+    The encoding is picked from a BOM / NUL-byte pattern when present, otherwise
+    by trial-decoding only the first _SNIFF_BYTES bytes (preferring decodings that
+    yield detectable SRT timecodes); the whole buffer is then decoded once.
+    Decisions are cached by content hash, so re-reading the same upload is a
+    single decode.
     """
     if data is None:
         return DecodedSubtitle(text="", encoding="utf-8")
 
-    candidates = list(encodings) if encodings else [
-        "utf-8",
-        "utf-8-sig",
-        "utf-16",
-        "utf-16-le",
-        "utf-16-be",
-        "gbk",
-        "gb2312",
-    ]
-
-    decoded_results: list[DecodedSubtitle] = []
-    for encoding in candidates:
-        try:
-            decoded_text = data.decode(encoding)
-        except UnicodeDecodeError:
-            continue
-        decoded_results.append(
-            DecodedSubtitle(text=normalize_subtitle_text(decoded_text), encoding=encoding)
-        )
-
-        # Fast path: if we already see timecodes, keep the first such decode.
-        if has_timecodes(decoded_results[-1].text):
-            return decoded_results[-1]
-
-    if decoded_results:
-        # Fall back to the first successful decoding.
-        return decoded_results[0]
+    candidates = tuple(encodings) if encodings else _DEFAULT_ENCODINGS
+    key = _content_key(data, candidates)
+
+    cached = _cached_encoding(key)
+    if cached is not None:
+        decoded = _decode_with(data, cached)
+        if decoded is not None:
+            return decoded
+
+    ordered = []
+    if not encodings:
+        sniffed = _sniff_bom_or_nulls(data[:_SNIFF_BYTES])
+        if sniffed:
+            ordered.append(sniffed)
+    ordered += [encoding for encoding in _sniff_encodings(data, candidates) if encoding not in ordered]
+    # An encoding that fits the prefix can still fail further in; keep the rest as fallbacks.
+    ordered += [encoding for encoding in candidates if encoding not in ordered]
+
+    for encoding in ordered:
+        decoded = _decode_with(data, encoding)
+        if decoded is not None:
+            _cache_encoding(key, encoding)
+            return decoded
 
     # Last resort: replace undecodable bytes.
     return DecodedSubtitle(text=normalize_subtitle_text(data.decode("utf-8", errors="replace")), encoding="utf-8")
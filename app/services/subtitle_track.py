@@ -0,0 +1,202 @@
+"""
+字幕数据模型
+
+所有 SRT 的读写统一经过 SubtitleTrack：
+
+- 开始/结束时间以整数毫秒保存在 NumPy 数组中，文本单独保存在列表里
+- 只有一个预编译正则的解析器，一次扫描整个文件
+- 平移、过滤、拼接等操作直接作用在数组上
+- 序列化时逐条生成，写文件不需要先拼出完整字符串
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.subtitle_text import normalize_subtitle_text, read_subtitle_text
+
+# 时间轴行 + 文本（直到空行或文件结尾）
+_CUE_RE = re.compile(
+    r"(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})[ \t]*-->[ \t]*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})[^\n]*"
+    r"(.*?)(?=\n[ \t]*\n|\Z)",
+    re.S,
+)
+
+
+# 最近写出/读取过的字幕轨道，按 (修改时间, 文件大小) 校验后复用，避免重复解析
+_TRACK_CACHE_SIZE = 256
+_track_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_track_cache_lock = threading.Lock()
+
+
+def _file_signature(file_path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cache_track(file_path: str, track: "SubtitleTrack"):
+    signature = _file_signature(file_path)
+    if signature is None:
+        return
+    key = os.path.abspath(file_path)
+    with _track_cache_lock:
+        _track_cache[key] = (signature, track)
+        _track_cache.move_to_end(key)
+        while len(_track_cache) > _TRACK_CACHE_SIZE:
+            _track_cache.popitem(last=False)
+
+
+def _cached_track(file_path: str) -> Optional["SubtitleTrack"]:
+    key = os.path.abspath(file_path)
+    with _track_cache_lock:
+        cached = _track_cache.get(key)
+    if cached is None or cached[0] != _file_signature(file_path):
+        return None
+    return cached[1]
+
+
+def format_ms(ms: int) -> str:
+    """毫秒转换为 SRT 时间格式 HH:MM:SS,mmm"""
+    ms = max(0, int(ms))
+    seconds, milliseconds = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def parse_ms(time_str: str) -> int:
+    """SRT 时间（HH:MM:SS,mmm 或 HH:MM:SS.mmm）转换为毫秒"""
+    hms, _, milliseconds = time_str.strip().replace(".", ",").partition(",")
+    hours, minutes, seconds = (int(part) for part in hms.split(":"))
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + int(milliseconds.ljust(3, "0")[:3] or 0)
+
+
+class SubtitleTrack:
+    """字幕轨道：starts/ends 为毫秒数组，texts 为对应的文本"""
+
+    __slots__ = ("starts", "ends", "texts")
+
+    def __init__(self, starts=None, ends=None, texts: Optional[List[str]] = None):
+        self.starts = np.asarray(starts if starts is not None else [], dtype=np.int64)
+        self.ends = np.asarray(ends if ends is not None else [], dtype=np.int64)
+        self.texts = list(texts) if texts is not None else []
+
+    # ---------- 构造 ----------
+
+    @classmethod
+    def parse(cls, content: str) -> "SubtitleTrack":
+        """解析 SRT 文本"""
+        content = normalize_subtitle_text(content)
+        starts, ends, texts = [], [], []
+        for m in _CUE_RE.finditer(content):
+            h1, m1, s1, ms1, h2, m2, s2, ms2, text = m.groups()
+            starts.append(((int(h1) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(ms1.ljust(3, "0")))
+            ends.append(((int(h2) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(ms2.ljust(3, "0")))
+            texts.append(text.strip())
+        return cls(starts, ends, texts)
+
+    @classmethod
+    def load(cls, file_path: str) -> "SubtitleTrack":
+        """
+        读取 SRT 文件（自动识别编码）
+
+        文件未变化时直接复用内存中已解析的结果（例如 TTS 阶段刚写出的字幕）
+        """
+        track = _cached_track(file_path)
+        if track is None:
+            track = cls.parse(read_subtitle_text(file_path).text)
+            _cache_track(file_path, track)
+        return track
+
+    @classmethod
+    def from_cues(cls, cues: Iterable[Tuple[float, float, str]]) -> "SubtitleTrack":
+        """由 (开始秒数, 结束秒数, 文本) 构造"""
+        starts, ends, texts = [], [], []
+        for start, end, text in cues:
+            starts.append(int(round(start * 1000)))
+            ends.append(int(round(end * 1000)))
+            texts.append(text)
+        return cls(starts, ends, texts)
+
+    @classmethod
+    def concat(cls, tracks: Sequence["SubtitleTrack"]) -> "SubtitleTrack":
+        """按顺序拼接多个轨道"""
+        tracks = [track for track in tracks if len(track)]
+        if not tracks:
+            return cls()
+        texts = []
+        for track in tracks:
+            texts.extend(track.texts)
+        return cls(
+            np.concatenate([track.starts for track in tracks]),
+            np.concatenate([track.ends for track in tracks]),
+            texts,
+        )
+
+    # ---------- 基本操作 ----------
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        return zip(self.starts.tolist(), self.ends.tolist(), self.texts)
+
+    @property
+    def duration(self) -> float:
+        """最后一条字幕的结束时间（秒）"""
+        return float(self.ends.max()) / 1000 if len(self) else 0.0
+
+    def shift(self, offset_ms: int) -> "SubtitleTrack":
+        """整体平移（毫秒），返回新轨道"""
+        return SubtitleTrack(self.starts + int(offset_ms), self.ends + int(offset_ms), self.texts)
+
+    def filter(self, mask) -> "SubtitleTrack":
+        """按布尔数组过滤，返回新轨道"""
+        mask = np.asarray(mask, dtype=bool)
+        return SubtitleTrack(
+            self.starts[mask], self.ends[mask], [text for text, keep in zip(self.texts, mask) if keep]
+        )
+
+    def non_empty(self) -> "SubtitleTrack":
+        """去掉文本为空的字幕"""
+        return self.filter([bool(text.strip()) for text in self.texts])
+
+    def clip(self, start_ms: int, end_ms: int) -> "SubtitleTrack":
+        """保留与 [start_ms, end_ms) 有交集的字幕，并把时间裁剪到该范围内"""
+        mask = (self.ends > start_ms) & (self.starts < end_ms)
+        track = self.filter(mask)
+        np.clip(track.starts, start_ms, end_ms, out=track.starts)
+        np.clip(track.ends, start_ms, end_ms, out=track.ends)
+        return track
+
+    def sorted(self) -> "SubtitleTrack":
+        """按开始时间稳定排序"""
+        order = np.argsort(self.starts, kind="stable")
+        return SubtitleTrack(self.starts[order], self.ends[order], [self.texts[i] for i in order])
+
+    def cues(self) -> List[Tuple[Tuple[float, float], str]]:
+        """转换为 moviepy SubtitlesClip 使用的 [((开始秒数, 结束秒数), 文本), ...] 格式"""
+        return [((start / 1000, end / 1000), text) for start, end, text in self]
+
+    # ---------- 序列化 ----------
+
+    def iter_srt(self, start_index: int = 1) -> Iterator[str]:
+        """逐条生成 SRT 字幕块（每块以空行结尾）"""
+        for idx, (start, end, text) in enumerate(self, start=start_index):
+            yield f"{idx}\n{format_ms(start)} --> {format_ms(end)}\n{text}\n\n"
+
+    def to_srt(self) -> str:
+        return "".join(self.iter_srt())
+
+    def write_srt(self, file_path: str) -> str:
+        """流式写出 SRT 文件"""
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.writelines(self.iter_srt())
+        _cache_track(file_path, self)
+        return file_path
@@ -1,9 +1,10 @@
-import requests
 import time
 import json
 import re
 from loguru import logger
 
+from app.utils import http_client
+
 class SunoClient:
     """
     Unofficial client for Suno.ai
@@ -41,7 +42,7 @@ class SunoClient:
         logger.info(f"🎵 Suno Request: {title} [{tags}]")
         
         try:
-            resp = requests.post(url, headers=self.headers, json=payload, timeout=30)
+            resp = http_client.post(url, headers=self.headers, json=payload, timeout=30)
             resp.raise_for_status()
             data = resp.json()
             
@@ -72,7 +73,7 @@ class SunoClient:
             url = f"{self.BASE_URL}/api/feed/?ids={ids_str}"
             
             try:
-                resp = requests.get(url, headers=self.headers)
+                resp = http_client.get(url, headers=self.headers)
                 data = resp.json()
                 
                 for clip in data:
@@ -105,7 +106,7 @@ class SunoClient:
 
     def download_audio(self, url: str, save_path: str):
         """Download MP3 from the URL"""
-        r = requests.get(url, stream=True)
+        r = http_client.get(url, stream=True)
         if r.status_code == 200:
             with open(save_path, 'wb') as f:
                 for chunk in r.iter_content(1024):
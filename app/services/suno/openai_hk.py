@@ -4,6 +4,7 @@ import logging
 from typing import List, Dict, Optional
 from .base import SunoProvider
 from app.config import config
+from app.utils import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,7 @@ class OpenAIHKSunoProvider(SunoProvider):
 
         try:
             logger.info(f"Sending Suno generation request: {title}")
-            response = requests.post(url, json=payload, headers=self._headers(), timeout=15)
+            response = http_client.post(url, json=payload, headers=self._headers(), timeout=15)
             response.raise_for_status()
             
             data = response.json()
@@ -68,7 +69,7 @@ class OpenAIHKSunoProvider(SunoProvider):
         url = f"{self.base_url}/feed/{ids_str}"
         
         try:
-            response = requests.get(url, headers=self._headers(), timeout=10)
+            response = http_client.get(url, headers=self._headers(), timeout=10)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -1,6 +1,7 @@
 import os
 import time
 from loguru import logger
+from app.services import whisper_pool
 from app.utils.utils import get_project_dir
 
 class SunoService:
@@ -45,18 +46,19 @@ class SunoService:
         Returns a list of dicts: [{'text': line, 'start': 0.0, 'end': 2.5}, ...]
         """
         try:
-            from faster_whisper import WhisperModel
+            import faster_whisper  # noqa: F401
         except ImportError:
             logger.error("❌ faster-whisper not installed. Install it to use audio alignment.")
             return []
 
         logger.info("🎙️ Starting Whisper alignment...")
         
-        # Use 'base' or 'small' model for speed on CPU
+        # Use 'base' or 'small' model for speed on CPU; loaded once and shared via the model pool
         model_size = "tiny" 
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
-
-        segments, info = model.transcribe(audio_path, beam_size=5, word_timestamps=False)
+        with whisper_pool.pool.acquire(model_size, device="cpu", compute_type="int8") as model:
+            segments, info = model.transcribe(audio_path, beam_size=5, word_timestamps=False)
+            # segments is a lazy generator, decode while holding the model
+            segments = list(segments)
 
         aligned_lyrics = []
         for segment in segments:
@@ -11,6 +11,7 @@ from app.config.audio_config import AudioConfig, get_recommended_volumes_for_con
 from app.models import const
 from app.models.schema import VideoClipParams
 from app.services import (voice, audio_merger, subtitle_merger, clip_video, merger_video, update_script, generate_video)
+from app.services import tts_prefetch
 from app.services import state as sm
 from app.utils import utils
 
@@ -70,6 +71,9 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
     ]
     logger.debug(f"需要生成TTS的片段数: {len(tts_segments)}")
 
+    # 停止尚未开始的预合成任务并等待正在合成的片段完成，已预合成的片段会直接命中 TTS 缓存
+    tts_prefetch.cancel_prefetch()
+
     tts_results = voice.tts_multiple(
         task_id=task_id,
         list_script=tts_segments,  # 只传入需要TTS的片段
@@ -114,10 +118,13 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
 
     # 更新 list_script 中的时间戳和路径信息
     tts_clip_result = {tts_result['_id']: tts_result['audio_file'] for tts_result in tts_results}
-    subclip_clip_result = {
-        tts_result['_id']: tts_result['subtitle_file'] for tts_result in tts_results
+    subtitle_tracks = {
+        tts_result['_id']: tts_result['subtitle_track']
+        for tts_result in tts_results if tts_result.get('subtitle_track') is not None
     }
-    new_script_list = update_script.update_script_timestamps(list_script, video_clip_result, tts_clip_result, subclip_clip_result)
+    new_script_list = update_script.update_script_timestamps(
+        list_script, video_clip_result, tts_clip_result, subtitle_tracks=subtitle_tracks
+    )
 
     logger.info(f"统一裁剪完成，处理了 {len(video_clip_result)} 个视频片段")
 
@@ -138,10 +145,13 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
             )
             logger.info(f"音频文件合并成功->{merged_audio_path}")
 
-            # 合并字幕文件
-            merged_subtitle_path = subtitle_merger.merge_subtitle_files(new_script_list)
-            if merged_subtitle_path:
-                logger.info(f"字幕文件合并成功->{merged_subtitle_path}")
+            # 在内存中合并字幕轨道，只导出一次 SRT 文件
+            merged_subtitle_track = subtitle_merger.merge_subtitle_tracks(new_script_list)
+            if merged_subtitle_track is not None:
+                merged_subtitle_path = merged_subtitle_track.write_srt(
+                    path.join(utils.task_dir(task_id), "merged_subtitle.srt")
+                )
+                logger.info(f"字幕合并成功->{merged_subtitle_path}")
             else:
                 logger.warning("没有有效的字幕内容，将生成无字幕视频")
                 merged_subtitle_path = ""
@@ -152,10 +162,13 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
                 merged_audio_path = ""
             if 'merged_subtitle_path' not in locals():
                 merged_subtitle_path = ""
+            if 'merged_subtitle_track' not in locals():
+                merged_subtitle_track = None
     else:
         logger.warning("没有需要合并的音频/字幕")
         merged_audio_path = ""
         merged_subtitle_path = ""
+        merged_subtitle_track = None
 
     """
     5. 合并视频
@@ -245,6 +258,7 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
         video_path=combined_video_path,
         audio_path=merged_audio_path,
         subtitle_path=merged_subtitle_path,
+        subtitle_track=merged_subtitle_track,
         bgm_path=bgm_path,
         output_path=output_video_path,
         options=options
@@ -315,6 +329,9 @@ def start_subclip_unified(task_id: str, params: VideoClipParams):
     ]
     logger.debug(f"需要生成TTS的片段数: {len(tts_segments)}")
 
+    # 停止尚未开始的预合成任务并等待正在合成的片段完成，已预合成的片段会直接命中 TTS 缓存
+    tts_prefetch.cancel_prefetch()
+
     tts_results = voice.tts_multiple(
         task_id=task_id,
         list_script=tts_segments,  # 只传入需要TTS的片段
@@ -340,10 +357,13 @@ def start_subclip_unified(task_id: str, params: VideoClipParams):
 
     # 更新 list_script 中的时间戳和路径信息
     tts_clip_result = {tts_result['_id']: tts_result['audio_file'] for tts_result in tts_results}
-    subclip_clip_result = {
-        tts_result['_id']: tts_result['subtitle_file'] for tts_result in tts_results
+    subtitle_tracks = {
+        tts_result['_id']: tts_result['subtitle_track']
+        for tts_result in tts_results if tts_result.get('subtitle_track') is not None
     }
-    new_script_list = update_script.update_script_timestamps(list_script, video_clip_result, tts_clip_result, subclip_clip_result)
+    new_script_list = update_script.update_script_timestamps(
+        list_script, video_clip_result, tts_clip_result, subtitle_tracks=subtitle_tracks
+    )
 
     logger.info(f"统一裁剪完成，处理了 {len(video_clip_result)} 个视频片段")
 
@@ -364,10 +384,13 @@ def start_subclip_unified(task_id: str, params: VideoClipParams):
             )
             logger.info(f"音频文件合并成功->{merged_audio_path}")
 
-            # 合并字幕文件
-            merged_subtitle_path = subtitle_merger.merge_subtitle_files(new_script_list)
-            if merged_subtitle_path:
-                logger.info(f"字幕文件合并成功->{merged_subtitle_path}")
+            # 在内存中合并字幕轨道，只导出一次 SRT 文件
+            merged_subtitle_track = subtitle_merger.merge_subtitle_tracks(new_script_list)
+            if merged_subtitle_track is not None:
+                merged_subtitle_path = merged_subtitle_track.write_srt(
+                    path.join(utils.task_dir(task_id), "merged_subtitle.srt")
+                )
+                logger.info(f"字幕合并成功->{merged_subtitle_path}")
             else:
                 logger.warning("没有有效的字幕内容，将生成无字幕视频")
                 merged_subtitle_path = ""
@@ -378,10 +401,13 @@ def start_subclip_unified(task_id: str, params: VideoClipParams):
                 merged_audio_path = ""
             if 'merged_subtitle_path' not in locals():
                 merged_subtitle_path = ""
+            if 'merged_subtitle_track' not in locals():
+                merged_subtitle_track = None
     else:
         logger.warning("没有需要合并的音频/字幕")
         merged_audio_path = ""
         merged_subtitle_path = ""
+        merged_subtitle_track = None
 
     """
     5. 合并视频
@@ -459,6 +485,7 @@ def start_subclip_unified(task_id: str, params: VideoClipParams):
         video_path=combined_video_path,
         audio_path=merged_audio_path,
         subtitle_path=merged_subtitle_path,
+        subtitle_track=merged_subtitle_track,
         bgm_path=bgm_path,
         output_path=output_video_path,
         options=options
@@ -0,0 +1,185 @@
+"""
+TTS 预合成服务
+
+用户在 WebUI 中保存脚本后，在后台以低优先级把解说片段预先合成到 TTS 缓存，
+点击生成视频时 voice.tts_multiple 可直接命中缓存，不必从零开始合成。
+
+- 单个后台线程依次处理，且每个片段之间主动让出 CPU，不与前台任务争抢资源
+- 再次保存脚本时丢弃尚未开始的旧任务，只合成新增或修改过的片段
+- 正式任务开始时调用 cancel_prefetch()，丢弃排队的任务并等待正在合成的片段写入缓存，避免与 tts_multiple 重复请求
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import List
+
+from loguru import logger
+
+from app.config import config
+from app.services import voice
+from app.utils import utils
+
+# 两个片段之间的间隔（秒），降低预合成对前台操作的影响
+PREFETCH_INTERVAL = 0.5
+# 取消时等待正在合成的片段完成的最长时间（秒）
+CANCEL_WAIT_TIMEOUT = 120
+
+
+class TTSPrefetcher:
+    """后台 TTS 预合成器（单线程，按脚本版本取消过期任务）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._queue = deque()
+        self._generation = 0
+        self._thread = None
+        # 没有正在合成的片段时置位，取消时据此等待当前片段写入缓存
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stats = {"submitted": 0, "synthesized": 0, "cached": 0, "failed": 0, "cancelled": 0}
+
+    def submit(self, list_script: List[dict], voice_name: str, voice_rate: float, voice_pitch: float,
+               tts_engine: str) -> int:
+        """
+        提交脚本进行预合成，替换掉之前尚未执行的任务
+
+        Returns:
+            int: 实际需要合成的片段数
+        """
+        jobs = []
+        seen = set()
+        for item in list_script:
+            if item.get('OST') == 1 or not item.get('narration', '').strip():
+                continue
+            cache_key = voice.tts_cache_key(item['narration'], voice_name, voice_rate, voice_pitch, tts_engine)
+            if cache_key in seen:
+                continue
+            seen.add(cache_key)
+            if voice.has_tts_cache(cache_key):
+                self._add_stat("cached")
+                continue
+            jobs.append((cache_key, item['narration'], voice_name, voice_rate, voice_pitch, tts_engine))
+
+        with self._lock:
+            self._generation += 1
+            self._stats["cancelled"] += len(self._queue)
+            self._queue.clear()
+            generation = self._generation
+            self._queue.extend((generation, job) for job in jobs)
+            self._stats["submitted"] += len(jobs)
+            self._ensure_worker()
+        self._wakeup.set()
+
+        logger.info(f"TTS 预合成已提交: {len(jobs)} 个片段待合成, 其余已在缓存中")
+        return len(jobs)
+
+    def cancel(self, wait_timeout: float = 0) -> bool:
+        """
+        取消所有尚未开始的预合成任务
+
+        Args:
+            wait_timeout: 大于 0 时等待正在合成的片段完成并写入缓存（最多等待该秒数），
+                          之后 tts_multiple 可直接命中缓存，不会重复合成
+
+        Returns:
+            bool: 是否已没有正在合成的片段
+        """
+        with self._lock:
+            self._generation += 1
+            self._stats["cancelled"] += len(self._queue)
+            self._queue.clear()
+        if wait_timeout > 0:
+            return self._idle.wait(wait_timeout)
+        return self._idle.is_set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": len(self._queue)}
+
+    def _add_stat(self, name: str, count: int = 1):
+        with self._lock:
+            self._stats[name] += count
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="tts-prefetch", daemon=True)
+            self._thread.start()
+
+    def _next_job(self):
+        with self._lock:
+            while self._queue:
+                generation, job = self._queue.popleft()
+                if generation == self._generation:
+                    self._idle.clear()
+                    return job
+            self._wakeup.clear()
+        return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.wait()
+                continue
+            try:
+                self._synthesize(*job)
+            finally:
+                self._idle.set()
+            time.sleep(PREFETCH_INTERVAL)
+
+    def _synthesize(self, cache_key: str, text: str, voice_name: str, voice_rate: float, voice_pitch: float,
+                    tts_engine: str):
+        if voice.has_tts_cache(cache_key):
+            return
+        cache_dir = utils.storage_dir("tts_cache", create=True)
+        voice_file = os.path.join(cache_dir, f"prefetch_{cache_key}.mp3")
+        try:
+            sub_maker = voice.tts(
+                text=text,
+                voice_name=voice.parse_voice_name(voice_name),
+                voice_rate=voice_rate,
+                voice_pitch=voice_pitch,
+                voice_file=voice_file,
+                tts_engine=tts_engine,
+            )
+            if sub_maker is None:
+                self._add_stat("failed")
+                return
+            voice.save_tts_cache(cache_key, voice_file, sub_maker)
+            self._add_stat("synthesized")
+        except Exception as e:
+            self._add_stat("failed")
+            logger.warning(f"TTS 预合成失败: {str(e)}")
+        finally:
+            if os.path.exists(voice_file):
+                os.remove(voice_file)
+
+
+prefetcher = TTSPrefetcher()
+
+
+def prefetch_script(list_script: List[dict], voice_name: str, voice_rate: float, voice_pitch: float,
+                    tts_engine: str) -> int:
+    """
+    保存脚本后调用，按当前音频设置在后台预合成解说片段
+
+    默认关闭：按量计费的 TTS 引擎会为每次保存的脚本产生费用，且脚本再次修改后已合成的片段会作废。
+    在 config.toml 中与 tts_engine 同一节（[ui]）设置 tts_prefetch = true 开启
+    """
+    if not config.ui.get("tts_prefetch", False):
+        return 0
+    if not voice_name:
+        return 0
+    return prefetcher.submit(list_script, voice_name, voice_rate, voice_pitch, tts_engine)
+
+
+def cancel_prefetch(wait: bool = True):
+    """正式合成前调用：取消排队的预合成任务，默认等待正在合成的片段写入缓存"""
+    if not prefetcher.cancel(CANCEL_WAIT_TIMEOUT if wait else 0):
+        logger.warning("等待 TTS 预合成的当前片段超时，该片段将重新合成")
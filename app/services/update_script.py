@@ -92,11 +92,13 @@ def update_script_timestamps(
     video_result: Dict[Union[str, int], str], 
     audio_result: Dict[Union[str, int], str] = None,
     subtitle_result: Dict[Union[str, int], str] = None,
-    calculate_edited_timerange: bool = True
+    calculate_edited_timerange: bool = True,
+    subtitle_tracks: Dict[Union[str, int], Any] = None
 ) -> List[Dict[str, Any]]:
     """
     根据 video_result 中的视频文件更新 script_list 中的时间戳，添加持续时间，
-    并根据 audio_result 添加音频路径，根据 subtitle_result 添加字幕路径
+    并根据 audio_result 添加音频路径，根据 subtitle_result 添加字幕路径，
+    根据 subtitle_tracks 添加内存中的字幕轨道
     
     Args:
         script_list: 原始脚本列表
@@ -104,6 +106,7 @@ def update_script_timestamps(
         audio_result: 音频结果字典，键为原时间戳或_id，值为音频文件路径
         subtitle_result: 字幕结果字典，键为原时间戳或_id，值为字幕文件路径
         calculate_edited_timerange: 是否计算并添加成品视频中的时间范围
+        subtitle_tracks: 字幕轨道字典，键为原时间戳或_id，值为 SubtitleTrack
     
     Returns:
         更新后的脚本列表
@@ -133,6 +136,7 @@ def update_script_timestamps(
         # 初始化音频和字幕路径为空字符串
         item_copy['audio'] = ""
         item_copy['subtitle'] = ""
+        item_copy['subtitle_track'] = None
         item_copy['video'] = ""  # 初始化视频路径为空字符串
 
         # 如果提供了音频结果字典且ID存在于音频结果中，直接使用对应的音频路径
@@ -149,6 +153,13 @@ def update_script_timestamps(
             elif orig_timestamp in subtitle_result:
                 item_copy['subtitle'] = subtitle_result[orig_timestamp]
 
+        # TTS 阶段生成的字幕轨道直接随脚本传递，不经过字幕文件
+        if subtitle_tracks:
+            if item_id and item_id in subtitle_tracks:
+                item_copy['subtitle_track'] = subtitle_tracks[item_id]
+            elif orig_timestamp in subtitle_tracks:
+                item_copy['subtitle_track'] = subtitle_tracks[orig_timestamp]
+
         # 添加视频路径
         if item_id and item_id in video_result:
             item_copy['video'] = video_result[item_id]
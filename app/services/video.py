@@ -17,6 +17,7 @@ from moviepy import (
 
 
 from app.models.schema import VideoAspect, SubtitlePosition
+from app.services.subtitle_track import SubtitleTrack
 
 
 def wrap_text(text, max_width, font, fontsize=60):
@@ -249,26 +250,20 @@ def generate_video_v3(
                 logger.warning(f"警告：字体文件不存在: {font_path}")
 
             try:
-                subs = pysrt.open(subtitle_path)
+                subs = SubtitleTrack.load(subtitle_path)
                 logger.info(f"读取到 {len(subs)} 条字幕")
 
-                for index, sub in enumerate(subs):
-                    start_time = sub.start.ordinal / 1000
-                    end_time = sub.end.ordinal / 1000
+                for index, (start_ms, end_ms, sub_text) in enumerate(subs):
+                    start_time = start_ms / 1000
+                    end_time = end_ms / 1000
 
                     try:
                         # 检查字幕文本是否为空
-                        if not sub.text or sub.text.strip() == '':
+                        if not sub_text or sub_text.strip() == '':
                             logger.info(f"警告：第 {index + 1} 条字幕内容为空，已跳过")
                             continue
 
-                        # 处理字幕文本：确保是字符串，并处理可能的列表情况
-                        if isinstance(sub.text, (list, tuple)):
-                            subtitle_text = ' '.join(str(item) for item in sub.text if item is not None)
-                        else:
-                            subtitle_text = str(sub.text)
-
-                        subtitle_text = subtitle_text.strip()
+                        subtitle_text = sub_text.strip()
 
                         if not subtitle_text:
                             logger.info(f"警告：第 {index + 1} 条字幕处理后为空，已跳过")
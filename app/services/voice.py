@@ -3,16 +3,15 @@ import re
 import json
 import traceback
 import edge_tts
-import asyncio
 import requests
 import uuid
+import shutil
 from loguru import logger
 from typing import List, Union, Tuple
 from datetime import datetime
 from xml.sax.saxutils import unescape
 from edge_tts import submaker, SubMaker
 # from edge_tts.submaker import mktimestamp  # 函数可能不存在，我们自己实现
-from moviepy.video.tools import subtitles
 try:
     from moviepy import AudioFileClip
     MOVIEPY_AVAILABLE = True
@@ -22,7 +21,9 @@ except ImportError:
 import time
 
 from app.config import config
-from app.utils import utils
+from app.services import forced_align
+from app.services.subtitle_track import SubtitleTrack
+from app.utils import utils, http_client, text_segment, async_runtime
 
 
 def mktimestamp(time_seconds: float) -> str:
@@ -41,6 +42,106 @@ def mktimestamp(time_seconds: float) -> str:
     return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
 
 
+# 流式下载/写入音频时每次读取的块大小
+AUDIO_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _audio_part_file(voice_file: str) -> str:
+    """
+    获取音频临时文件路径（与目标文件同目录，保证 os.replace 为原子操作）
+    """
+    return f"{voice_file}.{uuid.uuid4().hex[:8]}.part"
+
+
+def _remove_part_file(part_file: str):
+    try:
+        if part_file and os.path.exists(part_file):
+            os.remove(part_file)
+    except OSError as e:
+        logger.warning(f"清理临时音频文件失败: {part_file}, {str(e)}")
+
+
+def _is_valid_audio_file(audio_file: str, expected_size: int = None) -> bool:
+    """
+    校验音频文件完整性：非空、大小与预期一致、文件头为常见音频格式
+
+    Args:
+        audio_file: 音频文件路径
+        expected_size: 预期字节数（如 HTTP Content-Length），为空时不校验
+
+    Returns:
+        bool: 文件是否有效
+    """
+    try:
+        size = os.path.getsize(audio_file)
+    except OSError:
+        return False
+
+    if size <= 0:
+        logger.warning(f"音频文件为空: {audio_file}")
+        return False
+
+    if expected_size and size != expected_size:
+        logger.warning(f"音频文件不完整: {audio_file}, 实际 {size} 字节, 预期 {expected_size} 字节")
+        return False
+
+    with open(audio_file, "rb") as f:
+        header = f.read(12)
+
+    if (
+        header.startswith(b"ID3")  # MP3 (ID3 标签)
+        or (len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0)  # MP3/AAC 帧同步
+        or header.startswith(b"RIFF")  # WAV
+        or header.startswith(b"OggS")  # OGG/Opus
+        or header.startswith(b"fLaC")  # FLAC
+        or header[4:8] == b"ftyp"  # MP4/M4A
+    ):
+        return True
+
+    logger.warning(f"音频文件头无法识别: {audio_file}, header: {header[:4]!r}")
+    return False
+
+
+def _commit_audio_file(part_file: str, voice_file: str, expected_size: int = None) -> bool:
+    """
+    校验临时音频文件后原子替换到目标路径，校验失败时删除临时文件
+    """
+    if not _is_valid_audio_file(part_file, expected_size):
+        _remove_part_file(part_file)
+        return False
+    os.replace(part_file, voice_file)
+    return True
+
+
+def _stream_response_to_file(response: requests.Response, part_file: str) -> int:
+    """
+    将 HTTP 响应按块流式写入文件，避免整个音频驻留内存
+
+    Returns:
+        int: 写入的字节数
+    """
+    written = 0
+    with open(part_file, "wb") as f:
+        for chunk in response.iter_content(chunk_size=AUDIO_STREAM_CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+
+def _response_content_length(response: requests.Response) -> Union[int, None]:
+    """
+    获取未压缩响应的 Content-Length，用于校验下载是否完整
+    """
+    if response.headers.get("Content-Encoding"):
+        # requests 会自动解压，解压后的大小与 Content-Length 不一致
+        return None
+    try:
+        return int(response.headers.get("Content-Length", ""))
+    except ValueError:
+        return None
+
+
 def get_all_azure_voices(filter_locals=None) -> list[str]:
     if filter_locals is None:
         filter_locals = ["zh-CN", "en-US", "zh-HK", "zh-TW", "vi-VN"]
@@ -1145,39 +1246,47 @@ def azure_tts_v1(
     rate_str = convert_rate_to_percent(voice_rate)
     pitch_str = convert_pitch_to_percent(voice_pitch)
     for i in range(3):
+        part_file = _audio_part_file(voice_file)
         try:
             logger.info(f"第 {i+1} 次使用 edge_tts 生成音频")
 
-            async def _do() -> tuple[SubMaker, bytes]:
+            async def _do() -> tuple[SubMaker, int]:
                 communicate = edge_tts.Communicate(text, voice_name, rate=rate_str, pitch=pitch_str, proxy=config.proxy.get("http"))
                 sub_maker = edge_tts.SubMaker()
-                audio_data = bytes()  # 用于存储音频数据
-                
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        audio_data += chunk["data"]
-                    elif chunk["type"] == "WordBoundary":
-                        sub_maker.create_sub(
-                            (chunk["offset"], chunk["duration"]), chunk["text"]
-                        )
-                return sub_maker, audio_data
+                written = 0
+
+                # 音频块直接流式写入临时文件，字幕边界随流逐条收集
+                with open(part_file, "wb") as file:
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio":
+                            file.write(chunk["data"])
+                            written += len(chunk["data"])
+                        elif chunk["type"] == "WordBoundary":
+                            sub_maker.create_sub(
+                                (chunk["offset"], chunk["duration"]), chunk["text"]
+                            )
+                return sub_maker, written
 
             # 获取音频数据和字幕信息
-            sub_maker, audio_data = asyncio.run(_do())
-            
+            sub_maker, written = async_runtime.run(_do())
+
             # 验证数据是否有效
-            if not sub_maker or not sub_maker.subs or not audio_data:
+            if not sub_maker or not sub_maker.subs or not written:
                 logger.warning(f"failed, invalid data generated")
+                _remove_part_file(part_file)
                 if i < 2:
                     time.sleep(1)
                 continue
 
-            # 数据有效，写入文件
-            with open(voice_file, "wb") as file:
-                file.write(audio_data)
+            # 数据有效，校验后原子替换到目标文件
+            if not _commit_audio_file(part_file, voice_file):
+                if i < 2:
+                    time.sleep(1)
+                continue
             return sub_maker
         except Exception as e:
             logger.error(f"生成音频文件时出错: {str(e)}")
+            _remove_part_file(part_file)
             if i < 2:
                 time.sleep(1)
     return None
@@ -1396,106 +1505,103 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
         traceback.print_exc()
 
 
-def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: str):
-    """
-    优化字幕文件
-    1. 将字幕文件按照标点符号分割成多行
-    2. 逐行匹配字幕文件中的文本
-    3. 生成新的字幕文件
+def build_subtitle_track(sub_maker: submaker.SubMaker, text: str) -> Union[SubtitleTrack, None]:
     """
+    根据 SubMaker 的逐词时间戳直接在内存中生成字幕轨道
+    1. 将文本按照标点符号分割成多行
+    2. 逐行匹配 SubMaker 中累积的文本
+    3. 每匹配到一行生成一条字幕
 
+    Returns:
+        SubtitleTrack: 字幕轨道；文本与时间戳无法完整匹配时返回 None
+    """
     text = _format_text(text)
 
-    def formatter(idx: int, start_time: float, end_time: float, sub_text: str) -> str:
-        """
-        1
-        00:00:00,000 --> 00:00:02,360
-        跑步是一项简单易行的运动
-        """
-        start_t = mktimestamp(start_time).replace(".", ",")
-        end_t = mktimestamp(end_time).replace(".", ",")
-        return f"{idx}\n" f"{start_t} --> {end_t}\n" f"{sub_text}\n"
-
-    start_time = -1.0
-    sub_items = []
+    start_time = -1
+    starts, ends, texts = [], [], []
     sub_index = 0
 
     script_lines = utils.split_string_by_punctuations(text)
 
-    def match_line(_sub_line: str, _sub_index: int):
-        if len(script_lines) <= _sub_index:
+    # 脚本行的比较形式只计算一次；去标点是逐字符的操作，累积文本的比较形式可以增量拼接
+    line_forms = [
+        (line, text_segment.strip_punctuation(line), text_segment.strip_non_word(line))
+        for line in script_lines
+    ]
+
+    def match_line(_sub_line: str, _sub_line_punct: str, _sub_line_word: str, _sub_index: int):
+        if len(line_forms) <= _sub_index:
             return ""
 
-        _line = script_lines[_sub_index]
+        _line, _line_punct, _line_word = line_forms[_sub_index]
+        # 三种比较中最宽松的一种都不相等时直接跳过
+        if _sub_line_word != _line_word:
+            return ""
         if _sub_line == _line:
-            return script_lines[_sub_index].strip()
-
-        _sub_line_ = re.sub(r"[^\w\s]", "", _sub_line)
-        _line_ = re.sub(r"[^\w\s]", "", _line)
-        if _sub_line_ == _line_:
-            return _line_.strip()
-
-        _sub_line_ = re.sub(r"\W+", "", _sub_line)
-        _line_ = re.sub(r"\W+", "", _line)
-        if _sub_line_ == _line_:
             return _line.strip()
-
-        return ""
+        if _sub_line_punct == _line_punct:
+            return _line_punct.strip()
+        return _line.strip()
 
     sub_line = ""
+    sub_line_punct = ""
+    sub_line_word = ""
 
     try:
-        for _, (offset, sub) in enumerate(zip(sub_maker.offset, sub_maker.subs)):
+        for offset, sub in zip(sub_maker.offset, sub_maker.subs):
             _start_time, end_time = offset
             if start_time < 0:
                 start_time = _start_time
 
-            # 将 100纳秒单位转换为秒
-            start_time_seconds = start_time / 10000000
-            end_time_seconds = end_time / 10000000
-
             sub = unescape(sub)
             sub_line += sub
-            sub_text = match_line(sub_line, sub_index)
+            sub_line_punct += text_segment.strip_punctuation(sub)
+            sub_line_word += text_segment.strip_non_word(sub)
+            sub_text = match_line(sub_line, sub_line_punct, sub_line_word, sub_index)
             if sub_text:
                 sub_index += 1
-                line = formatter(
-                    idx=sub_index,
-                    start_time=start_time_seconds,
-                    end_time=end_time_seconds,
-                    sub_text=sub_text,
-                )
-                sub_items.append(line)
-                start_time = -1.0
+                # 100纳秒单位转换为毫秒
+                starts.append(start_time // 10000)
+                ends.append(end_time // 10000)
+                texts.append(sub_text)
+                start_time = -1
                 sub_line = ""
+                sub_line_punct = ""
+                sub_line_word = ""
+    except Exception as e:
+        logger.error(f"failed, error: {str(e)}")
+        return None
 
-        if len(sub_items) == len(script_lines):
-            with open(subtitle_file, "w", encoding="utf-8") as file:
-                file.write("\n".join(sub_items) + "\n")
-            try:
-                sbs = subtitles.file_to_subtitles(subtitle_file, encoding="utf-8")
-                duration = max([tb for ((ta, tb), txt) in sbs])
-                logger.info(
-                    f"已创建字幕文件: {subtitle_file}, duration: {duration}"
-                )
-                return subtitle_file, duration
-            except Exception as e:
-                logger.error(f"failed, error: {str(e)}")
-                os.remove(subtitle_file)
-        else:
-            logger.error(
-                f"字幕创建失败, 字幕长度: {len(sub_items)}, script_lines len: {len(script_lines)}"
-                f"\nsub_items:{json.dumps(sub_items, indent=4, ensure_ascii=False)}"
-                f"\nscript_lines:{json.dumps(script_lines, indent=4, ensure_ascii=False)}"
-            )
-            # 返回默认值，避免 None 错误
-            return subtitle_file, 3.0
+    if len(texts) != len(script_lines):
+        logger.error(
+            f"字幕创建失败, 字幕长度: {len(texts)}, script_lines len: {len(script_lines)}"
+            f"\nsub_items:{json.dumps(texts, indent=4, ensure_ascii=False)}"
+            f"\nscript_lines:{json.dumps(script_lines, indent=4, ensure_ascii=False)}"
+        )
+        return None
 
+    return SubtitleTrack(starts, ends, texts)
+
+
+def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: str):
+    """
+    根据 SubMaker 生成字幕轨道并写出 SRT 文件
+    """
+    track = build_subtitle_track(sub_maker, text)
+    if track is None:
+        # 返回默认值，避免 None 错误
+        return subtitle_file, 3.0
+
+    try:
+        track.write_srt(subtitle_file)
     except Exception as e:
         logger.error(f"failed, error: {str(e)}")
-        # 返回默认值，避免 None 错误
         return subtitle_file, 3.0
 
+    duration = track.duration
+    logger.info(f"已创建字幕文件: {subtitle_file}, duration: {duration}")
+    return subtitle_file, duration
+
 
 def get_audio_duration(sub_maker: submaker.SubMaker):
     """
@@ -1506,7 +1612,397 @@ def get_audio_duration(sub_maker: submaker.SubMaker):
     return sub_maker.offset[-1][1] / 10000000
 
 
-def tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: float, voice_pitch: float, tts_engine: str = "azure"):
+# 支持批量合成的引擎：edge-tts 返回逐词时间戳，可据此把一次合成的音频切回各片段
+BATCH_TTS_ENGINES = ("edge_tts", "azure_speech")
+# 单个批次的最大字符数，避免单次请求过长导致超时
+TTS_BATCH_MAX_CHARS = 1500
+# 句末标点，片段以这些字符结尾时无需再补充停顿
+_SENTENCE_END_CHARS = "。！？!?.…；;"
+
+
+def tts_cache_key(text: str, voice_name: str, voice_rate: float, voice_pitch: float, tts_engine: str) -> str:
+    """
+    生成 TTS 缓存键：相同引擎、音色、语速、音调和文本的合成结果可以复用
+    """
+    payload = json.dumps(
+        [tts_engine, parse_voice_name(voice_name), float(voice_rate), float(voice_pitch), text.strip()],
+        ensure_ascii=False,
+    )
+    return utils.md5(payload)
+
+
+DEFAULT_TTS_CACHE_MAX_SIZE_MB = 1024   # TTS 缓存总大小上限，超过后按最近使用时间淘汰
+DEFAULT_TTS_CACHE_TTL_DAYS = 30        # 超过该天数未使用的缓存会被删除
+
+
+def _tts_cache_files(cache_key: str) -> Tuple[str, str]:
+    cache_dir = utils.storage_dir("tts_cache", create=True)
+    return os.path.join(cache_dir, f"{cache_key}.mp3"), os.path.join(cache_dir, f"{cache_key}.json")
+
+
+def has_tts_cache(cache_key: str) -> bool:
+    audio_file, meta_file = _tts_cache_files(cache_key)
+    return os.path.exists(audio_file) and os.path.exists(meta_file)
+
+
+def save_tts_cache(cache_key: str, voice_file: str, sub_maker: SubMaker):
+    """
+    将合成好的音频和逐词时间戳写入缓存（先写临时文件再原子替换）
+    """
+    audio_file, meta_file = _tts_cache_files(cache_key)
+    try:
+        part_file = _audio_part_file(audio_file)
+        shutil.copyfile(voice_file, part_file)
+        if not _commit_audio_file(part_file, audio_file):
+            return
+        meta_part = f"{meta_file}.part"
+        with open(meta_part, "w", encoding="utf-8") as f:
+            json.dump({"offset": sub_maker.offset, "subs": sub_maker.subs}, f, ensure_ascii=False)
+        os.replace(meta_part, meta_file)
+    except Exception as e:
+        logger.warning(f"写入 TTS 缓存失败: {str(e)}")
+        return
+    try:
+        prune_tts_cache()
+    except Exception as e:
+        logger.warning(f"清理 TTS 缓存失败: {str(e)}")
+
+
+def prune_tts_cache():
+    """
+    删除超过 [ui] tts_cache_ttl_days 天未使用的缓存；总大小超过 [ui] tts_cache_max_size_mb 时
+    按最近使用时间从旧到新淘汰到上限的 90%
+    """
+    cache_dir = utils.storage_dir("tts_cache", create=True)
+    ttl_seconds = float(config.ui.get("tts_cache_ttl_days", DEFAULT_TTS_CACHE_TTL_DAYS)) * 86400
+    max_size_bytes = int(float(config.ui.get("tts_cache_max_size_mb", DEFAULT_TTS_CACHE_MAX_SIZE_MB)) * 1024 * 1024)
+
+    # 以音频文件的修改时间作为最近使用时间（读取缓存时会更新）
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".mp3") or name.startswith("prefetch_"):
+            continue
+        cache_key = name[:-len(".mp3")]
+        files = _tts_cache_files(cache_key)
+        try:
+            used_at = os.path.getmtime(files[0])
+            size = sum(os.path.getsize(f) for f in files if os.path.exists(f))
+        except OSError:
+            continue
+        entries.append((used_at, size, files))
+    entries.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    limit = int(max_size_bytes * 0.9)
+    removed = 0
+    for used_at, size, files in entries:
+        expired = ttl_seconds > 0 and now - used_at > ttl_seconds
+        if not expired and (max_size_bytes <= 0 or total <= max_size_bytes or total - removed <= limit):
+            continue
+        for f in files:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+        removed += size
+    if removed:
+        logger.info(f"TTS 缓存已淘汰 {removed / 1024 / 1024:.1f} MB")
+
+
+def load_tts_cache(cache_key: str, voice_file: str) -> Union[SubMaker, None]:
+    """
+    从缓存读取音频（复制到 voice_file）和逐词时间戳，未命中时返回 None
+    """
+    if not has_tts_cache(cache_key):
+        return None
+    audio_file, meta_file = _tts_cache_files(cache_key)
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        part_file = _audio_part_file(voice_file)
+        shutil.copyfile(audio_file, part_file)
+        if not _commit_audio_file(part_file, voice_file):
+            return None
+        # 更新修改时间作为最近使用时间，供 prune_tts_cache 按 LRU 淘汰
+        os.utime(audio_file)
+        sub_maker = SubMaker()
+        sub_maker.offset = [tuple(offset) for offset in meta["offset"]]
+        sub_maker.subs = meta["subs"]
+        return sub_maker
+    except Exception as e:
+        logger.warning(f"读取 TTS 缓存失败: {str(e)}")
+        return None
+
+
+def tts_cache_enabled() -> bool:
+    """TTS 缓存只服务于预合成：开启 [ui] tts_prefetch 时才写入，关闭时不为每次合成付出额外的磁盘写入"""
+    return bool(config.ui.get("tts_prefetch", False))
+
+
+def tts_with_cache(
+    text: str, voice_name: str, voice_rate: float, voice_pitch: float, voice_file: str, tts_engine: str
+) -> Union[SubMaker, None]:
+    """
+    优先从 TTS 缓存读取（如 WebUI 保存脚本时预合成的结果），未命中时调用 tts()；
+    开启预合成时把结果写入缓存
+    """
+    cache_key = tts_cache_key(text, voice_name, voice_rate, voice_pitch, tts_engine)
+    sub_maker = load_tts_cache(cache_key, voice_file)
+    if sub_maker is not None:
+        logger.info(f"命中 TTS 缓存: {voice_file}")
+        return sub_maker
+
+    sub_maker = tts(
+        text=text,
+        voice_name=voice_name,
+        voice_rate=voice_rate,
+        voice_pitch=voice_pitch,
+        voice_file=voice_file,
+        tts_engine=tts_engine,
+    )
+    if sub_maker is not None and tts_cache_enabled():
+        save_tts_cache(cache_key, voice_file, sub_maker)
+    return sub_maker
+
+
+def _tts_audio_file(output_dir: str, item: dict) -> str:
+    # 将时间戳中的冒号替换为下划线
+    timestamp = item['timestamp'].replace(':', '_')
+    return os.path.join(output_dir, f"audio_{timestamp}.mp3")
+
+
+def _needs_forced_alignment(voice_name: str, tts_engine: str) -> bool:
+    """
+    SoulVoice、Qwen3、IndexTTS2 引擎不返回时间戳，需要在本地强制对齐后生成字幕
+    """
+    return is_soulvoice_voice(voice_name) or is_qwen_engine(tts_engine) or tts_engine == "indextts2"
+
+
+def _align_tts_results(tts_results: List[dict]):
+    """
+    对没有时间戳的引擎生成的音频批量做强制对齐，生成内存中的字幕轨道
+    """
+    jobs = []
+    for result in tts_results:
+        phrases = utils.split_string_by_punctuations(_format_text(result['text']))
+        jobs.append((result['audio_file'], phrases))
+
+    start = time.time()
+    sub_makers = forced_align.align_batch(jobs)
+    for result, sub_maker in zip(tts_results, sub_makers):
+        if sub_maker is None:
+            continue
+        track = build_subtitle_track(sub_maker, result['text'])
+        if track is not None:
+            result['subtitle_track'] = track
+    logger.info(f"强制对齐完成: {len(tts_results)} 个片段, 耗时: {time.time() - start:.2f}s")
+
+
+def _build_tts_result(item: dict, sub_maker: SubMaker, audio_file: str, voice_name: str, tts_engine: str) -> dict:
+    text = item['narration']
+    subtitle_track = None
+    # SoulVoice、Qwen3、IndexTTS2 引擎没有时间戳，字幕在强制对齐后生成
+    if _needs_forced_alignment(voice_name, tts_engine):
+        # 获取实际音频文件的时长
+        duration = get_audio_duration_from_file(audio_file)
+        if duration <= 0:
+            # 如果无法获取文件时长，尝试从 SubMaker 获取
+            duration = get_audio_duration(sub_maker)
+            if duration <= 0:
+                # 最后的 fallback，基于文本长度估算
+                duration = max(1.0, len(text) / 3.0)
+                logger.warning(f"无法获取音频时长，使用文本估算: {duration:.2f}秒")
+        # 字幕由 _align_tts_results 统一生成
+    else:
+        # 字幕只保存在内存中，随脚本传递到最终合成，导出时才写成文件
+        subtitle_track = build_subtitle_track(sub_maker, text)
+        duration = subtitle_track.duration if subtitle_track is not None else 3.0
+
+    return {
+        "_id": item['_id'],
+        "timestamp": item['timestamp'],
+        "audio_file": audio_file,
+        "subtitle_track": subtitle_track,
+        "duration": duration,
+        "text": text,
+    }
+
+
+def _tts_single(item: dict, output_dir: str, voice_name: str, voice_rate: float, voice_pitch: float,
+                tts_engine: str) -> Union[dict, None]:
+    """
+    为单个片段合成语音并生成字幕
+    """
+    audio_file = _tts_audio_file(output_dir, item)
+
+    sub_maker = tts_with_cache(
+        text=item['narration'],
+        voice_name=voice_name,
+        voice_rate=voice_rate,
+        voice_pitch=voice_pitch,
+        voice_file=audio_file,
+        tts_engine=tts_engine,
+    )
+
+    if sub_maker is None:
+        logger.error(f"无法为时间戳 {item['timestamp']} 生成音频; "
+                     f"如果您在中国，请使用VPN; "
+                     f"或者使用其他 tts 引擎")
+        return None
+
+    return _build_tts_result(item, sub_maker, audio_file, voice_name, tts_engine)
+
+
+def _supports_batch_tts(voice_name: str, tts_engine: str) -> bool:
+    """
+    判断当前引擎/音色是否支持批量合成（仅 edge-tts 路径返回逐词时间戳）
+    """
+    if tts_engine not in BATCH_TTS_ENGINES:
+        return False
+    if tts_engine == "azure_speech" and should_use_azure_speech_services(voice_name):
+        return False
+    return not is_soulvoice_voice(voice_name)
+
+
+def _join_batch_texts(texts: List[str]) -> str:
+    """
+    拼接批次文本，片段之间补充句末标点和换行，保证片段边界处有自然停顿
+
+    edge-tts 会对输入做 XML 转义，不接受自定义 SSML，因此以标点代替 <break>
+    """
+    parts = []
+    for text in texts:
+        text = text.strip().rstrip("，,、：:")
+        if text and text[-1] not in _SENTENCE_END_CHARS:
+            text += "。" if re.search(r"[\u4e00-\u9fff]", text) else "."
+        parts.append(text)
+    return "\n".join(parts)
+
+
+def _split_batch_word_boundaries(sub_maker: SubMaker, texts: List[str]) -> Union[List[List[int]], None]:
+    """
+    按片段文本把批量合成返回的逐词时间戳分组
+
+    逐词比对去掉标点后的字符，依次消耗各片段的文本；
+    无法对齐时返回 None，由调用方回退到逐段合成。
+
+    Returns:
+        List[List[int]]: 每个片段对应的 word boundary 下标列表
+    """
+    targets = [re.sub(r"\W+", "", text) for text in texts]
+    groups: List[List[int]] = [[] for _ in texts]
+    seg_index = 0
+    consumed = 0
+
+    for word_index, word in enumerate(sub_maker.subs):
+        word = re.sub(r"\W+", "", unescape(word))
+        if not word:
+            continue
+        # 跳过已消耗完（或本身没有可读字符）的片段
+        while seg_index < len(targets) and consumed >= len(targets[seg_index]):
+            seg_index += 1
+            consumed = 0
+        if seg_index >= len(targets):
+            return None
+        target = targets[seg_index]
+        if not target.startswith(word, consumed):
+            logger.warning(f"批量合成时间戳对齐失败: '{word}' 不在片段 {seg_index} 的位置 {consumed}")
+            return None
+        groups[seg_index].append(word_index)
+        consumed += len(word)
+
+    if seg_index != len(targets) - 1 or consumed != len(targets[-1]):
+        return None
+    if any(not group for group in groups):
+        return None
+    return groups
+
+
+def _tts_batch(items: List[dict], output_dir: str, voice_name: str, voice_rate: float, voice_pitch: float,
+               tts_engine: str) -> Union[List[dict], None]:
+    """
+    将多个片段合并为一次 TTS 请求，再按逐词时间戳切分为各片段的音频和字幕
+
+    切分点取相邻片段首尾词之间的中点，切分后的时间戳平移到各片段音频的起点，
+    因此每个片段的音频、字幕文件与逐段合成时保持一致。
+
+    Returns:
+        List[dict]: 与 items 顺序一致的结果；任何一步失败返回 None
+    """
+    from pydub import AudioSegment
+
+    texts = [item['narration'] for item in items]
+    batch_file = os.path.join(output_dir, f"audio_batch_{uuid.uuid4().hex[:8]}.mp3")
+
+    try:
+        sub_maker = azure_tts_v1(_join_batch_texts(texts), voice_name, voice_rate, voice_pitch, batch_file)
+        if sub_maker is None:
+            return None
+
+        groups = _split_batch_word_boundaries(sub_maker, texts)
+        if groups is None:
+            return None
+
+        audio = AudioSegment.from_file(batch_file)
+        # 计算每个片段的切分点（单位：100 纳秒）
+        cut_points = [0]
+        for prev_group, next_group in zip(groups, groups[1:]):
+            prev_end = sub_maker.offset[prev_group[-1]][1]
+            next_start = sub_maker.offset[next_group[0]][0]
+            cut_points.append((prev_end + next_start) // 2)
+        cut_points.append(len(audio) * 10000)
+
+        results = []
+        for index, (item, group) in enumerate(zip(items, groups)):
+            audio_file = _tts_audio_file(output_dir, item)
+            seg_start, seg_end = cut_points[index], cut_points[index + 1]
+
+            part_file = _audio_part_file(audio_file)
+            audio[seg_start // 10000:seg_end // 10000].export(part_file, format="mp3")
+            if not _commit_audio_file(part_file, audio_file):
+                return None
+
+            seg_sub_maker = SubMaker()
+            for word_index in group:
+                start, end = sub_maker.offset[word_index]
+                seg_sub_maker.offset.append((start - seg_start, end - seg_start))
+                seg_sub_maker.subs.append(sub_maker.subs[word_index])
+
+            if tts_cache_enabled():
+                cache_key = tts_cache_key(item['narration'], voice_name, voice_rate, voice_pitch, tts_engine)
+                save_tts_cache(cache_key, audio_file, seg_sub_maker)
+            results.append(_build_tts_result(item, seg_sub_maker, audio_file, voice_name, tts_engine))
+        return results
+    except Exception as e:
+        logger.error(f"批量合成失败: {str(e)}")
+        return None
+    finally:
+        _remove_part_file(batch_file)
+
+
+def _iter_tts_batches(items: List[dict], batch_size: int, is_cached=None):
+    """按片段数量和字符数把片段分组，已有缓存的片段单独成组直接读取缓存"""
+    batch, batch_chars = [], 0
+    for item in items:
+        if is_cached and is_cached(item):
+            if batch:
+                yield batch
+                batch, batch_chars = [], 0
+            yield [item]
+            continue
+        text_len = len(item['narration'])
+        if batch and (len(batch) >= batch_size or batch_chars + text_len > TTS_BATCH_MAX_CHARS):
+            yield batch
+            batch, batch_chars = [], 0
+        batch.append(item)
+        batch_chars += text_len
+    if batch:
+        yield batch
+
+
+def tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: float, voice_pitch: float,
+                 tts_engine: str = "azure", batch_size: int = None):
     """
     根据JSON文件中的多段文本进行TTS转换
     
@@ -1515,61 +2011,48 @@ def tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: f
     :param voice_name: 语音名称
     :param voice_rate: 语音速率
     :param tts_engine: TTS 引擎
+    :param batch_size: 批量合成时每个请求包含的片段数，默认读取 config.ui.tts_batch_size，小于 2 时逐段合成
     :return: 生成的音频文件列表
     """
     voice_name = parse_voice_name(voice_name)
     output_dir = utils.task_dir(task_id)
     tts_results = []
 
-    for item in list_script:
-        if item['OST'] != 1:
-            # 将时间戳中的冒号替换为下划线
-            timestamp = item['timestamp'].replace(':', '_')
-            audio_file = os.path.join(output_dir, f"audio_{timestamp}.mp3")
-            subtitle_file = os.path.join(output_dir, f"subtitle_{timestamp}.srt")
+    if batch_size is None:
+        batch_size = int(config.ui.get("tts_batch_size", 0) or 0)
 
-            text = item['narration']
+    items = [item for item in list_script if item['OST'] != 1]
 
-            sub_maker = tts(
-                text=text,
-                voice_name=voice_name,
-                voice_rate=voice_rate,
-                voice_pitch=voice_pitch,
-                voice_file=audio_file,
-                tts_engine=tts_engine,
-            )
+    if batch_size > 1 and _supports_batch_tts(voice_name, tts_engine):
+        def _is_cached(item: dict) -> bool:
+            return has_tts_cache(tts_cache_key(item['narration'], voice_name, voice_rate, voice_pitch, tts_engine))
 
-            if sub_maker is None:
-                logger.error(f"无法为时间戳 {timestamp} 生成音频; "
-                             f"如果您在中国，请使用VPN; "
-                             f"或者使用其他 tts 引擎")
+        batches = list(_iter_tts_batches(items, batch_size, _is_cached))
+        logger.info(f"使用批量合成模式: {len(items)} 个片段, {len(batches)} 个请求")
+    else:
+        batches = [[item] for item in items]
+
+    for batch in batches:
+        results = None
+        if len(batch) > 1:
+            results = _tts_batch(batch, output_dir, voice_name, voice_rate, voice_pitch, tts_engine)
+            if results is None:
+                logger.warning(f"批量合成失败，回退到逐段合成: {[item['_id'] for item in batch]}")
+
+        if results is None:
+            results = [
+                _tts_single(item, output_dir, voice_name, voice_rate, voice_pitch, tts_engine)
+                for item in batch
+            ]
+
+        for result in results:
+            if result is None:
                 continue
-            else:
-                # SoulVoice、Qwen3、IndexTTS2 引擎不生成字幕文件
-                if is_soulvoice_voice(voice_name) or is_qwen_engine(tts_engine) or tts_engine == "indextts2":
-                    # 获取实际音频文件的时长
-                    duration = get_audio_duration_from_file(audio_file)
-                    if duration <= 0:
-                        # 如果无法获取文件时长，尝试从 SubMaker 获取
-                        duration = get_audio_duration(sub_maker)
-                        if duration <= 0:
-                            # 最后的 fallback，基于文本长度估算
-                            duration = max(1.0, len(text) / 3.0)
-                            logger.warning(f"无法获取音频时长，使用文本估算: {duration:.2f}秒")
-                    # 不创建字幕文件
-                    subtitle_file = ""
-                else:
-                    _, duration = create_subtitle(sub_maker=sub_maker, text=text, subtitle_file=subtitle_file)
-
-            tts_results.append({
-                "_id": item['_id'],
-                "timestamp": item['timestamp'],
-                "audio_file": audio_file,
-                "subtitle_file": subtitle_file,
-                "duration": duration,
-                "text": text,
-            })
-            logger.info(f"已生成音频文件: {audio_file}")
+            tts_results.append(result)
+            logger.info(f"已生成音频文件: {result['audio_file']}")
+
+    if tts_results and _needs_forced_alignment(voice_name, tts_engine):
+        _align_tts_results(tts_results)
 
     return tts_results
 
@@ -1683,45 +2166,45 @@ def qwen3_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.0) -
                 voice=mapped_voice
             )
             logger.info(f"Qwen3 TTS API 响应: {result}")
-        
 
-            audio_bytes: bytes | None = None
+            written = 0
+            part_file = _audio_part_file(voice_file)
 
-            # 解析返回结果，提取音频URL并下载
-            try:# 假设 result 是你收到的字符串
+            # 解析返回结果，提取音频URL并流式下载到临时文件
+            try:
                 audio_url = None
-                
+
                 if result.output and result.output.audio:
                     audio_url = result.output.audio.url
-                # 从响应中提取音频URL
-    
+
                 if audio_url:
-                    # 直接下载音频文件
-                    response = requests.get(audio_url, timeout=30)
-                    response.raise_for_status()
-                    audio_bytes = response.content
+                    with http_client.get(audio_url, timeout=30, stream=True) as response:
+                        response.raise_for_status()
+                        expected_size = _response_content_length(response)
+                        written = _stream_response_to_file(response, part_file)
+                    if written and not _commit_audio_file(part_file, voice_file, expected_size):
+                        written = 0
                 else:
                     logger.warning("API响应中未找到音频URL")
-                    
+
             except Exception as e:
                 logger.error(f"解析API响应失败: {str(e)}")
+                written = 0
+            finally:
+                _remove_part_file(part_file)
 
-            if not audio_bytes:
+            if not written:
                 logger.warning("DashScope SDK 返回空音频数据，重试")
                 if i < 2:
                     time.sleep(1)
                 continue
 
-            # 写入文件
-            with open(voice_file, "wb") as f:
-                f.write(audio_bytes)
-
-            # 估算字幕
+            # 占位时间戳（单位 100 纳秒），真实字幕时间由强制对齐生成
             sub = SubMaker()
             est_ms = max(800, int(len(text) * 180))
-            sub.create_sub((0, est_ms), text)
-            
-            logger.info(f"Qwen3 TTS 生成成功（DashScope SDK），文件大小: {len(audio_bytes)} 字节")
+            sub.create_sub((0, est_ms * 10000), text)
+
+            logger.info(f"Qwen3 TTS 生成成功（DashScope SDK），文件大小: {written} 字节")
             return sub
 
         except Exception as e:
@@ -1803,12 +2286,27 @@ def tencent_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.0)
                     time.sleep(1)
                 continue
             
-            # 解码音频数据
-            audio_data = base64.b64decode(resp.Audio)
-            
-            # 写入文件
-            with open(voice_file, "wb") as f:
-                f.write(audio_data)
+            # 分块解码 base64 音频数据并写入临时文件，校验后原子替换
+            part_file = _audio_part_file(voice_file)
+            audio_size = 0
+            try:
+                encoded = resp.Audio
+                # 块大小取 4 的倍数，保证每块都能独立解码
+                step = AUDIO_STREAM_CHUNK_SIZE // 3 * 4
+                with open(part_file, "wb") as f:
+                    for start in range(0, len(encoded), step):
+                        data = base64.b64decode(encoded[start:start + step])
+                        f.write(data)
+                        audio_size += len(data)
+                committed = _commit_audio_file(part_file, voice_file)
+            finally:
+                _remove_part_file(part_file)
+
+            if not committed:
+                logger.warning(f"腾讯云 TTS 返回的音频数据无效")
+                if i < 2:
+                    time.sleep(1)
+                continue
 
             # 创建字幕对象
             sub_maker = SubMaker()
@@ -1824,7 +2322,7 @@ def tencent_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.0)
                 duration_ms = len(text) * 200
                 sub_maker.create_sub((0, duration_ms * 10000), text)
 
-            logger.info(f"腾讯云 TTS 生成成功，文件大小: {len(audio_data)} 字节")
+            logger.info(f"腾讯云 TTS 生成成功，文件大小: {audio_size} 字节")
             return sub_maker
 
         except Exception as e:
@@ -1878,27 +2376,34 @@ def soulvoice_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.
         try:
             logger.info(f"第 {attempt + 1} 次调用 SoulVoice API")
 
-            # 设置代理
-            proxies = {}
-            if config.proxy.get("http"):
-                proxies = {
-                    'http': config.proxy.get("http"),
-                    'https': config.proxy.get("https", config.proxy.get("http"))
-                }
-
-            # 调用 API
-            response = requests.post(
-                api_url,
-                headers=headers,
-                json=data,
-                proxies=proxies,
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                # 保存音频文件
-                with open(voice_file, 'wb') as f:
-                    f.write(response.content)
+            # 通过共享连接池调用 API（流式读取响应体，代理取自 config.proxy）
+            # 无论成功与否都在 with 结束时关闭响应，把连接归还连接池
+            part_file = _audio_part_file(voice_file)
+            try:
+                with http_client.post(
+                    api_url,
+                    headers=headers,
+                    json=data,
+                    timeout=60,
+                    stream=True
+                ) as response:
+                    if response.status_code != 200:
+                        logger.error(f"SoulVoice API 调用失败: {response.status_code} - {response.text}")
+                        committed = None
+                    else:
+                        # 流式写入临时文件，校验后原子替换
+                        expected_size = _response_content_length(response)
+                        _stream_response_to_file(response, part_file)
+                        committed = _commit_audio_file(part_file, voice_file, expected_size)
+            finally:
+                _remove_part_file(part_file)
+
+            if committed is not None:
+                if not committed:
+                    logger.error(f"SoulVoice API 返回的音频数据无效 (尝试 {attempt + 1}/3)")
+                    if attempt < 2:
+                        time.sleep(2)
+                    continue
 
                 logger.info(f"SoulVoice TTS 成功生成音频: {voice_file}")
 
@@ -1909,9 +2414,6 @@ def soulvoice_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.
 
                 return sub_maker
 
-            else:
-                logger.error(f"SoulVoice API 调用失败: {response.status_code} - {response.text}")
-
         except requests.exceptions.Timeout:
             logger.error(f"SoulVoice API 调用超时 (尝试 {attempt + 1}/3)")
         except requests.exceptions.RequestException as e:
@@ -2009,20 +2511,11 @@ def indextts2_tts(text: str, voice_name: str, voice_file: str, speed: float = 1.
         try:
             logger.info(f"第 {attempt + 1} 次调用 IndexTTS2 API")
 
-            # 设置代理
-            proxies = {}
-            if config.proxy.get("http"):
-                proxies = {
-                    'http': config.proxy.get("http"),
-                    'https': config.proxy.get("https", config.proxy.get("http"))
-                }
-
-            # 调用 API
-            response = requests.post(
+            # 通过共享连接池调用 API（代理取自 config.proxy）
+            response = http_client.post(
                 api_url,
                 files=files,
                 data=data,
-                proxies=proxies,
                 timeout=120  # IndexTTS2 推理可能需要较长时间
             )
 
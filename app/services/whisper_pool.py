@@ -0,0 +1,261 @@
+"""
+Whisper 模型池
+
+加载一次 Whisper 模型需要数秒并占用数百 MB 内存，因此按 (模型, 设备, 计算类型) 在进程内只加载一次：
+
+- acquire() 以上下文管理器的方式借出模型，同一模型同时服务的任务数受信号量限制
+- warmup() 在后台线程中预加载模型，WebUI 启动时可通过 [whisper] preload = true 开启
+- 空闲超过 idle_timeout 秒且没有任务在使用的模型会被自动卸载
+"""
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from loguru import logger
+
+from app.config import config
+from app.utils import utils
+
+DEFAULT_IDLE_TIMEOUT = 600          # 模型空闲多久后卸载（秒），0 表示不卸载
+DEFAULT_MAX_CONCURRENT_TASKS = 2    # 同一模型同时服务的任务数
+REAP_INTERVAL = 60                  # 检查空闲模型的间隔（秒）
+
+LOCAL_MODEL_DIR = "faster-whisper-large-v3"
+
+_cuda_available: Optional[bool] = None
+
+
+def cuda_available() -> bool:
+    """检查 CUDA 是否可用（只探测一次 torch）"""
+    global _cuda_available
+    if _cuda_available is None:
+        try:
+            import torch
+            _cuda_available = torch.cuda.is_available()
+        except (ImportError, RuntimeError) as e:
+            logger.warning(f"检查CUDA可用性时出错: {e}")
+            _cuda_available = False
+    return _cuda_available
+
+
+class _PooledModel:
+    def __init__(self, model, max_concurrent_tasks: int):
+        self.model = model
+        self.semaphore = threading.BoundedSemaphore(max_concurrent_tasks)
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class WhisperModelPool:
+    """进程内共享的 Whisper 模型池（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[tuple, _PooledModel] = {}
+        self._load_locks: Dict[tuple, threading.Lock] = {}
+        self._reaper = None
+
+    @staticmethod
+    def _idle_timeout() -> float:
+        return float(config.whisper.get("idle_timeout", DEFAULT_IDLE_TIMEOUT))
+
+    @staticmethod
+    def _max_concurrent_tasks() -> int:
+        return max(1, int(config.whisper.get("max_concurrent_tasks", DEFAULT_MAX_CONCURRENT_TASKS)))
+
+    def _get_entry(self, model_size_or_path: str, device: str, compute_type: str, reserve: bool = False,
+                   **options) -> _PooledModel:
+        """
+        取得（必要时加载）模型；reserve 为 True 时在持有锁期间把 in_use 加一，
+        避免返回后、借出前被空闲回收线程卸载
+        """
+        key = (model_size_or_path, device, compute_type)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                if reserve:
+                    entry.in_use += 1
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 同一模型只加载一次，不同模型可以并行加载
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    if reserve:
+                        entry.in_use += 1
+                    return entry
+
+            model = self._load(model_size_or_path, device, compute_type, **options)
+            entry = _PooledModel(model, self._max_concurrent_tasks())
+            with self._lock:
+                self._models[key] = entry
+                if reserve:
+                    entry.in_use += 1
+                self._ensure_reaper()
+            return entry
+
+    @staticmethod
+    def _load(model_size_or_path: str, device: str, compute_type: str, **options):
+        from faster_whisper import WhisperModel
+
+        start = time.monotonic()
+        logger.info(f"加载 Whisper 模型: {model_size_or_path}, 设备: {device}, 计算类型: {compute_type}")
+        try:
+            model = WhisperModel(
+                model_size_or_path=model_size_or_path,
+                device=device,
+                compute_type=compute_type,
+                **options
+            )
+        except Exception as e:
+            if device == "cpu":
+                raise
+            logger.warning(f"{device} 加载失败，错误信息: {str(e)}")
+            logger.warning("回退到 CPU 模式")
+            model = WhisperModel(
+                model_size_or_path=model_size_or_path,
+                device="cpu",
+                compute_type="int8",
+                **options
+            )
+        logger.info(f"Whisper 模型加载完成，耗时: {time.monotonic() - start:.2f}s")
+        return model
+
+    @contextmanager
+    def acquire(self, model_size_or_path: str, device: str = "cpu", compute_type: str = "int8", **options):
+        """
+        借出模型，在 with 块结束时归还
+
+        Args:
+            model_size_or_path: 模型名称（如 "tiny"）或本地模型目录
+            device: 设备（cpu / cuda）
+            compute_type: 计算类型（int8 / float16 等）
+            **options: 首次加载时传给 WhisperModel 的其他参数（num_workers、cpu_threads 等）
+        """
+        # in_use 在取得模型时即已加一（包括等待信号量的时间），期间不会被卸载
+        entry = self._get_entry(model_size_or_path, device, compute_type, reserve=True, **options)
+        try:
+            with entry.semaphore:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def warmup(self, model_size_or_path: str, device: str = "cpu", compute_type: str = "int8",
+               **options) -> threading.Thread:
+        """在后台线程中预加载模型"""
+        def run():
+            try:
+                self._get_entry(model_size_or_path, device, compute_type, **options)
+            except Exception as e:
+                logger.warning(f"Whisper 模型预加载失败: {str(e)}")
+
+        thread = threading.Thread(target=run, name="whisper-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def unload_idle(self, idle_timeout: Optional[float] = None) -> int:
+        """卸载空闲超时且未被使用的模型，返回卸载的数量"""
+        idle_timeout = self._idle_timeout() if idle_timeout is None else idle_timeout
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, entry in self._models.items()
+                if entry.in_use == 0 and now - entry.last_used >= idle_timeout
+            ]
+            for key in expired:
+                del self._models[key]
+        if expired:
+            gc.collect()
+            for key in expired:
+                logger.info(f"已卸载空闲的 Whisper 模型: {key[0]} ({key[1]}, {key[2]})")
+        return len(expired)
+
+    def unload_all(self) -> int:
+        return self.unload_idle(idle_timeout=0)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{key[0]}|{key[1]}|{key[2]}": {
+                    "in_use": entry.in_use,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                }
+                for key, entry in self._models.items()
+            }
+
+    def _ensure_reaper(self):
+        if self._idle_timeout() <= 0:
+            return
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop, name="whisper-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            try:
+                self.unload_idle()
+            except Exception as e:
+                logger.warning(f"卸载空闲 Whisper 模型时出错: {str(e)}")
+            with self._lock:
+                if not self._models:
+                    self._reaper = None
+                    return
+
+
+pool = WhisperModelPool()
+
+
+def local_model_spec() -> Optional[dict]:
+    """
+    本地字幕识别模型（app/models/faster-whisper-large-v3）的加载参数，优先使用 CUDA
+
+    Returns:
+        dict: 可直接传给 pool.acquire() 的参数；模型文件不存在时返回 None
+    """
+    from app.services import whisper_transcriber
+
+    model_path = f"{utils.root_dir()}/app/models/{LOCAL_MODEL_DIR}"
+    model_bin_file = f"{model_path}/model.bin"
+    if not os.path.isdir(model_path) or not os.path.isfile(model_bin_file):
+        logger.error(
+            "请先下载 whisper 模型\n\n"
+            "********************************************\n"
+            "下载地址：https://huggingface.co/guillaumekln/faster-whisper-large-v2\n"
+            "存放路径：app/models \n"
+            "********************************************\n"
+        )
+        return None
+
+    use_cuda = cuda_available()
+    return dict(
+        model_size_or_path=model_path,
+        device="cuda" if use_cuda else "cpu",
+        compute_type="float16" if use_cuda else "int8",
+        local_files_only=True,
+        # 并行转录需要多个模型 worker
+        num_workers=whisper_transcriber.get_num_workers(),
+        cpu_threads=whisper_transcriber.get_cpu_threads(),
+    )
+
+
+_preloaded = False
+
+
+def preload_local_model():
+    """启动时在后台预加载本地字幕识别模型（需在 config.toml 中设置 [whisper] preload = true）"""
+    global _preloaded
+    if _preloaded or not config.whisper.get("preload", False):
+        return
+    _preloaded = True
+    spec = local_model_spec()
+    if spec:
+        pool.warmup(**spec)
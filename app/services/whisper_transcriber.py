@@ -0,0 +1,367 @@
+"""
+长音频 Whisper 转录引擎
+
+整段音频一次性交给 model.transcribe 时只能单线程顺序解码，两小时的合集音频耗时会超过音频本身。
+这里先用 VAD 在静音处把音频切成若干块，再由多个模型 worker 并行转录，
+按时间顺序边完成边写出 SRT，并在块边界处去除重复的词。
+
+- 切分点位于两段语音之间静音的中点，块与块不重叠
+- 并行度受 WhisperModel 的 num_workers 限制，CPU 线程数由 cpu_threads 控制
+- 通过 progress_callback(progress, message) 向 WebUI 汇报进度，progress 取值 0~100
+- 输入为文件路径时由 FFmpeg 直接解码第一条音轨为 16kHz float PCM 并通过管道读取，
+  不落地临时 WAV，内存占用只与块大小和并行数有关，与音频总时长无关
+"""
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from app.config import config
+from app.utils import utils
+
+# Whisper 固定使用 16kHz 单声道输入
+SAMPLE_RATE = 16000
+
+DEFAULT_CHUNK_SECONDS = 120      # 单个转录块的目标最大时长（秒）
+DEFAULT_NUM_WORKERS = 2          # 并行转录的 worker 数
+MIN_SILENCE_DURATION_MS = 500    # 切分与转录时使用的最短静音时长
+
+# 从 FFmpeg 管道每次读取的音频时长（秒）
+READ_BLOCK_SECONDS = 30
+
+# 块边界去重的时间容差（秒）
+_BOUNDARY_TOLERANCE = 0.05
+
+TRANSCRIBE_OPTIONS = dict(
+    beam_size=5,
+    word_timestamps=True,
+    vad_filter=True,
+    vad_parameters=dict(min_silence_duration_ms=MIN_SILENCE_DURATION_MS),
+    initial_prompt="以下是普通话的句子",
+)
+
+
+def get_num_workers() -> int:
+    return max(1, int(config.whisper.get("num_workers", DEFAULT_NUM_WORKERS)))
+
+
+def get_cpu_threads() -> int:
+    return max(0, int(config.whisper.get("cpu_threads", 0)))
+
+
+def get_chunk_seconds() -> float:
+    return float(config.whisper.get("chunk_seconds", DEFAULT_CHUNK_SECONDS))
+
+
+def probe_duration(media_file: str) -> float:
+    """使用 ffprobe 获取媒体文件时长（秒），失败时返回 0"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        media_file
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except Exception as e:
+        logger.warning(f"获取媒体时长失败: {str(e)}")
+        return 0.0
+
+
+def iter_audio_blocks(media_file: str, block_seconds: float = READ_BLOCK_SECONDS) -> Iterator[np.ndarray]:
+    """
+    通过 FFmpeg 管道流式解码音频（视频文件只解码第一条音轨）
+
+    Args:
+        media_file: 音频或视频文件路径
+        block_seconds: 每次产出的音频时长（秒）
+
+    Yields:
+        np.ndarray: 16kHz 单声道 float32 音频块
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error',
+        '-i', media_file,
+        '-map', '0:a:0', '-vn', '-sn', '-dn',
+        '-ac', '1', '-ar', str(SAMPLE_RATE),
+        '-f', 'f32le', '-'
+    ]
+    block_bytes = int(block_seconds * SAMPLE_RATE) * 4
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        pending = b""
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            data = pending + data
+            # float32 按 4 字节对齐，剩余的字节留到下一块
+            aligned = len(data) - len(data) % 4
+            pending = data[aligned:]
+            if aligned:
+                yield np.frombuffer(data[:aligned], dtype=np.float32)
+        process.wait()
+        if process.returncode != 0:
+            error = process.stderr.read().decode("utf-8", errors="ignore").strip()
+            raise RuntimeError(f"FFmpeg 解码音频失败: {error}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def _find_cut(audio: np.ndarray, max_samples: int) -> Optional[int]:
+    """
+    在 VAD 检测到的静音处为当前缓冲区寻找不超过 max_samples 的切分点
+
+    Returns:
+        int: 切分点采样位置；缓冲区内没有语音时返回 None
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    speech = get_speech_timestamps(
+        audio, VadOptions(min_silence_duration_ms=MIN_SILENCE_DURATION_MS), sampling_rate=SAMPLE_RATE
+    )
+    if not speech:
+        return None
+
+    # 在两段语音之间的静音中点切分，取不超过上限的最后一个切分点
+    gaps = [(prev["end"] + cur["start"]) // 2 for prev, cur in zip(speech, speech[1:])]
+    if speech[-1]["end"] <= max_samples:
+        gaps.append(max_samples)
+    candidates = [cut for cut in gaps if 0 < cut <= max_samples]
+    if candidates:
+        return candidates[-1]
+
+    # 单段连续语音超过上限，只能硬切
+    logger.debug(f"连续语音超过 {max_samples / SAMPLE_RATE:.0f} 秒，在上限处切分")
+    return max_samples
+
+
+def iter_speech_chunks(blocks: Iterable[np.ndarray],
+                       max_chunk_seconds: float = DEFAULT_CHUNK_SECONDS) -> Iterator[tuple]:
+    """
+    把连续的音频块按 VAD 静音重新切分为不超过 max_chunk_seconds 的转录块，纯静音部分直接跳过
+
+    Yields:
+        tuple: (起始采样点, 音频块)
+    """
+    max_samples = int(max_chunk_seconds * SAMPLE_RATE)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block]) if len(buffer) else block
+        # 多缓冲一段音频，确保切分点附近的静音能被检测到
+        while len(buffer) > max_samples + int(READ_BLOCK_SECONDS * SAMPLE_RATE) // 2:
+            cut = _find_cut(buffer, max_samples)
+            if cut is None:
+                cut = max_samples
+            else:
+                yield offset, buffer[:cut]
+            offset += cut
+            buffer = buffer[cut:]
+
+    # 剩余部分可能仍超过上限（一次性传入整段音频时），继续切分
+    while len(buffer) > max_samples:
+        cut = _find_cut(buffer, max_samples)
+        if cut is None:
+            return
+        yield offset, buffer[:cut]
+        offset += cut
+        buffer = buffer[cut:]
+    if len(buffer) and _find_cut(buffer, max_samples) is not None:
+        yield offset, buffer
+
+
+def words_to_subtitles(segments, offset: float = 0.0) -> List[dict]:
+    """
+    按标点把 Whisper 的逐词结果断句为字幕条目
+
+    Args:
+        segments: model.transcribe 返回的片段
+        offset: 加到所有时间戳上的偏移（秒），用于把块内时间换算为整段音频时间
+
+    Returns:
+        List[dict]: [{"msg": 文本, "start_time": 开始秒数, "end_time": 结束秒数}, ...]
+    """
+    subtitles = []
+
+    def recognized(seg_text, seg_start, seg_end):
+        seg_text = seg_text.strip()
+        if not seg_text:
+            return
+
+        msg = "[%.2fs -> %.2fs] %s" % (seg_start + offset, seg_end + offset, seg_text)
+        logger.debug(msg)
+
+        subtitles.append(
+            {"msg": seg_text, "start_time": seg_start + offset, "end_time": seg_end + offset}
+        )
+
+    for segment in segments:
+        words_idx = 0
+        words_len = len(segment.words)
+
+        seg_start = 0
+        seg_end = 0
+        seg_text = ""
+
+        if segment.words:
+            is_segmented = False
+            for word in segment.words:
+                if not is_segmented:
+                    seg_start = word.start
+                    is_segmented = True
+
+                seg_end = word.end
+                # 如果包含标点,则断句
+                seg_text += word.word
+
+                if utils.str_contains_punctuation(word.word):
+                    # remove last char
+                    seg_text = seg_text[:-1]
+                    if not seg_text:
+                        continue
+
+                    recognized(seg_text, seg_start, seg_end)
+
+                    is_segmented = False
+                    seg_text = ""
+
+                if words_idx == 0 and segment.start < word.start:
+                    seg_start = word.start
+                if words_idx == (words_len - 1) and segment.end > word.end:
+                    seg_end = word.end
+                words_idx += 1
+
+        if not seg_text:
+            continue
+
+        recognized(seg_text, seg_start, seg_end)
+
+    return subtitles
+
+
+def stitch_subtitles(subtitles: List[dict], last_end: float, chunk_end: float) -> List[dict]:
+    """
+    拼接相邻块的字幕：丢弃完全落在已输出时间范围内的重复条目，并把时间裁剪到块的范围内
+    """
+    stitched = []
+    for item in subtitles:
+        if item["end_time"] <= last_end + _BOUNDARY_TOLERANCE:
+            continue
+        item["start_time"] = max(item["start_time"], last_end)
+        item["end_time"] = min(item["end_time"], chunk_end)
+        if item["end_time"] <= item["start_time"]:
+            continue
+        stitched.append(item)
+        last_end = item["end_time"]
+    return stitched
+
+
+def detect_language(model, audio: np.ndarray) -> Tuple[str, float]:
+    """
+    检测音频的语言，返回 (语言, 概率)
+
+    WhisperModel.detect_language 从 faster-whisper 1.1.0 起才提供；旧版本改用 transcribe()
+    返回的 TranscriptionInfo（只检测语言，不消费惰性的 segments 生成器）
+    """
+    if hasattr(model, "detect_language"):
+        language, probability, _ = model.detect_language(audio)
+        return language, probability
+    _, info = model.transcribe(audio, language=None)
+    return info.language, info.language_probability
+
+
+def transcribe_long_audio(
+    model,
+    audio: Union[str, np.ndarray],
+    subtitle_file: str,
+    num_workers: Optional[int] = None,
+    chunk_seconds: Optional[float] = None,
+    progress_callback: Optional[Callable[[float, str], None]] = None,
+) -> int:
+    """
+    分块并行转录长音频，按时间顺序流式写出 SRT 文件
+
+    Args:
+        model: faster_whisper.WhisperModel 实例（num_workers 应不小于并行数）
+        audio: 音频/视频文件路径（通过 FFmpeg 管道流式解码），或 16kHz 单声道 float32 音频
+        subtitle_file: 输出字幕文件路径
+        num_workers: 并行转录的块数，默认读取 config.whisper.num_workers
+        chunk_seconds: 单块最大时长，默认读取 config.whisper.chunk_seconds
+        progress_callback: 进度回调 progress_callback(progress, message)
+
+    Returns:
+        int: 写出的字幕条数
+    """
+    num_workers = num_workers or get_num_workers()
+    chunk_seconds = chunk_seconds or get_chunk_seconds()
+
+    if isinstance(audio, str):
+        total_duration = probe_duration(audio)
+        blocks = iter_audio_blocks(audio)
+    else:
+        total_duration = len(audio) / SAMPLE_RATE
+        blocks = [audio]
+    chunks = iter_speech_chunks(blocks, chunk_seconds)
+    logger.info(f"音频时长 {total_duration:.1f}s, 单块最大 {chunk_seconds:.0f}s, 并行数: {num_workers}")
+
+    language = config.whisper.get("language") or None
+
+    def report(progress, message):
+        if progress_callback:
+            try:
+                progress_callback(progress, message)
+            except Exception as e:
+                logger.warning(f"进度回调出错: {str(e)}")
+
+    def transcribe_chunk(start, chunk):
+        segments, _ = model.transcribe(chunk, language=language, **TRANSCRIBE_OPTIONS)
+        # segments 是惰性生成器，需在 worker 线程内完成解码
+        return words_to_subtitles(list(segments), offset=start / SAMPLE_RATE)
+
+    report(0, "开始转录")
+    idx = 1
+    last_end = 0.0
+    # 同时在内存中的块数上限，保证长音频的内存占用有界
+    max_pending = num_workers * 2
+    with open(subtitle_file, "w", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+
+        def write_next():
+            # 按时间顺序等待，已完成的前缀立即写出；进度在调用线程中按已写出的时长上报
+            nonlocal idx, last_end
+            future, end = pending.popleft()
+            for subtitle in stitch_subtitles(future.result(), last_end, end / SAMPLE_RATE):
+                f.write(utils.text_to_srt(idx, subtitle["msg"], subtitle["start_time"], subtitle["end_time"]) + "\n")
+                idx += 1
+                last_end = subtitle["end_time"]
+            f.flush()
+            done_duration = end / SAMPLE_RATE
+            progress = min(100.0, done_duration / total_duration * 100) if total_duration else 0.0
+            report(progress, f"已转录 {done_duration:.0f}/{total_duration:.0f} 秒")
+
+        for start, chunk in chunks:
+            # 先检测一次语言，避免各块分别检测导致语言不一致
+            if not language:
+                language, probability = detect_language(model, chunk[:30 * SAMPLE_RATE])
+                logger.info(f"检测到的语言: '{language}', probability: {probability:.2f}")
+
+            end = start + len(chunk)
+            pending.append((executor.submit(transcribe_chunk, start, chunk), end))
+            while pending and (len(pending) >= max_pending or pending[0][0].done()):
+                write_next()
+
+        while pending:
+            write_next()
+
+    report(100, "转录完成")
+    return idx - 1
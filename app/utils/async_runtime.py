@@ -0,0 +1,150 @@
+"""
+常驻的异步运行时
+
+同步代码（WebUI、视频生成任务、TTS）调用异步接口时，不再每次 asyncio.run / new_event_loop：
+
+- 进程内只有一个后台线程运行事件循环，首次使用时启动
+- submit(coro) 把协程提交到该循环，返回 concurrent.futures.Future
+- run(coro) 阻塞等待结果，可以在任意线程（包括已有运行中事件循环的线程）中调用
+- run_with_events(coro_func, on_event) 在执行过程中把协程发出的事件交回调用线程处理（如更新 Streamlit 界面）
+- 事件循环不再反复创建和关闭，litellm / httpx 等异步客户端的连接池在多次调用、多个任务之间保持可用
+- 提交时调用线程的 contextvars（如大模型遥测的任务 id）会带到协程中
+"""
+
+import asyncio
+import atexit
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional
+
+from loguru import logger
+
+_THREAD_NAME = "async-runtime"
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+    asyncio.set_event_loop(loop)
+    ready.set()
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """返回后台事件循环，未启动时先启动"""
+    global _loop, _thread
+    if _loop is not None and _thread is not None and _thread.is_alive():
+        return _loop
+    with _lock:
+        if _loop is None or _thread is None or not _thread.is_alive():
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(target=_run_loop, args=(loop, ready), name=_THREAD_NAME, daemon=True)
+            thread.start()
+            ready.wait()
+            _loop, _thread = loop, thread
+            logger.debug("异步运行时已启动")
+    return _loop
+
+
+def in_runtime_thread() -> bool:
+    return _thread is not None and threading.current_thread() is _thread
+
+
+async def _run_in_context(context: contextvars.Context, coro: Coroutine) -> Any:
+    # 协程在后台线程中以该线程的上下文运行，先恢复提交方的 contextvars
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def submit(coro: Coroutine) -> Future:
+    """把协程提交到后台事件循环执行"""
+    return asyncio.run_coroutine_threadsafe(_run_in_context(contextvars.copy_context(), coro), get_loop())
+
+
+def run(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    在后台事件循环中执行协程并阻塞等待结果
+
+    Args:
+        coro: 协程对象
+        timeout: 等待超时（秒），超时后取消协程并抛出 concurrent.futures.TimeoutError
+
+    Returns:
+        协程的返回值；协程抛出的异常原样抛出
+    """
+    if in_runtime_thread():
+        coro.close()
+        # 在运行时线程内阻塞等待自己会死锁，异步代码应直接 await
+        raise RuntimeError("不能在异步运行时线程内同步等待协程，请直接 await")
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def run_with_events(coro_func: Callable[[Callable[[Any], None]], Coroutine],
+                    on_event: Callable[[Any], None]) -> Any:
+    """
+    在后台事件循环中执行协程，协程发出的事件在调用线程中依次回调 on_event
+
+    Args:
+        coro_func: 接收 emit 函数的协程函数，协程内调用 emit(event) 发出事件
+        on_event: 事件回调；回调抛出的异常只记录日志，不影响协程执行
+
+    Returns:
+        协程的返回值
+    """
+    if in_runtime_thread():
+        raise RuntimeError("不能在异步运行时线程内同步等待协程，请直接 await")
+    events = queue.Queue()
+    future = submit(coro_func(events.put))
+    while True:
+        try:
+            event = events.get(timeout=0.1)
+        except queue.Empty:
+            if future.done() and events.empty():
+                break
+            continue
+        try:
+            on_event(event)
+        except Exception as e:
+            logger.warning(f"处理异步事件时出错: {str(e)}")
+    return future.result()
+
+
+def shutdown(timeout: float = 5.0):
+    """取消未完成的任务并停止后台事件循环"""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None or thread is None or not thread.is_alive():
+        return
+
+    async def _cancel_pending():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await loop.shutdown_asyncgens()
+
+    try:
+        asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"停止异步运行时时出错: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+
+
+atexit.register(shutdown)
@@ -0,0 +1,174 @@
+"""
+HTTP 客户端模块 - 为 TTS、LLM、素材下载等服务提供共享的连接池
+
+所有服务复用同一个 requests.Session，避免每次调用都重新建立 TCP+TLS 连接。
+代理从 config.proxy 读取，超时和连接池大小可在 config.toml 的 [http] 中配置。
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import config
+
+# 默认配置，可被 config.toml 中的 [http] 覆盖
+DEFAULT_POOL_CONNECTIONS = 16   # 缓存的主机连接池数量
+DEFAULT_POOL_MAXSIZE = 32       # 每个主机保留的最大连接数
+DEFAULT_CONNECT_TIMEOUT = 10    # 连接超时（秒）
+DEFAULT_READ_TIMEOUT = 120      # 读取超时（秒）
+DEFAULT_MAX_RETRIES = 2         # 连接错误的自动重试次数
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# 按主机统计的请求次数
+_host_requests: Dict[str, int] = defaultdict(int)
+_stats_lock = threading.Lock()
+
+
+def _http_config() -> dict:
+    return getattr(config, "http", {}) or {}
+
+
+def _build_session() -> requests.Session:
+    http_cfg = _http_config()
+    retry = Retry(
+        total=int(http_cfg.get("max_retries", DEFAULT_MAX_RETRIES)),
+        connect=int(http_cfg.get("max_retries", DEFAULT_MAX_RETRIES)),
+        read=0,  # 读超时不在此重试，交给各服务自己的重试逻辑，避免重复提交
+        backoff_factor=0.5,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=int(http_cfg.get("pool_connections", DEFAULT_POOL_CONNECTIONS)),
+        pool_maxsize=int(http_cfg.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)),
+        max_retries=retry,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    获取进程内共享的 requests.Session（懒加载，线程安全）
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+                logger.debug("已创建共享 HTTP 连接池")
+    return _session
+
+
+def get_proxies() -> dict:
+    """
+    根据 config.proxy 生成 requests 所需的代理配置
+
+    WebUI 可能在运行时修改代理，因此每次请求时重新读取
+    """
+    http_proxy = config.proxy.get("http")
+    if not http_proxy:
+        return {}
+    return {
+        "http": http_proxy,
+        "https": config.proxy.get("https") or http_proxy,
+    }
+
+
+def get_default_timeout() -> tuple:
+    http_cfg = _http_config()
+    return (
+        float(http_cfg.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+        float(http_cfg.get("read_timeout", DEFAULT_READ_TIMEOUT)),
+    )
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    通过共享连接池发送请求
+
+    与 requests.request 参数一致；未指定时自动填充超时和代理。
+    """
+    kwargs.setdefault("timeout", get_default_timeout())
+    if kwargs.get("proxies") is None:
+        kwargs["proxies"] = get_proxies()
+
+    host = urlsplit(url).netloc
+    with _stats_lock:
+        _host_requests[host] += 1
+
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def _iter_connection_pools():
+    """遍历共享会话中所有 urllib3 连接池（包括代理连接池）"""
+    if _session is None:
+        return
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+        for manager in managers:
+            if manager is None:
+                continue
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    yield pool
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    """
+    获取按主机统计的连接池复用情况
+
+    Returns:
+        dict: {host: {"requests": 发起的请求数, "connections": 新建的连接数, "reuse_rate": 连接复用率}}
+    """
+    stats: Dict[str, dict] = {}
+    with _stats_lock:
+        for host, count in _host_requests.items():
+            stats[host] = {"requests": count, "connections": 0, "reuse_rate": 0.0}
+
+    for pool in _iter_connection_pools():
+        host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+        item = stats.setdefault(host, {"requests": 0, "connections": 0, "reuse_rate": 0.0})
+        item["connections"] += pool.num_connections
+        # urllib3 的统计包含连接重试，取两者中的较大值
+        item["requests"] = max(item["requests"], pool.num_requests)
+
+    for item in stats.values():
+        if item["requests"] > 0:
+            reused = max(0, item["requests"] - item["connections"])
+            item["reuse_rate"] = round(reused / item["requests"], 4)
+    return stats
+
+
+def close_session():
+    """关闭共享会话并重置统计信息（配置变更后可调用以重建连接池）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+    with _stats_lock:
+        _host_requests.clear()
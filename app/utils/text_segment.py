@@ -0,0 +1,51 @@
+"""
+按标点切分文本（字幕、TTS 共用）
+
+- 所有分隔符（换行 + const.PUNCTUATIONS）合成一个预编译正则，一次 split 完成切分
+- 数字之间的小数点（如 2.5%）不作为分隔符
+- 中英文混排时按字符逐个匹配，不依赖空格分词
+- 切分结果与去标点后的比较形式都做了缓存，同一段解说在字幕生成、强制对齐、校正中只计算一次
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+from app.models import const
+
+_SEGMENT_CACHE_SIZE = 1024
+
+# 单字符分隔符；"..." 由单个 "." 覆盖，小数点单独处理
+_PUNCTUATION_CHARS = "".join(sorted({p for p in const.PUNCTUATIONS if len(p) == 1} - {"."}))
+
+# 换行、标点、以及不处于两个数字之间的 "."
+_SPLIT_RE = re.compile(rf"[\n{re.escape(_PUNCTUATION_CHARS)}]|(?<!\d)\.|\.(?!\d)")
+_CONTAINS_RE = re.compile(rf"[{re.escape(_PUNCTUATION_CHARS)}.]")
+
+_NON_WORD_SPACE_RE = re.compile(r"[^\w\s]")
+_NON_WORD_RE = re.compile(r"\W+")
+
+
+@lru_cache(maxsize=_SEGMENT_CACHE_SIZE)
+def _split(text: str) -> Tuple[str, ...]:
+    return tuple(filter(None, (part.strip() for part in _SPLIT_RE.split(text))))
+
+
+def split_by_punctuations(text: str) -> List[str]:
+    """按换行和标点切分，去掉首尾空白和空行"""
+    return list(_split(text))
+
+
+def contains_punctuation(text: str) -> bool:
+    return _CONTAINS_RE.search(text) is not None
+
+
+@lru_cache(maxsize=_SEGMENT_CACHE_SIZE)
+def strip_punctuation(text: str) -> str:
+    """去掉标点，保留文字和空白"""
+    return _NON_WORD_SPACE_RE.sub("", text)
+
+
+@lru_cache(maxsize=_SEGMENT_CACHE_SIZE)
+def strip_non_word(text: str) -> str:
+    """只保留文字"""
+    return _NON_WORD_RE.sub("", text)
@@ -12,8 +12,7 @@ from uuid import uuid4
 import urllib3
 from datetime import datetime, timedelta
 
-from app.models import const
-from app.utils import check_script
+from app.utils import check_script, text_segment
 from app.services import material
 
 urllib3.disable_warnings()
@@ -235,44 +234,16 @@ def text_to_srt(idx: int, msg: str, start_time: float, end_time: float) -> str:
 
 
 def str_contains_punctuation(word):
-    for p in const.PUNCTUATIONS:
-        if p in word:
-            return True
-    return False
+    return text_segment.contains_punctuation(word)
 
 
 def split_string_by_punctuations(s):
-    result = []
-    txt = ""
-
-    previous_char = ""
-    next_char = ""
-    for i in range(len(s)):
-        char = s[i]
-        if char == "\n":
-            result.append(txt.strip())
-            txt = ""
-            continue
-
-        if i > 0:
-            previous_char = s[i - 1]
-        if i < len(s) - 1:
-            next_char = s[i + 1]
-
-        if char == "." and previous_char.isdigit() and next_char.isdigit():
-            # 取现1万，按2.5%收取手续费, 2.5 中的 . 不能作为换行标记
-            txt += char
-            continue
-
-        if char not in const.PUNCTUATIONS:
-            txt += char
-        else:
-            result.append(txt.strip())
-            txt = ""
-    result.append(txt.strip())
-    # filter empty string
-    result = list(filter(None, result))
-    return result
+    """
+    按换行和标点切分字符串，过滤空行
+
+    取现1万，按2.5%收取手续费, 2.5 中的 . 不能作为换行标记
+    """
+    return text_segment.split_by_punctuations(s)
 
 
 def md5(text):
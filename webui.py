@@ -242,6 +242,20 @@ def main():
             st.error(f"⚠️ LLM 初始化失败: {str(e)}\n\n请检查配置文件和依赖是否正确安装。")
             # 不抛出异常，允许应用继续运行（但 LLM 功能不可用）
 
+    # 按配置启动大模型指标 HTTP 服务（[app] llm_metrics_port，每个进程只启动一次）
+    try:
+        from app.services.llm import telemetry
+        telemetry.start_metrics_server()
+    except Exception as e:
+        logger.warning(f"大模型指标服务启动失败: {str(e)}")
+
+    # 按配置在后台预加载 Whisper 模型（每个进程只执行一次）
+    try:
+        from app.services import whisper_pool
+        whisper_pool.preload_local_model()
+    except Exception as e:
+        logger.warning(f"Whisper 模型预加载失败: {str(e)}")
+
     # 检测FFmpeg硬件加速，但只打印一次日志（使用 session_state 持久化）
     if 'hwaccel_logged' not in st.session_state:
         st.session_state['hwaccel_logged'] = False
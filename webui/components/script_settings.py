@@ -7,7 +7,10 @@ import streamlit as st
 from loguru import logger
 
 from app.config import config
+from app.models import const
 from app.models.schema import VideoClipParams
+from app.services import state as sm
+from app.services.llm import telemetry
 from app.services.subtitle_text import decode_subtitle_bytes
 from app.utils import utils, check_script
 from webui.tools.generate_script_docu import generate_script_docu
@@ -401,6 +404,24 @@ def short_drama_summary(tr):
     return video_theme
 
 
+def render_llm_usage(task_id: str, succeeded: bool):
+    """把一次脚本生成任务的结果和大模型用量写入任务状态，并在界面显示用量"""
+    usage = telemetry.get_task_usage(task_id)
+    # 任务状态总是更新；没有大模型调用（如全部失败于调用前）时不附带用量
+    extra = {"llm_usage": usage} if usage else {}
+    if succeeded:
+        sm.state.update_task(task_id, state=const.TASK_STATE_COMPLETE, progress=100, **extra)
+    else:
+        sm.state.update_task(task_id, state=const.TASK_STATE_FAILED, **extra)
+    if not usage:
+        return
+    logger.info(f"脚本生成任务 {task_id} 大模型用量: 调用 {usage['calls']} 次（缓存命中 {usage['cache_hits']} 次，"
+                f"失败 {usage['errors']} 次），tokens {usage['total_tokens']}，费用约 ${usage['cost']:.4f}，"
+                f"累计耗时 {usage['latency_total']:.1f}s")
+    st.caption(f"大模型调用 {usage['calls']} 次 · tokens {usage['total_tokens']} · "
+               f"费用约 ${usage['cost']:.4f} · 耗时 {usage['latency_total']:.1f}s")
+
+
 def render_script_buttons(tr, params):
     """渲染脚本操作按钮"""
     # 获取当前选择的脚本类型
@@ -419,19 +440,28 @@ def render_script_buttons(tr, params):
         button_name = tr("Please Select Script File")
 
     if st.button(button_name, key="script_action", disabled=not script_path):
-        if script_path == "auto":
-            # 执行纪录片视频脚本生成（视频无字幕无配音）
-            generate_script_docu(params)
-        elif script_path == "short":
-            # 执行 短剧混剪 脚本生成
-            custom_clips = st.session_state.get('custom_clips')
-            generate_script_short(tr, params, custom_clips)
-        elif script_path == "summary":
-            # 执行 短剧解说 脚本生成
-            subtitle_path = st.session_state.get('subtitle_path')
-            video_theme = st.session_state.get('video_theme')
-            temperature = st.session_state.get('temperature')
-            generate_script_short_sunmmary(params, subtitle_path, video_theme, temperature)
+        if script_path in ("auto", "short", "summary"):
+            # 每次生成脚本作为一个任务，汇总本次的大模型 token、费用和延迟
+            task_id = utils.get_uuid()
+            succeeded = False
+            try:
+                with telemetry.task_scope(task_id):
+                    if script_path == "auto":
+                        # 执行纪录片视频脚本生成（视频无字幕无配音）
+                        succeeded = bool(generate_script_docu(params))
+                    elif script_path == "short":
+                        # 执行 短剧混剪 脚本生成
+                        custom_clips = st.session_state.get('custom_clips')
+                        succeeded = bool(generate_script_short(tr, params, custom_clips))
+                    else:
+                        # 执行 短剧解说 脚本生成
+                        subtitle_path = st.session_state.get('subtitle_path')
+                        video_theme = st.session_state.get('video_theme')
+                        temperature = st.session_state.get('temperature')
+                        succeeded = bool(generate_script_short_sunmmary(params, subtitle_path, video_theme, temperature))
+            finally:
+                # 生成函数内部处理错误（只在界面提示），按返回值记录真实结果；st.stop() 中断时记为失败
+                render_llm_usage(task_id, succeeded)
         else:
             load_script(tr, script_path)
 
@@ -525,6 +555,9 @@ def save_script_with_validation(tr, video_clip_json_details):
                 # 更新配置
                 config.app["video_clip_json_path"] = save_path
 
+                # 在后台预合成解说音频，生成视频时可直接使用
+                start_tts_prefetch(data)
+
                 # 显示成功消息
                 st.success("✅ 脚本格式验证通过，保存成功！")
 
@@ -537,6 +570,25 @@ def save_script_with_validation(tr, video_clip_json_details):
             st.stop()
 
 
+def start_tts_prefetch(script_data):
+    """按当前音频设置在后台预合成脚本中的解说片段"""
+    try:
+        from app.services import tts_prefetch
+        from webui.components.audio_settings import get_audio_params
+
+        audio_params = get_audio_params()
+        tts_prefetch.prefetch_script(
+            script_data,
+            voice_name=audio_params['voice_name'],
+            voice_rate=audio_params['voice_rate'],
+            voice_pitch=audio_params['voice_pitch'],
+            tts_engine=audio_params['tts_engine'],
+        )
+    except Exception as e:
+        # 预合成失败不影响保存脚本
+        logger.warning(f"启动 TTS 预合成失败: {str(e)}")
+
+
 # crop_video函数已移除 - 现在使用统一裁剪策略，不再需要预裁剪步骤
 
 
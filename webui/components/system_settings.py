@@ -3,6 +3,7 @@ import os
 import shutil
 from loguru import logger
 
+from app.services.llm import telemetry
 from app.utils.utils import storage_dir
 
 
@@ -30,7 +31,7 @@ def clear_directory(dir_path, tr):
 def render_system_panel(tr):
     """渲染系统设置面板"""
     with st.expander(tr("System settings"), expanded=False):
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
                 
         with col1:
             if st.button(tr("Clear frames"), use_container_width=True):
@@ -43,3 +44,18 @@ def render_system_panel(tr):
         with col3:
             if st.button(tr("Clear tasks"), use_container_width=True):
                 clear_directory(os.path.join(storage_dir(), "tasks"), tr)
+
+        with col4:
+            if st.button(tr("Clear TTS cache"), use_container_width=True):
+                clear_directory(os.path.join(storage_dir(), "tts_cache"), tr)
+
+        # 导出大模型调用的 token、费用和延迟指标
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(tr("Export LLM metrics (JSON)"), telemetry.export_json(),
+                               file_name="llm_metrics.json", mime="application/json",
+                               use_container_width=True)
+        with col2:
+            st.download_button(tr("Export LLM metrics (Prometheus)"), telemetry.export_prometheus(),
+                               file_name="llm_metrics.prom", mime="text/plain",
+                               use_container_width=True)
@@ -139,8 +139,10 @@ def get_batch_timestamps(batch_files, prev_batch_files=None):
 
 def get_batch_files(keyframe_files, result, batch_size=5):
     """
-    获取当前批次的图片文件
+    获取当前批次的图片文件（自适应分批时使用结果中的 start_index/end_index）
     """
+    if result.get('start_index') is not None:
+        return keyframe_files[result['start_index']:result['end_index']]
     batch_start = result['batch_index'] * batch_size
     batch_end = min(batch_start + batch_size, len(keyframe_files))
     return keyframe_files[batch_start:batch_end]
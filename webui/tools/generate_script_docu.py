@@ -2,14 +2,13 @@
 import os
 import json
 import time
-import asyncio
 import traceback
 import streamlit as st
 from loguru import logger
 from datetime import datetime
 
 from app.config import config
-from app.utils import utils, video_processor
+from app.utils import utils, video_processor, async_runtime
 from webui.tools.base import create_vision_analyzer, get_batch_files, get_batch_timestamps
 
 
@@ -18,6 +17,7 @@ def generate_script_docu(params):
     生成 纪录片 视频脚本
     要求: 原视频无字幕无配音
     适合场景: 纪录片、动物搞笑解说、荒野建造等
+    返回: 生成成功时返回 True（错误已在界面提示）
     """
     progress_bar = st.progress(0)
     status_text = st.empty()
@@ -172,11 +172,7 @@ def generate_script_docu(params):
 
                 update_progress(40, "正在分析关键帧...")
 
-                # ===================创建异步事件循环===================
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                # 执行异步分析
+                # ===================执行异步分析===================
                 vision_batch_size = st.session_state.get('vision_batch_size') or config.frames.get("vision_batch_size")
                 vision_analysis_prompt = """
 我提供了 %s 张视频帧，它们按时间顺序排列，代表一个连续的视频片段。请仔细分析每一帧的内容，并关注帧与帧之间的变化，以理解整个片段的活动。
@@ -200,14 +196,14 @@ def generate_script_docu(params):
 
 请只返回 JSON 字符串，不要包含任何其他解释性文字。
                 """
-                results = loop.run_until_complete(
+                # 在常驻的异步运行时中执行，连接池在多次分析之间复用
+                results = async_runtime.run(
                     analyzer.analyze_images(
                         images=keyframe_files,
                         prompt=vision_analysis_prompt,
                         batch_size=vision_batch_size
                     )
                 )
-                loop.close()
 
                 """
                 3. 处理分析结果（格式化为 json 数据）
@@ -386,7 +382,7 @@ def generate_script_docu(params):
                 """
                 logger.info("开始生成解说文案")
                 update_progress(80, "正在生成解说文案...")
-                from app.services.generate_narration_script import parse_frame_analysis_to_markdown, generate_narration
+                from app.services.generate_narration_script import generate_narration_from_analysis
                 # 从配置中获取文本生成相关配置
                 text_provider = config.app.get('text_llm_provider', 'gemini').lower()
                 text_api_key = config.app.get(f'text_{text_provider}_api_key')
@@ -398,15 +394,22 @@ def generate_script_docu(params):
                     "text_model_name": text_model,
                     "text_base_url": text_base_url
                 })
-                # 整理帧分析数据
-                markdown_output = parse_frame_analysis_to_markdown(analysis_json_path)
-
-                # 生成解说文案
-                narration = generate_narration(
-                    markdown_output,
+                # 生成解说文案（流式生成时每完成一个片段就更新进度）
+                streamed_items = []
+
+                def on_narration_item(item):
+                    streamed_items.append(item)
+                    preview = str(item.get("narration", ""))[:30]
+                    update_progress(min(95, 80 + len(streamed_items)),
+                                    f"已生成 {len(streamed_items)} 个解说片段: {preview}")
+
+                # 长视频按时间段并行生成后再润色衔接处，短视频整体一次生成
+                narration = generate_narration_from_analysis(
+                    analysis_json_path,
                     text_api_key,
                     base_url=text_base_url,
-                    model=text_model
+                    model=text_model,
+                    on_item=on_narration_item
                 )
 
                 # 使用增强的JSON解析器
@@ -442,6 +445,7 @@ def generate_script_docu(params):
         progress_bar.progress(100)
         status_text.text("🎉 脚本生成完成！")
         st.success("✅ 视频脚本生成成功！")
+        return True
 
     except Exception as err:
         st.error(f"❌ 生成过程中发生错误: {str(err)}")
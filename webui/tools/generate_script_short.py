@@ -18,6 +18,9 @@ def generate_script_short(tr, params, custom_clips=5):
         tr: 翻译函数
         params: 视频参数对象
         custom_clips: 自定义片段数量，默认为5
+
+    Returns:
+        bool: 生成成功时返回 True（错误已在界面提示）
     """
     progress_bar = st.progress(0)
     status_text = st.empty()
@@ -120,6 +123,7 @@ def generate_script_short(tr, params, custom_clips=5):
         progress_bar.progress(100)
         status_text.text("脚本生成完成！")
         st.success("视频脚本生成成功！")
+        return True
 
     except Exception as err:
         progress_bar.progress(100)
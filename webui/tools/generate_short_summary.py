@@ -140,6 +140,7 @@ def generate_script_short_sunmmary(params, subtitle_path, video_theme, temperatu
     生成 短剧解说 视频脚本
     要求: 提供高质量短剧字幕
     适合场景: 短剧
+    返回: 生成成功时返回 True（错误已在界面提示）
     """
     progress_bar = st.progress(0)
     status_text = st.empty()
@@ -279,6 +280,7 @@ def generate_script_short_sunmmary(params, subtitle_path, video_theme, temperatu
         progress_bar.progress(100)
         status_text.text("脚本生成完成！")
         st.success("视频脚本生成成功！")
+        return True
 
     except Exception as err:
         st.error(f"生成过程中发生错误: {str(err)}")